@@ -0,0 +1,385 @@
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import rating_store
+import threshold_calibration
+from constants import DEFAULT_TOPIC
+
+ANALYTICS_PATH = 'analytics.json'
+SAVE_INTERVAL_SECONDS = 30.0
+
+# Konu ve gün kovalarında tutulan sayaçlar; 'weak_users' sadece konu kovasında tutulur (anlık değer)
+COUNTER_FIELDS = ('asks', 'matched', 'llm_fallbacks', 'degraded', 'new_qa', 'ratings', 'rating_sum', 'rating_sum_sq',
+                  'demotions', 'promotions', 'quiz_correct', 'quiz_incorrect')
+ASK_OUTCOMES = ('matched', 'llm', 'degraded', 'error')
+
+
+def day_key(ts: float = None) -> str:
+    return time.strftime('%Y-%m-%d', time.localtime(time.time() if ts is None else ts))
+
+
+def day_keys(ts: np.ndarray) -> List[str]:
+    """Zaman damgalarını vektörel olarak yerel gün anahtarlarına çevirir (güncel saat dilimi farkıyla)."""
+    if not len(ts):
+        return []
+    offset = time.localtime().tm_gmtoff
+    day_numbers = np.floor((ts + offset) / 86400.0).astype(np.int64)
+    unique_days, inverse = np.unique(day_numbers, return_inverse=True)
+    labels = [time.strftime('%Y-%m-%d', time.gmtime(int(day) * 86400)) for day in unique_days]
+    return [labels[i] for i in inverse]
+
+
+def _number(value: float):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def group_sums(keys: List[str], columns: Dict[str, np.ndarray]) -> Dict[str, Dict]:
+    """keys[i] grubuna her sütunun i. değerini ekler; gruplama np.unique + np.bincount ile tek geçişte yapılır."""
+    if not keys:
+        return {}
+    labels, inverse = np.unique(np.asarray(keys), return_inverse=True)
+    sums = {field: np.bincount(inverse, weights=values, minlength=len(labels)) for field, values in columns.items()}
+    return {str(label): {field: _number(sums[field][i]) for field in columns} for i, label in enumerate(labels)}
+
+
+def summarize(counters: Dict) -> Dict:
+    """Sayaçlara ortalama puan, standart sapma, LLM'e düşüş oranı ve quiz başarısını ekler."""
+    view = {field: counters.get(field, 0) for field in COUNTER_FIELDS}
+    if 'weak_users' in counters:
+        view['weak_users'] = counters['weak_users']
+    stats = {"count": view['ratings'], "sum": view['rating_sum'], "sum_sq": view['rating_sum_sq']}
+    view['mean_rating'] = round(rating_store.mean(stats), 3) if stats['count'] else None
+    view['rating_std'] = round(rating_store.variance(stats) ** 0.5, 3) if stats['count'] else None
+    view['fallback_rate'] = round(view['llm_fallbacks'] / view['asks'], 4) if view['asks'] else None
+    answered = view['quiz_correct'] + view['quiz_incorrect']
+    view['quiz_accuracy'] = round(view['quiz_correct'] / answered, 4) if answered else None
+    return view
+
+
+# --- Ham dosyalardan yeniden hesaplama ---
+
+def load_json(path: str, default=None):
+    if not path or not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Uyarı: '{path}' okunamadı: {e}")
+        return default
+
+
+def question_topics(data: List[Dict], low_score: List[Dict]) -> Dict[str, str]:
+    """Soru -> konu eşlemesi; konusu yazılmamış pasif kayıtlar aktif havuzdaki konuyu alır."""
+    topics = {item['question']: item.get('topic') or DEFAULT_TOPIC for item in data}
+    for item in low_score:
+        topics.setdefault(item['question'], item.get('topic') or DEFAULT_TOPIC)
+    return topics
+
+
+def aggregate_votes(votes: List[Dict], topics_by_question: Dict[str, str]) -> Tuple[Dict, Dict]:
+    """
+    Puan günlüğünden konu ve gün bazlı puan sayısı/toplamı/kareler toplamı. Eski listelerden taşınan
+    ('legacy') puanların gerçek günü bilinmediği için sadece konu toplamlarına katılır.
+    """
+    ratings = np.fromiter((float(v.get('rating', 0)) for v in votes), dtype=np.float64, count=len(votes))
+    ts = np.fromiter((float(v.get('ts', 0)) for v in votes), dtype=np.float64, count=len(votes))
+    columns = {"ratings": np.ones(len(votes)), "rating_sum": ratings, "rating_sum_sq": ratings * ratings}
+    topic_keys = [topics_by_question.get(v.get('question'), DEFAULT_TOPIC) for v in votes]
+    dated = np.fromiter((not v.get('legacy') for v in votes), dtype=bool, count=len(votes))
+    day_columns = {name: column[dated] for name, column in columns.items()}
+    return group_sums(topic_keys, columns), group_sums(day_keys(ts[dated]), day_columns)
+
+
+def aggregate_rating_stats(items: List[Dict], topics_by_question: Dict[str, str]) -> Dict:
+    """Puan günlüğü yoksa konu bazlı puan özetleri kayıtlardaki 'rating_stats' alanlarından toplanır (gün bilgisi yok)."""
+    stats = [rating_store.get_stats(item) for item in items]
+    columns = {"ratings": np.array([s['count'] for s in stats], dtype=np.float64),
+               "rating_sum": np.array([s['sum'] for s in stats], dtype=np.float64),
+               "rating_sum_sq": np.array([s['sum_sq'] for s in stats], dtype=np.float64)}
+    topic_keys = [item.get('topic') or topics_by_question.get(item['question'], DEFAULT_TOPIC) for item in items]
+    return group_sums(topic_keys, columns)
+
+
+def aggregate_matches(events: List[Dict]) -> Tuple[Dict, Dict]:
+    """Geri bildirim günlüğündeki 'match' olaylarından soru, önbellekten sunulan ve LLM'e düşen sayıları."""
+    matches = [e for e in events if e.get('type') == 'match']
+    served = np.fromiter((bool(e.get('served')) for e in matches), dtype=np.float64, count=len(matches))
+    ts = np.fromiter((float(e.get('ts', 0)) for e in matches), dtype=np.float64, count=len(matches))
+    columns = {"asks": np.ones(len(matches)), "matched": served, "llm_fallbacks": 1.0 - served}
+    # Canlı /ask sayaçları sorunun belirlenen konusuyla tutulur; asked_topic'i olmayan eski olaylar eşleşen kaydın konusuna düşer
+    topic_keys = [e.get('asked_topic') or e.get('topic') or DEFAULT_TOPIC for e in matches]
+    return group_sums(topic_keys, columns), group_sums(day_keys(ts), columns)
+
+
+def aggregate_demotions(low_score: List[Dict], topics_by_question: Dict[str, str]) -> Tuple[Dict, Dict]:
+    """Pasif havuzdaki her kayıt bir cevabın düşürülmesidir; konu ve soru bazlı sayılır."""
+    questions = {}
+    for item in low_score:
+        entry = questions.setdefault(item['question'], {"topic": topics_by_question.get(item['question'], DEFAULT_TOPIC),
+                                                        "demotions": 0})
+        entry['demotions'] += 1
+        entry['last_average'] = round(rating_store.mean(rating_store.get_stats(item)), 3)
+    topics = Counter()
+    for entry in questions.values():
+        topics[entry['topic']] += entry['demotions']
+    return {topic: {"demotions": count} for topic, count in topics.items()}, questions
+
+
+def aggregate_weak_users(user_topics: List[Dict]) -> Dict:
+    counts = Counter(topic for user in user_topics for topic in set(user.get('topics', [])))
+    return {topic: {"weak_users": count} for topic, count in counts.items()}
+
+
+class AnalyticsStore:
+    """
+    Konu ve gün bazlı özet sayaçları. Puanlama, yeni soru ekleme, /ask sonuçları ve quiz cevapları geldikçe
+    sayaçlar O(1) güncellenir ve analytics.json'a aralıklı kaydedilir; panolar sadece bu özetleri okur.
+    `backfill` sayaçları ham dosyalardan (puan ve geri bildirim günlükleri, data.json, low_score_qa.json,
+    user_topics.json) NumPy ile toplu hesaplar; ham dosyalardan çıkarılamayan sayaçlar (quiz cevapları,
+    terfiler, kademeli düşüşler, yeni sorular) korunur.
+    """
+
+    def __init__(self, path: str = ANALYTICS_PATH, save_interval: float = SAVE_INTERVAL_SECONDS):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.time()
+        state = load_json(path, default={}) or {}
+        self.topics: Dict[str, Dict] = state.get('topics', {})
+        self.days: Dict[str, Dict] = state.get('days', {})
+        self.questions: Dict[str, Dict] = state.get('questions', {})
+        self.backfilled_at: Optional[float] = state.get('backfilled_at')
+        if path:
+            atexit.register(self.save)
+
+    def save(self):
+        """Özetleri geçici dosyaya yazıp taşır; değişiklik yoksa bir şey yapmaz."""
+        if not self.path or not self._dirty:
+            return
+        with self._lock:
+            snapshot = json.dumps({"topics": self.topics, "days": self.days, "questions": self.questions,
+                                   "backfilled_at": self.backfilled_at, "updated_at": round(time.time(), 3)},
+                                  ensure_ascii=False, indent=2)
+            self._dirty = False
+            self._last_save = time.time()
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, self.path)
+        except IOError as e:
+            print(f"Hata: '{self.path}' analiz dosyasına yazılırken sorun oluştu: {e}")
+
+    def _changed(self):
+        """Kilit tutulurken çağrılır; kayıt zamanı geldiyse True döndürür (kayıt kilit dışında yapılır)."""
+        self._dirty = True
+        return time.time() - self._last_save >= self.save_interval
+
+    def _add(self, topic: str, increments: Dict[str, float], per_day: bool = True):
+        with self._lock:
+            buckets = [self.topics.setdefault(topic or DEFAULT_TOPIC, {})]
+            if per_day:
+                buckets.append(self.days.setdefault(day_key(), {}))
+            for bucket in buckets:
+                for field, value in increments.items():
+                    bucket[field] = bucket.get(field, 0) + value
+            due = self._changed()
+        if due:
+            self.save()
+
+    # --- Artımlı güncellemeler ---
+
+    def record_ask(self, topic: str, outcome: str):
+        """/ask sonucu: 'matched' (önbellekten), 'llm' (yeni cevap), 'degraded' (LLM yok, yakın cevap) veya 'error'."""
+        if outcome not in ASK_OUTCOMES:
+            raise ValueError(f"Geçersiz sonuç: '{outcome}' ({', '.join(ASK_OUTCOMES)} olmalı).")
+        increments = {"asks": 1, "matched": 1} if outcome == 'matched' else {"asks": 1, "llm_fallbacks": 1}
+        if outcome == 'degraded':
+            increments['degraded'] = 1
+        self._add(topic, increments)
+
+    def record_new_qa(self, topic: str):
+        self._add(topic, {"new_qa": 1})
+
+    def record_rating(self, question: str, topic: str, rating: float, demoted: bool = False, promoted: bool = False,
+                      average: float = None):
+        """Birincil cevaba verilen puan; demoted ise cevap düşürülmüştür (promoted: yerine answer2 geçmiştir)."""
+        increments = {"ratings": 1, "rating_sum": rating, "rating_sum_sq": rating * rating}
+        if demoted:
+            increments['demotions'] = 1
+            if promoted:
+                increments['promotions'] = 1
+        self._add(topic, increments)
+        if demoted:
+            with self._lock:
+                entry = self.questions.setdefault(question, {"topic": topic or DEFAULT_TOPIC, "demotions": 0})
+                entry['demotions'] += 1
+                if average is not None:
+                    entry['last_average'] = round(average, 3)
+                self._changed()
+
+    def record_quiz_answer(self, topic: str, correct: bool):
+        self._add(topic, {"quiz_correct": 1} if correct else {"quiz_incorrect": 1})
+
+    def record_weak_topic(self, topic: str, delta: int):
+        """Konuyu zayıf konuları arasında tutan kullanıcı sayısını değiştirir (+1 eklendi, -1 tamamlandı)."""
+        self._add(topic, {"weak_users": delta}, per_day=False)
+
+    # --- Görünümler ---
+
+    def topic_view(self, min_ratings: int = 0) -> List[Dict]:
+        with self._lock:
+            topics = {topic: dict(counters) for topic, counters in self.topics.items()}
+        return [{"topic": topic, **summarize(counters)} for topic, counters in sorted(topics.items())
+                if counters.get('ratings', 0) >= min_ratings]
+
+    def worst_topics(self, limit: int = 10, min_ratings: int = 3) -> List[Dict]:
+        """Ortalama puanı en düşük konular (en az min_ratings puan almış olanlar)."""
+        return sorted(self.topic_view(max(1, min_ratings)), key=lambda view: view['mean_rating'])[:limit]
+
+    def daily_view(self, days: int = 30) -> List[Dict]:
+        """Son `days` günün sayaçları, eskiden yeniye."""
+        with self._lock:
+            keys = sorted(self.days)[-days:] if days > 0 else []
+            return [{"day": key, **summarize(self.days[key])} for key in keys]
+
+    def most_demoted(self, limit: int = 10) -> List[Dict]:
+        with self._lock:
+            ranked = sorted(self.questions.items(), key=lambda kv: kv[1].get('demotions', 0), reverse=True)[:limit]
+            return [{"question": question, **entry} for question, entry in ranked]
+
+    def summary(self) -> Dict:
+        with self._lock:
+            totals = Counter()
+            for counters in self.topics.values():
+                totals.update({field: counters.get(field, 0) for field in COUNTER_FIELDS})
+            return {**summarize(totals), "topics": len(self.topics), "days": len(self.days),
+                    "backfilled_at": self.backfilled_at}
+
+    # --- Toplu yeniden hesaplama ---
+
+    def backfill(self, data_path: str = 'data.json', low_score_path: str = 'low_score_qa.json',
+                 rating_log_path: str = 'ratings_log.jsonl',
+                 feedback_log_path: str = threshold_calibration.FEEDBACK_LOG_PATH,
+                 user_topics_path: str = 'user_topics.json') -> Dict:
+        """
+        Ham dosyalardan çıkarılabilen sayaçları yeniden hesaplar ve mevcut özetlerin yerine koyar.
+        Puan günlüğü boşsa konu bazlı puanlar kayıtların 'rating_stats' özetlerinden alınır ve günlük puanlar
+        korunur; geri bildirim günlüğü boşsa soru sayıları korunur. Sözcüksel hızlı yoldan cevaplanan sorular
+        geri bildirim günlüğüne yazılmadığı için yeniden hesaplanan soru sayıları artımlı sayaçlardan az olabilir.
+        """
+        data = load_json(data_path, default=[]) or []
+        low_score = load_json(low_score_path, default=[]) or []
+        user_topics = load_json(user_topics_path, default=[]) or []
+        topics_by_question = question_topics(data, low_score)
+        votes = list(rating_store.RatingLog(rating_log_path).iter_votes()) if rating_log_path else []
+        events = list(threshold_calibration.FeedbackLog(feedback_log_path).iter_events()) if feedback_log_path else []
+
+        topic_parts, day_parts = [], []
+        if votes:
+            topic_ratings, day_ratings = aggregate_votes(votes, topics_by_question)
+            day_parts.append((('ratings', 'rating_sum', 'rating_sum_sq'), day_ratings))
+        else:
+            topic_ratings = aggregate_rating_stats(data + low_score, topics_by_question)
+        topic_parts.append((('ratings', 'rating_sum', 'rating_sum_sq'), topic_ratings))
+        if any(e.get('type') == 'match' for e in events):
+            topic_matches, day_matches = aggregate_matches(events)
+            topic_parts.append((('asks', 'matched', 'llm_fallbacks'), topic_matches))
+            day_parts.append((('asks', 'matched', 'llm_fallbacks'), day_matches))
+        topic_demotions, questions = aggregate_demotions(low_score, topics_by_question)
+        topic_parts.append((('demotions',), topic_demotions))
+        topic_parts.append((('weak_users',), aggregate_weak_users(user_topics)))
+
+        with self._lock:
+            for buckets, parts in ((self.topics, topic_parts), (self.days, day_parts)):
+                for fields, computed in parts:
+                    for counters in buckets.values():
+                        for field in fields:
+                            counters.pop(field, None)
+                    for key, values in computed.items():
+                        buckets.setdefault(key, {}).update(values)
+            self.questions = questions
+            self.backfilled_at = round(time.time(), 3)
+            self._changed()
+        self.save()
+        report = {"votes": len(votes), "events": len(events), "qa_records": len(data), "low_score_records": len(low_score),
+                  "users": len(user_topics), "topics": len(self.topics), "days": len(self.days)}
+        print(f"DEBUG: Analiz özetleri ham dosyalardan yeniden hesaplandı: {report}")
+        return report
+
+
+def _print_rows(rows: Iterable[Dict], key: str):
+    for row in rows:
+        mean = '-' if row['mean_rating'] is None else f"{row['mean_rating']:.2f}"
+        rate = '-' if row['fallback_rate'] is None else f"%{row['fallback_rate'] * 100:.1f}"
+        print(f"  {str(row[key]):<40} puan: {mean:>5} ({row['ratings']:>4})  soru: {row['asks']:>5}  "
+              f"LLM: {rate:>7}  düşürülen: {row['demotions']:>3}  quiz: {row['quiz_correct']}/"
+              f"{row['quiz_correct'] + row['quiz_incorrect']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Konu ve gün bazlı analiz özetlerini gösterir veya ham dosyalardan yeniden hesaplar.")
+    parser.add_argument('--path', default=ANALYTICS_PATH, help="Analiz özet dosyası.")
+    parser.add_argument('--json', action='store_true', help="Çıktıyı JSON olarak yaz.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    backfill = subparsers.add_parser('backfill', help="Özetleri ham dosyalardan yeniden hesapla.")
+    backfill.add_argument('--data', default='data.json')
+    backfill.add_argument('--low-score', default='low_score_qa.json')
+    backfill.add_argument('--ratings-log', default='ratings_log.jsonl')
+    backfill.add_argument('--feedback-log', default=threshold_calibration.FEEDBACK_LOG_PATH)
+    backfill.add_argument('--user-topics', default='user_topics.json')
+    subparsers.add_parser('summary', help="Genel toplamlar.")
+    topics = subparsers.add_parser('topics', help="Konu bazlı özetler.")
+    topics.add_argument('--min-ratings', type=int, default=0)
+    worst = subparsers.add_parser('worst', help="Ortalama puanı en düşük konular.")
+    worst.add_argument('--limit', type=int, default=10)
+    worst.add_argument('--min-ratings', type=int, default=3)
+    daily = subparsers.add_parser('daily', help="Gün bazlı özetler (LLM'e düşüş oranı dahil).")
+    daily.add_argument('--days', type=int, default=30)
+    demoted = subparsers.add_parser('demoted', help="En çok düşürülen sorular.")
+    demoted.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    store = AnalyticsStore(args.path)
+    try:
+        if args.command == 'backfill':
+            result = store.backfill(args.data, args.low_score, args.ratings_log, args.feedback_log, args.user_topics)
+        elif args.command == 'summary':
+            result = store.summary()
+        elif args.command == 'topics':
+            result = store.topic_view(args.min_ratings)
+        elif args.command == 'worst':
+            result = store.worst_topics(args.limit, args.min_ratings)
+        elif args.command == 'daily':
+            result = store.daily_view(args.days)
+        else:
+            result = store.most_demoted(args.limit)
+    except Exception as e:
+        print(f"❌ HATA: {e}")
+        sys.exit(1)
+
+    if args.json or args.command in ('backfill', 'summary'):
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    elif args.command in ('topics', 'worst'):
+        _print_rows(result, 'topic')
+    elif args.command == 'daily':
+        _print_rows(result, 'day')
+    else:
+        for row in result:
+            print(f"  {row['demotions']:>3}x  {row['question'][:70]:<70}  ({row['topic']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import llm_guard
+import rating_store
+
+# Bir saatte ön üretim için harcanabilecek varsayılan token sayısı
+TOKENS_PER_HOUR = 20000
+# ask_openai'nin cevap sınırı (max_tokens) ile istem payı; bütçe kontrolünde çağrı başına ayrılan tahmini token
+ESTIMATED_TOKENS_PER_CALL = 400
+MAX_CONCURRENCY = 2
+BATCH_SIZE = 10
+INTERVAL_SECONDS = 60.0
+# Ön üretim isteği kullanıcıyı beklemediği için daha uzun süre tanınır, yedek istek gönderilmez
+PREFETCH_DEADLINE_SECONDS = 30.0
+# Başarısız olan soru bu süre boyunca yeniden denenmez (sn)
+FAILURE_COOLDOWN_SECONDS = 3600.0
+
+
+def priority(item: Dict, decay: float = 0.0, demotion_threshold: float = 3.0) -> float:
+    """
+    Sorunun answer2'sine ne kadar erken ihtiyaç duyulacağının tahmini. Çok sorulan sorular ve ortalaması
+    düşen (son puanları genel ortalamanın altında kalan) ya da pasife taşınma eşiğine yaklaşan sorular öne çıkar.
+    """
+    stats = rating_store.get_stats(item)
+    value = math.log1p(item.get('sorulma_sayisi', 0))
+    if stats['count']:
+        average = rating_store.mean(stats)
+        value += 2.0 * max(0.0, average - rating_store.score(stats, decay))
+        value += max(0.0, demotion_threshold + 1.0 - average)
+    return value
+
+
+class Answer2Prefetcher:
+    """
+    answer2'si boş olan soruların yedek cevaplarını arka planda, saatlik token bütçesi ve eşzamanlılık sınırı
+    içinde üretir. Her turda en öncelikli BATCH_SIZE soru işlenir ve sonuçlar tek seferde
+    QASystem.fill_answer2_batch ile yazılır; böylece 'regenerate' istekleri çoğunlukla bellekten cevaplanır.
+    Üretimi süren bir soru için gelen 'regenerate' isteği aynı cevabı `wait_for` ile bekleyebilir.
+    """
+
+    def __init__(self, qa_system, tokens_per_hour: int = TOKENS_PER_HOUR, max_concurrency: int = MAX_CONCURRENCY,
+                 batch_size: int = BATCH_SIZE, interval: float = INTERVAL_SECONDS,
+                 deadline_seconds: float = PREFETCH_DEADLINE_SECONDS):
+        self.qa = qa_system
+        self.tokens_per_hour = tokens_per_hour
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.deadline_seconds = deadline_seconds
+        self.max_concurrency = max(1, max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="answer2-prefetch")
+        # Ön üretimin kendi devre kesicisi vardır; hataları /ask isteklerinin devre kesicisini açmaz
+        self.llm_caller = llm_guard.HedgedCaller(max_workers=self.max_concurrency, max_hedges=0)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._failed_until: Dict[str, float] = {}
+        # Kullanıcının 'regenerate' ile istediği ama answer2'si boş bulunan sorular öncelik kazanır
+        self._requested: Dict[str, int] = {}
+        self._window_start = time.time()
+        self._window_tokens = 0
+        self.generated = 0
+        self.failed = 0
+        self.tokens_used = 0
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="answer2-prefetcher", daemon=True)
+            self._thread.start()
+            print(f"DEBUG: answer2 ön üretimi başlatıldı (saatlik {self.tokens_per_hour} token, "
+                  f"{self.max_concurrency} eşzamanlı istek, {self.interval} sn aralıkla).")
+
+    def note_regenerate_miss(self, question: str):
+        with self._lock:
+            self._requested[question] = self._requested.get(question, 0) + 1
+
+    def wait_for(self, question: str, timeout: float) -> Optional[str]:
+        """Soru için süren bir ön üretim varsa cevabını en fazla timeout sn bekler; yoksa None."""
+        with self._lock:
+            future = self._in_flight.get(question)
+        if future is None or timeout <= 0:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return None
+
+    def _remaining_tokens(self) -> int:
+        now = time.time()
+        with self._lock:
+            if now - self._window_start >= 3600:
+                self._window_start = now
+                self._window_tokens = 0
+            return self.tokens_per_hour - self._window_tokens
+
+    def _candidates(self, limit: int) -> List[str]:
+        now = time.time()
+        qa = self.qa
+        with qa._data_lock:
+            items = [item for item in qa.data
+                     if not item.get('answer2') and item['question'] not in qa.tombstones]
+        with self._lock:
+            requested = dict(self._requested)
+            items = [item for item in items if item['question'] not in self._in_flight
+                     and self._failed_until.get(item['question'], 0) <= now]
+        ranked = sorted(items, key=lambda item: requested.get(item['question'], 0) * 10.0
+                        + priority(item, qa.rating_decay, qa.demotion_threshold), reverse=True)
+        return [item['question'] for item in ranked[:limit]]
+
+    def _generate(self, question: str) -> Optional[str]:
+        usage = {}
+        answer = self.qa.ask_openai(question, deadline=self.deadline_seconds, hedge=False, usage=usage,
+                                    caller=self.llm_caller)
+        tokens = usage.get('total_tokens', ESTIMATED_TOKENS_PER_CALL)
+        with self._lock:
+            # Tahmini ayrılan pay gerçek kullanımla düzeltilir
+            self._window_tokens = max(0, self._window_tokens + tokens - ESTIMATED_TOKENS_PER_CALL)
+            self.tokens_used += tokens
+        if not answer or answer.startswith("ChatGPT API hatası:"):
+            raise llm_guard.LLMUnavailable(answer or "boş cevap")
+        return answer
+
+    def run_once(self) -> int:
+        """Bir tur ön üretim yapar; yazılan answer2 sayısını döndürür."""
+        # Paylaşılan devre kesici sadece okunur: /ask tarafında LLM sorunluyken ek yük bindirilmez
+        if self.llm_caller.breaker.state != 'closed' or self.qa.llm_caller.breaker.state != 'closed':
+            return 0
+        affordable = self._remaining_tokens() // ESTIMATED_TOKENS_PER_CALL
+        questions = self._candidates(min(self.batch_size, max(0, affordable)))
+        if not questions:
+            return 0
+        with self._lock:
+            self._window_tokens += len(questions) * ESTIMATED_TOKENS_PER_CALL
+            for question in questions:
+                self._in_flight[question] = self._executor.submit(self._generate, question)
+            futures = {question: self._in_flight[question] for question in questions}
+
+        answers = {}
+        for question, future in futures.items():
+            try:
+                answers[question] = future.result()
+            except Exception as e:
+                self.failed += 1
+                print(f"DEBUG: '{question[:30]}...' için answer2 üretilemedi: {e}")
+                with self._lock:
+                    self._failed_until[question] = time.time() + FAILURE_COOLDOWN_SECONDS
+        filled = self.qa.fill_answer2_batch(answers) if answers else 0
+        with self._lock:
+            for question in questions:
+                self._in_flight.pop(question, None)
+                self._requested.pop(question, None)
+        self.generated += filled
+        return filled
+
+    def _loop(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"DEBUG: answer2 ön üretim turu başarısız: {e}")
+            time.sleep(self.interval)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"generated": self.generated, "failed": self.failed, "tokens_used": self.tokens_used,
+                    "tokens_left_this_hour": self.tokens_per_hour - self._window_tokens, "in_flight": len(self._in_flight),
+                    "breaker": self.llm_caller.breaker.state}
@@ -1,9 +1,15 @@
 import os
+import hmac
 import json
 import random
-import re
+import threading
+import time
 from flask import Flask, request, jsonify
 from main import QASystem 
+from answer2_prefetcher import Answer2Prefetcher
+from quiz_bank import QUIZ_BANK_LOG_PATH, QuizBankLog, QuizReplenisher
+from lexical_index import TOKEN_PATTERN, turkish_lower
+from constants import DEFAULT_TOPIC
 
 # --- Kullanıcı Yönetimi Sınıfı ---
 class UserManager:
@@ -30,16 +36,36 @@ class UserManager:
         self._save_users()
         return True
 
+# Toplu quiz turlarında varsayılan ve en fazla soru sayısı
+DEFAULT_QUIZ_ROUND_SIZE = 10
+MAX_QUIZ_ROUND_SIZE = 50
+
 # --- Quiz Yönetimi Sınıfı ---
 class QuizManager:
-    def __init__(self, questions_path='quiz_questions.json', topics_path='user_topics.json', keywords_path='keywords.json'):
+    def __init__(self, questions_path='quiz_questions.json', topics_path='user_topics.json', keywords_path='keywords.json', lemmatizer=None,
+                 bank_log_path=QUIZ_BANK_LOG_PATH, analytics=None):
         self.questions_path = questions_path
+        # Verilirse (QASystem.lemmatizer) anahtar kelime kontrolleri kelime kökleri üzerinden yapılır
+        self.lemmatizer = lemmatizer
         self.topics_path = topics_path
         self.keywords_path = keywords_path # keywords.json dosyasının yolu
-        self.quiz_questions = self._load_json(self.questions_path)
+        # Sonradan üretilen quiz soruları bu günlüğe eklenir ve yüklemede soru havuzuna katılır
+        self.bank_log = QuizBankLog(bank_log_path) if bank_log_path else None
+        # Sunulan sorular ve tükenen konular bu dinleyicilere bildirilir (ör. QuizReplenisher)
+        self.demand_listeners = []
+        # Verilirse (QASystem.analytics) quiz cevapları ve zayıf konu sayıları konu bazlı özetlere işlenir
+        self.analytics = analytics
+        self.quiz_questions = self._load_quiz_questions()
         self.user_topics = self._load_json(self.topics_path, default=[])
+        # E-posta -> kullanıcı kaydı; her istekte listeyi taramamak için
+        self._users_by_email = {user.get('email'): user for user in self.user_topics}
+        # user_topics.json yazımları sıralanır (Flask çok iş parçacıklı çalışır)
+        self._users_lock = threading.RLock()
+        # Konu -> (soru listesi, kimlik -> soru); liste değişince (yeniden yükleme, yeni sorular) yeniden kurulur
+        self._question_maps = {}
         self.ml_keywords = self._load_json(self.keywords_path, default=[]) # Anahtar kelimeleri yükle
         self.topic_keywords = self._map_topics_to_keywords() # Konu başlıkları için anahtar kelimeler
+        self._build_keyword_lookups()
 
     def _load_json(self, path, default=None):
         if default is None:
@@ -49,10 +75,49 @@ class QuizManager:
             with open(path, 'r', encoding='utf-8') as f: return json.load(f)
         except (json.JSONDecodeError, FileNotFoundError): return default
 
+    def _load_quiz_questions(self):
+        quiz_questions = self._load_json(self.questions_path)
+        if self.bank_log is not None:
+            added = self.bank_log.merge_into(quiz_questions)
+            if added:
+                print(f"DEBUG: Quiz günlüğünden {added} soru havuza eklendi.")
+        return quiz_questions
+
+    def _notify_demand(self, served_topics=(), exhausted_topics=()):
+        for listener in self.demand_listeners:
+            try:
+                listener(list(served_topics), list(exhausted_topics))
+            except Exception as e:
+                print(f"DEBUG: Quiz talep dinleyicisi hatası: {e}")
+
+    def reload(self, changed_paths=None):
+        """quiz_questions.json veya keywords.json dışarıdan değiştiğinde konuları ve anahtar kelimeleri yeniden yükler."""
+        if changed_paths is not None and not any(os.path.abspath(p) in (os.path.abspath(self.questions_path), os.path.abspath(self.keywords_path)) for p in changed_paths):
+            return
+        quiz_questions = self._load_quiz_questions()
+        ml_keywords = self._load_json(self.keywords_path, default=[])
+        # Önce yeni yapılar kurulur, sonra atanır; süren istekler eski sözlükleri kullanır
+        self.quiz_questions, self.ml_keywords = quiz_questions, ml_keywords
+        self.topic_keywords = self._map_topics_to_keywords()
+        self._build_keyword_lookups()
+        print(f"DEBUG: QuizManager yeniden yüklendi: {len(self.quiz_questions)} konu.")
+
     def _save_user_topics(self):
-        """Kullanıcı konularını ve çözülen soruları dosyaya kaydeder."""
-        with open(self.topics_path, 'w', encoding='utf-8') as f:
-            json.dump(self.user_topics, f, ensure_ascii=False, indent=2)
+        """Kullanıcı konularını ve çözülen soruları dosyaya kaydeder (geçici dosyaya yazıp taşıyarak)."""
+        with self._users_lock:
+            tmp_path = self.topics_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.user_topics, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.topics_path)
+
+    def _question_map(self, topic):
+        """Konudaki soruları kimlikle bulmak için sözlük döndürür."""
+        questions = self.quiz_questions.get(topic) or []
+        cached = self._question_maps.get(topic)
+        if cached is None or cached[0] is not questions or len(cached[1]) != len(questions):
+            cached = (questions, {q['id']: q for q in questions})
+            self._question_maps[topic] = cached
+        return cached[1]
             
     def _map_topics_to_keywords(self):
         """
@@ -73,17 +138,40 @@ class QuizManager:
         print(f"Dinamik olarak oluşturulan konu eşlemesi: {mapping}")
         return mapping
 
+    def _normalized_terms(self, text):
+        """Metni kelimelere ayırıp (varsa önbellekteki) köklerine çevirir."""
+        terms = TOKEN_PATTERN.findall(turkish_lower(text))
+        if self.lemmatizer is not None:
+            terms = [self.lemmatizer.lookup(t) for t in terms]
+        return terms
+
+    def _build_keyword_lookups(self):
+        """
+        Anahtar kelimeleri kök dizilerine çevirir. Tek kelimelikler kümede, çok kelimelikler
+        ' kök1 kök2 ' biçiminde tutulur; her istekte düzenli ifade derlemeye gerek kalmaz.
+        """
+        if self.lemmatizer is not None:
+            self.lemmatizer.warm(list(self.ml_keywords) + [k for keywords in self.topic_keywords.values() for k in keywords])
+
+        def phrase(keyword):
+            return " ".join(self._normalized_terms(keyword))
+
+        ml_phrases = {phrase(k) for k in self.ml_keywords} - {""}
+        self._ml_single_terms = {p for p in ml_phrases if " " not in p}
+        self._ml_multi_phrases = [f" {p} " for p in ml_phrases if " " in p]
+        self._topic_phrases = {topic: [f" {phrase(k)} " for k in keywords if phrase(k)] for topic, keywords in self.topic_keywords.items()}
+
     def is_about_ml(self, text):
         """
         Verilen metnin, keywords.json'daki anahtar kelimelerden birını
         bütün bir kelime olarak içerip içermediğini kontrol eder.
+        Kökleme açıksa çekimli biçimler de eşleşir ("ağaçları" -> "ağaç").
         """
-        text_lower = text.lower()
-        for keyword in self.ml_keywords:
-            pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
-            if re.search(pattern, text_lower):
-                return True
-        return False
+        terms = self._normalized_terms(text)
+        if any(t in self._ml_single_terms for t in terms):
+            return True
+        joined = f" {' '.join(terms)} "
+        return any(p in joined for p in self._ml_multi_phrases)
 
     def get_topic_from_question(self, question_text):
         """Sorunun metnine göre en uygun konuyu belirler."""
@@ -91,23 +179,25 @@ class QuizManager:
         # QuizManager'ın kendi içinde tuttuğu quiz_questions.json'daki konuları kullanmaya devam edebiliriz,
         # ancak yeni dinamik konu tespiti için QASystem.get_qa_topic'i kullanmak daha mantıklı.
         # Şimdilik mevcut haliyle bırakıyorum, ancak gelecekte birleştirilebilirler.
-        question_lower = question_text.lower()
+        joined = f" {' '.join(self._normalized_terms(question_text))} "
         
-        for topic, keywords in self.topic_keywords.items():
-            for keyword in keywords:
-                pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
-                if re.search(pattern, question_lower):
-                    return topic
+        for topic, phrases in self._topic_phrases.items():
+            if any(p in joined for p in phrases):
+                return topic
         
-        return "Genel Makine Öğrenmesi"
+        return DEFAULT_TOPIC
 
     def get_user_data(self, email):
         """Kullanıcının tüm veri girişini (konular ve çözülmüş sorular) döndürür."""
-        user_entry = next((user for user in self.user_topics if user.get('email') == email), None)
+        user_entry = self._users_by_email.get(email)
         if not user_entry:
-            user_entry = {"email": email, "topics": [], "answered_questions": {}}
-            self.user_topics.append(user_entry)
-            self._save_user_topics()
+            with self._users_lock:
+                user_entry = self._users_by_email.get(email)
+                if not user_entry:
+                    user_entry = {"email": email, "topics": [], "answered_questions": {}}
+                    self.user_topics.append(user_entry)
+                    self._users_by_email[email] = user_entry
+                    self._save_user_topics()
         return user_entry
 
     def add_topic_for_user(self, email, topic):
@@ -115,9 +205,13 @@ class QuizManager:
         if not topic: return
 
         user_entry = self.get_user_data(email)
-        if topic not in user_entry['topics']:
+        with self._users_lock:
+            if topic in user_entry['topics']:
+                return
             user_entry['topics'].append(topic)
             self._save_user_topics()
+        if self.analytics is not None:
+            self.analytics.record_weak_topic(topic, 1)
 
     def get_user_quiz_status(self, email):
         """Kullanıcının quiz'e girmesi için kaç konusu olduğunu döndürür."""
@@ -127,54 +221,60 @@ class QuizManager:
     def get_question_for_user(self, email):
         """Kullanıcının konularından rastgele bir soru seçer ve döndürür, tekrarları önler."""
         user_data = self.get_user_data(email)
-        user_topics_list = user_data.get('topics', [])
-        answered_questions = user_data.get('answered_questions', {})
+        reset_message = {"status": "reset_needed", "message": "Zayıf olduğunuz konulardaki tüm soruları tamamladınız. Soru havuzu sıfırlandı, yeni sorulara geçebilirsiniz."}
 
-        if not user_topics_list:
-            return {"status": "no_topics", "message": "Tebrikler, zayıf olduğunuz konu kalmadı!"}
+        # Seçim ve answered_questions güncellemesi aynı kullanıcının eşzamanlı istekleriyle (ve dosya yazımıyla) sıralanır
+        with self._users_lock:
+            user_topics_list = user_data.get('topics', [])
+            answered_questions = user_data.get('answered_questions', {})
 
-        # QuizManager'ın kendi quiz_questions'ını kullan
-        available_topics = [t for t in user_topics_list if t in self.quiz_questions and self.quiz_questions[t]]
-        
-        all_questions_exhausted = True
-        for topic in available_topics:
-            all_questions_in_topic_ids = {q['id'] for q in self.quiz_questions[topic]}
-            asked_question_ids_in_topic = set(answered_questions.get(topic, []))
-            if len(all_questions_in_topic_ids) > len(asked_question_ids_in_topic):
-                all_questions_exhausted = False
-                break
-        
-        if all_questions_exhausted and available_topics:
+            if not user_topics_list:
+                return {"status": "no_topics", "message": "Tebrikler, zayıf olduğunuz konu kalmadı!"}
+
+            # QuizManager'ın kendi quiz_questions'ını kullan
+            available_topics = [t for t in user_topics_list if t in self.quiz_questions and self.quiz_questions[t]]
+
+            all_questions_exhausted = True
             for topic in available_topics:
-                if topic in answered_questions:
-                    del answered_questions[topic]
-            user_data['answered_questions'] = answered_questions 
-            self._save_user_topics()
-            return {"status": "reset_needed", "message": "Zayıf olduğunuz konulardaki tüm soruları tamamladınız. Soru havuzu sıfırlandı, yeni sorulara geçebilirsiniz."}
+                all_questions_in_topic_ids = {q['id'] for q in self.quiz_questions[topic]}
+                asked_question_ids_in_topic = set(answered_questions.get(topic, []))
+                if len(all_questions_in_topic_ids) > len(asked_question_ids_in_topic):
+                    all_questions_exhausted = False
+                    break
 
+            if all_questions_exhausted and available_topics:
+                self._notify_demand(exhausted_topics=available_topics)
+                for topic in available_topics:
+                    if topic in answered_questions:
+                        del answered_questions[topic]
+                user_data['answered_questions'] = answered_questions 
+                self._save_user_topics()
+                return reset_message
 
-        random.shuffle(available_topics) 
+            random.shuffle(available_topics) 
 
-        chosen_topic = None
-        chosen_question = None
+            chosen_topic = None
+            chosen_question = None
 
-        for topic in available_topics:
-            asked_question_ids_in_topic = set(answered_questions.get(topic, []))
-            possible_questions = [q for q in self.quiz_questions[topic] if q['id'] not in asked_question_ids_in_topic]
+            for topic in available_topics:
+                asked_question_ids_in_topic = set(answered_questions.get(topic, []))
+                possible_questions = [q for q in self.quiz_questions[topic] if q['id'] not in asked_question_ids_in_topic]
 
-            if possible_questions:
-                chosen_topic = topic
-                chosen_question = random.choice(possible_questions)
-                break
-        
-        if not chosen_question:
-            user_data['answered_questions'] = {} 
+                if possible_questions:
+                    chosen_topic = topic
+                    chosen_question = random.choice(possible_questions)
+                    break
+
+            if not chosen_question:
+                user_data['answered_questions'] = {} 
+                self._save_user_topics()
+                return reset_message
+
+            answered_questions.setdefault(chosen_topic, []).append(chosen_question['id'])
+            user_data['answered_questions'] = answered_questions 
             self._save_user_topics()
-            return {"status": "reset_needed", "message": "Zayıf olduğunuz konulardaki tüm soruları tamamladınız. Soru havuzu sıfırlandı, yeni sorulara geçebilirsiniz."}
-        
-        answered_questions.setdefault(chosen_topic, []).append(chosen_question['id'])
-        user_data['answered_questions'] = answered_questions 
-        self._save_user_topics()
+
+        self._notify_demand(served_topics=[chosen_topic])
 
         return {
             "status": "question_found",
@@ -184,39 +284,114 @@ class QuizManager:
             "options": chosen_question['siklar']
         }
 
+    def _grade_answer(self, topic, question_id, user_answer):
+        """Cevabı puanlar; kullanıcı verisine dokunmaz."""
+        target_question = self._question_map(topic).get(question_id) if topic in self.quiz_questions else None
+        if not target_question: return {"result": "error", "message": "Soru bulunamadı."}
+
+        correct_answer_char = target_question['dogru_cevap']
+        correct_answer_text = target_question['siklar'][correct_answer_char]
+        if str(user_answer).strip().upper() == correct_answer_char:
+            return {"result": "correct", "message": "Doğru cevap!"}
+        return {"result": "incorrect", "message": f"Yanlış cevap. Doğrusu: {correct_answer_char}) {correct_answer_text}"}
+
+    def _complete_topics(self, user_data, topics):
+        """Doğru cevaplanan konuları kullanıcının zayıf konularından ve cevaplanmış sorularından çıkarır."""
+        user_topics_list = user_data.get('topics', [])
+        answered_questions = user_data.get('answered_questions', {})
+        for topic in topics:
+            if topic in user_topics_list:
+                user_topics_list.remove(topic)
+                if self.analytics is not None:
+                    self.analytics.record_weak_topic(topic, -1)
+            answered_questions.pop(topic, None)
+        user_data['topics'] = user_topics_list
+        user_data['answered_questions'] = answered_questions
+
+    def _record_quiz_result(self, topic, result):
+        if self.analytics is not None and result['result'] in ('correct', 'incorrect'):
+            self.analytics.record_quiz_answer(topic, result['result'] == 'correct')
+
     def check_answer_and_update(self, email, topic, question_id, user_answer):
         """Cevabı kontrol eder ve doğruysa kullanıcının listesinden konuyu siler."""
         user_data = self.get_user_data(email)
+        result = self._grade_answer(topic, question_id, user_answer)
+        self._record_quiz_result(topic, result)
+        if result['result'] == 'correct':
+            with self._users_lock:
+                self._complete_topics(user_data, [topic])
+                self._save_user_topics()
+        return result
+
+    def get_question_round(self, email, count):
+        """
+        Kullanıcının zayıf konularından tek seferde en fazla `count` soru seçer; sorular konular arasında
+        sırayla dağıtılır ve tekrar sorulmaz. Tüm seçimler tek dosya yazımıyla kaydedilir.
+        """
+        user_data = self.get_user_data(email)
         user_topics_list = user_data.get('topics', [])
-        answered_questions = user_data.get('answered_questions', {})
-
-        correct_answer_char = None
-        correct_answer_text = ""
-        
-        target_question = None
-        if topic in self.quiz_questions:
-            for q in self.quiz_questions[topic]:
-                if q['id'] == question_id: 
-                    target_question = q
-                    correct_answer_char = q['dogru_cevap']
-                    correct_answer_text = q['siklar'][correct_answer_char]
-                    break
-        
-        if not target_question: return {"result": "error", "message": "Soru bulunamadı."}
+        if not user_topics_list:
+            return {"status": "no_topics", "message": "Tebrikler, zayıf olduğunuz konu kalmadı!"}
 
-        if user_answer.strip().upper() == correct_answer_char:
-            if topic in user_topics_list:
-                user_topics_list.remove(topic)
-                user_data['topics'] = user_topics_list
-            
-            if topic in answered_questions:
-                del answered_questions[topic]
+        with self._users_lock:
+            answered_questions = user_data.get('answered_questions', {})
+            available_topics = [t for t in user_topics_list if t in self.quiz_questions and self.quiz_questions[t]]
+            remaining = {}
+            for topic in available_topics:
+                asked = set(answered_questions.get(topic, []))
+                possible = [q for q in self.quiz_questions[topic] if q['id'] not in asked]
+                random.shuffle(possible)
+                if possible:
+                    remaining[topic] = possible
+
+            if not remaining:
+                self._notify_demand(exhausted_topics=available_topics)
+                for topic in available_topics:
+                    answered_questions.pop(topic, None)
                 user_data['answered_questions'] = answered_questions
-
+                self._save_user_topics()
+                return {"status": "reset_needed", "message": "Zayıf olduğunuz konulardaki tüm soruları tamamladınız. Soru havuzu sıfırlandı, yeni sorulara geçebilirsiniz."}
+
+            topics = list(remaining)
+            random.shuffle(topics)
+            questions = []
+            while len(questions) < count and any(remaining.values()):
+                for topic in topics:
+                    if remaining[topic] and len(questions) < count:
+                        question = remaining[topic].pop()
+                        answered_questions.setdefault(topic, []).append(question['id'])
+                        questions.append({"topic": topic, "question_id": question['id'],
+                                          "question": question['soru'], "options": question['siklar']})
+            user_data['answered_questions'] = answered_questions
             self._save_user_topics()
-            return {"result": "correct", "message": "Doğru cevap!"}
-        else:
-            return {"result": "incorrect", "message": f"Yanlış cevap. Doğrusu: {correct_answer_char}) {correct_answer_text}"}
+
+        self._notify_demand(served_topics=[q['topic'] for q in questions])
+        return {"status": "round_ready", "count": len(questions), "questions": questions}
+
+    def check_answers_batch(self, email, answers):
+        """
+        Bir turun cevaplarını tek çağrıda puanlar. Doğru cevaplanan konular kullanıcının listesinden çıkarılır;
+        değişiklik varsa dosya bir kez yazılır.
+        """
+        user_data = self.get_user_data(email)
+        results, completed = [], []
+        for answer in answers:
+            topic, question_id, user_answer = answer.get('topic'), answer.get('question_id'), answer.get('user_answer')
+            if not all([topic, question_id, user_answer]):
+                result = {"result": "error", "message": "Tüm alanlar zorunludur."}
+            else:
+                result = self._grade_answer(topic, question_id, user_answer)
+                self._record_quiz_result(topic, result)
+            if result['result'] == 'correct' and topic not in completed:
+                completed.append(topic)
+            results.append({"topic": topic, "question_id": question_id, **result})
+
+        if completed:
+            with self._users_lock:
+                self._complete_topics(user_data, completed)
+                self._save_user_topics()
+        summary = {outcome: sum(1 for r in results if r['result'] == outcome) for outcome in ("correct", "incorrect", "error")}
+        return {"results": results, "summary": summary, "remaining_topics": list(user_data.get('topics', []))}
 
     def reset_user_quiz_progress(self, email):
         """
@@ -224,19 +399,104 @@ class QuizManager:
         öğrencinin çalıştığı konuları SİLMEZ.
         """
         user_data = self.get_user_data(email)
-        user_data['answered_questions'] = {}
-        self._save_user_topics()
+        with self._users_lock:
+            user_data['answered_questions'] = {}
+            self._save_user_topics()
         return {"status": "success", "message": "Quiz ilerlemesi sıfırlandı. Konularınız korundu."}
 
 
 # --- Uygulama Kurulumu ve Webhook'lar ---
 app = Flask(__name__)
 print("Sistemler başlatılıyor...")
-qa_system = QASystem(low_score_qa_path='low_score_qa.json', quiz_questions_path='quiz_questions.json')
+qa_system = QASystem(low_score_qa_path='low_score_qa.json', quiz_questions_path='quiz_questions.json',
+                     embedding_server_url=os.environ.get('EMBEDDING_SERVER_URL'),
+                     # Eşik kalibrasyonunun eşiğin altını da görebilmesi için yakın adayların küçük bir kısmı sunulur
+                     threshold_explore_rate=float(os.environ.get('THRESHOLD_EXPLORE_RATE', '0.02')))
 user_manager = UserManager()
-quiz_manager = QuizManager() 
+quiz_manager = QuizManager(lemmatizer=qa_system.lemmatizer, analytics=qa_system.analytics) 
+qa_system.add_reload_listener(quiz_manager.reload)
+# QA_RELOAD_INTERVAL > 0 ise veri dosyaları bu aralıkla izlenir ve değişince yeniden yüklenir
+if float(os.environ.get('QA_RELOAD_INTERVAL', '0')) > 0:
+    qa_system.start_file_watcher(float(os.environ['QA_RELOAD_INTERVAL']))
+# ANSWER2_PREFETCH_TOKENS_PER_HOUR > 0 ise boş answer2 alanları bu saatlik token bütçesiyle arka planda doldurulur
+answer2_prefetcher = None
+if int(os.environ.get('ANSWER2_PREFETCH_TOKENS_PER_HOUR', '0')) > 0:
+    answer2_prefetcher = Answer2Prefetcher(qa_system, tokens_per_hour=int(os.environ['ANSWER2_PREFETCH_TOKENS_PER_HOUR']),
+                                           max_concurrency=int(os.environ.get('ANSWER2_PREFETCH_CONCURRENCY', '2')))
+    answer2_prefetcher.start()
+# QUIZ_REPLENISH_INTERVAL > 0 ise talep gören konuların quiz havuzları bu aralıkla arka planda büyütülür
+if float(os.environ.get('QUIZ_REPLENISH_INTERVAL', '0')) > 0 and quiz_manager.bank_log is not None:
+    quiz_replenisher = QuizReplenisher(qa_system, quiz_manager, quiz_manager.bank_log,
+                                       interval=float(os.environ['QUIZ_REPLENISH_INTERVAL']))
+    quiz_manager.demand_listeners.append(quiz_replenisher.on_demand)
+    # Yeni konuların quiz soruları /ask isteğinde değil, yenileyicinin bir sonraki turunda üretilir
+    qa_system.add_topic_listener(quiz_replenisher.on_new_topic)
+    quiz_replenisher.start()
 print("Sistemler başarıyla yüklendi.")
 
+def _is_admin_request():
+    """
+    X-Admin-Token başlığı ADMIN_TOKEN ortam değişkeniyle eşleşmelidir (sabit zamanlı karşılaştırma).
+    ADMIN_TOKEN tanımlı değilse yönetim uç noktaları kapalıdır; uygulama 0.0.0.0'a bağlandığı için açık bırakılmaz.
+    """
+    token = os.environ.get('ADMIN_TOKEN')
+    if not token:
+        print("DEBUG: ADMIN_TOKEN tanımlı değil, yönetim isteği reddedildi.")
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode('utf-8'), token.encode('utf-8'))
+
+@app.route('/admin/reload', methods=['POST'])
+def handle_admin_reload():
+    """Değişen veri dosyalarını yeniden yükler. {"force": true} ile izlenen tüm dosyalar yeniden okunur."""
+    if not _is_admin_request():
+        return jsonify({"status": "error", "message": "Yetkisiz istek."}), 403
+    data = request.get_json(silent=True) or {}
+    paths = list(qa_system._file_signatures) if data.get('force') else None
+    summary = qa_system.reload_data_files(paths)
+    return jsonify({"status": "success", "summary": summary})
+
+@app.route('/admin/analytics', methods=['GET'])
+def handle_admin_analytics():
+    """
+    Konu ve gün bazlı özetleri döndürür; ham veri dosyaları taranmaz.
+    ?view=summary (varsayılan) | topics | worst | daily | demoted, isteğe bağlı limit, days, min_ratings.
+    """
+    if not _is_admin_request():
+        return jsonify({"status": "error", "message": "Yetkisiz istek."}), 403
+    store = qa_system.analytics
+    if store is None:
+        return jsonify({"status": "error", "message": "Analiz özetleri kapalı."}), 404
+    view = request.args.get('view', 'summary')
+    limit = request.args.get('limit', 10, type=int)
+    min_ratings = request.args.get('min_ratings', type=int)
+    if view == 'summary':
+        result = store.summary()
+    elif view == 'topics':
+        result = store.topic_view(min_ratings or 0)
+    elif view == 'worst':
+        result = store.worst_topics(limit, 3 if min_ratings is None else min_ratings)
+    elif view == 'daily':
+        result = store.daily_view(request.args.get('days', 30, type=int))
+    elif view == 'demoted':
+        result = store.most_demoted(limit)
+    else:
+        return jsonify({"status": "error", "message": f"Bilinmeyen görünüm: '{view}'."}), 400
+    return jsonify({"status": "success", "view": view, "result": result})
+
+@app.route('/admin/analytics/backfill', methods=['POST'])
+def handle_admin_analytics_backfill():
+    """Özetleri ham dosyalardan (puan/geri bildirim günlükleri, data.json, low_score_qa.json, user_topics.json) yeniden hesaplar."""
+    if not _is_admin_request():
+        return jsonify({"status": "error", "message": "Yetkisiz istek."}), 403
+    if qa_system.analytics is None:
+        return jsonify({"status": "error", "message": "Analiz özetleri kapalı."}), 404
+    report = qa_system.analytics.backfill(
+        qa_system.data_path, qa_system.low_score_qa_path,
+        qa_system.rating_log.path if qa_system.rating_log is not None else None,
+        qa_system.feedback_log.path if qa_system.feedback_log is not None else None,
+        quiz_manager.topics_path)
+    return jsonify({"status": "success", "report": report})
+
 @app.route('/login', methods=['POST'])
 def handle_login():
     data = request.get_json()
@@ -256,11 +516,21 @@ def handle_register():
         return jsonify({"status": "success", "message": f"Hoş geldin, {name}!"})
     return jsonify({"status": "error", "message": "Bu e-posta zaten kayıtlı."})
 
+def _remaining_llm_budget(request_started: float) -> float:
+    return qa_system.llm_deadline_seconds - (time.monotonic() - request_started)
+
+def _record_ask(topic: str, outcome: str):
+    if qa_system.analytics is not None:
+        qa_system.analytics.record_ask(topic, outcome)
+
+
 @app.route('/ask', methods=['POST'])
 def handle_ask():
     print("------------------------------------")
     print("'/ask' webhook'u çağrıldı.")
     print(f"Gelen İstek Data (Raw): {request.data}")
+    # LLM çağrıları (konu tespiti ve cevap üretimi) isteğin toplam süre bütçesinden kalan süreyle sınırlanır
+    request_started = time.monotonic()
 
     try:
         data = request.get_json()
@@ -290,9 +560,9 @@ def handle_ask():
     answer_type_offered = "primary" 
 
     # Her durumda konuyu belirle
-    determined_topic = "Genel Makine Öğrenmesi" # Varsayılan
+    determined_topic = DEFAULT_TOPIC # Varsayılan
     if user_question: 
-        determined_topic = qa_system.get_qa_topic(user_question)
+        determined_topic = qa_system.get_qa_topic(user_question, deadline=_remaining_llm_budget(request_started))
     print(f"DEBUG: Belirlenen Konu: '{determined_topic}'")
 
 
@@ -311,17 +581,11 @@ def handle_ask():
 
         # Bu user_question'ın Landbot'tan gelen 'question_text_for_rating' değeri olması beklenir.
         # Yani data.json'daki canonical soru metni olmalı.
-        found_item = None
-        for item in qa_system.data:
-            if item['question'] == user_question: # Match by exact canonical question string
-                found_item = item
-                break
+        # Pasif havuza taşınmakta olan sorular (tombstone) bulunmamış sayılır.
+        found_item = qa_system._get_item_by_question(user_question)
         
         if not found_item:
             print(f"DEBUG: HATA: regenerate için soru aktif havuzda bulunamadı. Landbot'tan gelen soru: '{user_question}'")
-            print(f"DEBUG: Mevcut qa_system.data'daki sorular:")
-            for item in qa_system.data:
-                print(f"  - '{item['question']}'")
             response_text = "Üzgünüm, bu soruyu bulamadım veya yeniden oluşturamıyorum."
             response_status = "error"
             return jsonify({"answer": response_text, "status": response_status})
@@ -332,13 +596,24 @@ def handle_ask():
             print(f"DEBUG: answer2 mevcut. Doğrudan answer2 sunuluyor: '{response_text[:50]}...'")
         else:
             print(f"DEBUG: answer2 boş. OpenAI'den yeni cevap üretiliyor ve answer2'ye kaydediliyor.")
-            ai_answer = qa_system.ask_openai(user_question)
+            ai_answer = None
+            if answer2_prefetcher is not None:
+                answer2_prefetcher.note_regenerate_miss(user_question)
+                # Bu soru için ön üretim sürüyorsa ikinci bir istek yerine onun cevabı beklenir
+                ai_answer = answer2_prefetcher.wait_for(user_question, _remaining_llm_budget(request_started))
+            if not ai_answer:
+                ai_answer = qa_system.ask_openai(user_question, deadline=_remaining_llm_budget(request_started))
             
             if ai_answer and not ai_answer.startswith("ChatGPT API hatası:"):
                 qa_system.update_answer2(user_question, ai_answer) 
                 response_text = ai_answer
                 answer_type_offered = "secondary"
                 print(f"DEBUG: OpenAI'den yeni answer2 üretildi: '{response_text[:50]}...'")
+            elif found_item.get('answer'):
+                # Kademeli düşüş: yeni cevap üretilemediyse mevcut birincil cevap sunulur
+                response_text = found_item['answer']
+                response_status = "degraded"
+                print(f"DEBUG: answer2 üretilemedi, birincil cevap sunuluyor: {ai_answer}")
             else:
                 response_text = "Üzgünüm, şu anda yeni bir cevap üretemiyorum veya ChatGPT bir hata döndürdü."
                 response_status = "error"
@@ -349,26 +624,42 @@ def handle_ask():
 
     else: # Standart /ask isteği
         print(f"DEBUG: Standart 'ask' isteği algılandı.")
-        matched_item = qa_system.find_best_match(user_question)
+        # Eşleşme bulunamazsa kademeli düşüş aynı embedding ve adayları kullanır
+        retrieval = {}
+        matched_item = qa_system.find_best_match(user_question, topic=determined_topic, retrieval=retrieval)
         
         if matched_item: 
             response_text = matched_item['answer'] 
             question_for_rating = matched_item['question'] # THIS IS THE CANONICAL QUESTION FROM data.json
             answer_type_offered = "primary"
+            _record_ask(determined_topic, 'matched')
             print(f"DEBUG: data.json'dan eşleşen birincil cevap bulundu: '{response_text[:50]}...'")
         else:
             print("DEBUG: Veritabanında uygun birincil cevap bulunamadı veya eşik altında kaldı, ChatGPT'den cevap alınıyor...")
-            ai_answer = qa_system.ask_openai(user_question)
+            ai_answer = qa_system.ask_openai(user_question, deadline=_remaining_llm_budget(request_started))
+            fallback_item = None
+            if not ai_answer or ai_answer.startswith("ChatGPT API hatası:"):
+                # Kademeli düşüş: LLM cevap veremediyse eşik altındaki en iyi eşleşme sunulur
+                fallback_item = qa_system.closest_match(user_question, topic=determined_topic, **retrieval)
             
             if ai_answer and not ai_answer.startswith("ChatGPT API hatası:"):
                 qa_system.add_new_qa_to_data(user_question, ai_answer, determined_topic) 
                 response_text = ai_answer
                 question_for_rating = user_question 
                 answer_type_offered = "primary"
+                _record_ask(determined_topic, 'llm')
                 print(f"DEBUG: ChatGPT'den yeni birincil cevap alındı ve eklenmeye çalışıldı: '{response_text[:50]}...'")
+            elif fallback_item:
+                response_text = fallback_item['answer']
+                question_for_rating = fallback_item['question']
+                answer_type_offered = "primary"
+                response_status = "degraded"
+                _record_ask(determined_topic, 'degraded')
+                print(f"DEBUG: ChatGPT cevap veremedi, eşik altındaki en yakın cevap sunuluyor: '{fallback_item['question']}'")
             else:
                 response_text = "Üzgünüm, şu anda cevap veremiyorum veya ChatGPT bir hata döndürdü."
                 response_status = "error"
+                _record_ask(determined_topic, 'error')
                 print(f"DEBUG: ChatGPT hatası veya geçersiz cevap: {response_text}")
                 return jsonify({"answer": response_text, "status": response_status})
 
@@ -438,6 +729,11 @@ def handle_rate_answer():
         return jsonify({"status": "error", "message": f"Puanlama sırasında bir hata oluştu: {str(e)}"}), 500
 
 
+def _non_string_fields(data, fields=('topic', 'question_id')):
+    """Verilmiş ama metin olmayan alanların adları (ör. liste veya nesne gönderilen konu/soru kimliği)."""
+    return [field for field in fields if data.get(field) is not None and not isinstance(data.get(field), str)]
+
+
 @app.route('/get_quiz_status', methods=['POST'])
 def get_quiz_status():
     data = request.get_json()
@@ -460,9 +756,42 @@ def check_quiz_answer():
     email, topic, question_id, user_answer = data.get('email'), data.get('topic'), data.get('question_id'), data.get('user_answer')
     if not all([email, topic, question_id, user_answer]):
         return jsonify({"error": "Tüm alanlar zorunludur."}), 400
+    invalid = _non_string_fields(data)
+    if invalid:
+        return jsonify({"error": f"{', '.join(invalid)} metin olmalıdır."}), 400
     result = quiz_manager.check_answer_and_update(email, topic, question_id, user_answer)
     return jsonify(result)
 
+@app.route('/get_quiz_round', methods=['POST'])
+def get_quiz_round():
+    """Kullanıcının zayıf konularından tek yanıtta bir tur (varsayılan 10) soru döndürür."""
+    data = request.get_json(silent=True) or {}
+    email = data.get('email')
+    if not email: return jsonify({"error": "Email zorunludur."}), 400
+    try:
+        count = int(data.get('count', DEFAULT_QUIZ_ROUND_SIZE))
+    except (TypeError, ValueError):
+        return jsonify({"error": "count bir sayı olmalıdır."}), 400
+    count = max(1, min(count, MAX_QUIZ_ROUND_SIZE))
+    return jsonify(quiz_manager.get_question_round(email, count))
+
+@app.route('/check_quiz_answers', methods=['POST'])
+def check_quiz_answers():
+    """{"email", "answers": [{"topic", "question_id", "user_answer"}, ...]} cevaplarını tek çağrıda puanlar."""
+    data = request.get_json(silent=True) or {}
+    email, answers = data.get('email'), data.get('answers')
+    if not email or not isinstance(answers, list) or not answers:
+        return jsonify({"error": "Email ve answers listesi zorunludur."}), 400
+    if len(answers) > MAX_QUIZ_ROUND_SIZE:
+        return jsonify({"error": f"Tek seferde en fazla {MAX_QUIZ_ROUND_SIZE} cevap gönderilebilir."}), 400
+    if not all(isinstance(a, dict) for a in answers):
+        return jsonify({"error": "answers listesindeki her öğe bir nesne olmalıdır."}), 400
+    for i, answer in enumerate(answers):
+        invalid = _non_string_fields(answer)
+        if invalid:
+            return jsonify({"error": f"answers[{i}]: {', '.join(invalid)} metin olmalıdır."}), 400
+    return jsonify(quiz_manager.check_answers_batch(email, answers))
+
 @app.route('/reset_quiz_progress', methods=['POST'])
 def reset_quiz_progress():
     data = request.get_json()
@@ -0,0 +1,6 @@
+"""
+QA sisteminin sıcak yolları için performans ölçüm araçları.
+
+Tüm ölçümler yerel, deterministik bir OpenAI uyumlu stub sunucusuna karşı çalışır;
+gerçek API anahtarı veya ağ erişimi gerekmez.
+"""
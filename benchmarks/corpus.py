@@ -0,0 +1,74 @@
+import json
+import os
+import random
+import shutil
+
+import rating_store
+from constants import DEFAULT_TOPIC
+
+# data.json'un bulunduğu proje kök dizini
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Çalışma dizinine olduğu gibi kopyalanan yardımcı dosyalar
+SUPPORT_FILES = ['keywords.json', 'stopwords.json', 'quiz_questions.json']
+
+_PREFIXES = ["", "Kısaca, ", "Bir örnekle, ", "Yeni başlayan biri için ", "Pratikte ", "Teoride "]
+_SUFFIXES = ["", " Detaylı açıklar mısın?", " Neden önemli?", " Nerede kullanılır?", " Basitçe anlatır mısın?"]
+
+
+def load_base_data(path=None):
+    with open(path or os.path.join(PROJECT_ROOT, 'data.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def synthesize_corpus(base_data, size, seed=0):
+    """
+    data.json kayıtlarını çoğaltarak `size` boyutunda, soru metinleri birbirinden farklı bir korpus üretir.
+    İlk len(base_data) kayıt orijinal sorulardır; geri kalanlar önek/sonek ve sıra numarası eklenmiş varyasyonlardır.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    seen = set()
+    for i in range(size):
+        source = base_data[i % len(base_data)]
+        if i < len(base_data):
+            question = source['question']
+        else:
+            question = f"{rng.choice(_PREFIXES)}{source['question']}{rng.choice(_SUFFIXES)} (v{i // len(base_data)})"
+        if question in seen:
+            question = f"{question} #{i}"
+        seen.add(question)
+        ratings = [rng.randint(3, 5) for _ in range(rng.randint(0, 3))]
+        corpus.append({
+            "question": question,
+            "answer": source['answer'],
+            "answer2": "",
+            "sorulma_sayisi": len(ratings),
+            "rating_stats": rating_store.stats_from_ratings(ratings),
+            "current_average": sum(ratings) / len(ratings) if ratings else 0.0,
+            "topic": source.get('topic', DEFAULT_TOPIC)
+        })
+    return corpus
+
+
+def prepare_workdir(workdir, corpus):
+    """
+    QASystem'in göreli yollarla çalışabileceği bağımsız bir çalışma dizini hazırlar:
+    korpus, yardımcı JSON dosyaları, boş kullanıcı/puan dosyaları ve stub API anahtarı.
+    """
+    if os.path.exists(workdir):
+        shutil.rmtree(workdir)
+    os.makedirs(workdir)
+    for name in SUPPORT_FILES:
+        shutil.copyfile(os.path.join(PROJECT_ROOT, name), os.path.join(workdir, name))
+
+    files = {
+        'data.json': corpus,
+        'low_score_qa.json': [],
+        'user_topics.json': [],
+        'users.json': [{"name": "Bench", "email": "bench@example.com", "sifre": "bench"}],
+        'openai_api.json': {"api_key": "stub-key"},
+    }
+    for name, payload in files.items():
+        with open(os.path.join(workdir, name), 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+    return workdir
@@ -0,0 +1,172 @@
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from benchmarks.corpus import load_base_data, synthesize_corpus
+from benchmarks.run_benchmarks import summarize
+
+
+def similarity_from_distance(space, distance):
+    """QASystem._distance_to_similarity ile aynı dönüşüm: birim vektörler için 1 - L2² (= 2·cos - 1)."""
+    cosine = 1 - distance / 2 if space == 'l2' else 1 - distance
+    return 2 * cosine - 1
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def synthetic_vectors(size, dim, queries, rng, clusters=64, noise=0.6):
+    """
+    Konulara benzeyen kümelerden birim vektörler üretir. Sorguların yarısı korpustaki bir vektörün
+    gürültülü kopyası (başka ifadeyle sorulmuş soru), yarısı rastgele bir küme merkezinin çevresidir.
+    """
+    centers = rng.standard_normal((clusters, dim))
+    corpus = normalize_rows(centers[rng.integers(0, clusters, size)] + noise * rng.standard_normal((size, dim)))
+    paraphrases = corpus[rng.integers(0, size, queries // 2)] + 0.5 / np.sqrt(dim) * rng.standard_normal((queries // 2, dim))
+    novel = centers[rng.integers(0, clusters, queries - queries // 2)] + noise * rng.standard_normal((queries - queries // 2, dim))
+    return corpus, normalize_rows(np.vstack([paraphrases, novel]))
+
+
+def model_vectors(size, queries, model_name, seed):
+    """Sentetik korpusun sorularını gerçek embedding modeliyle kodlar; sorgular aynı soruların farklı ifadeleridir."""
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name, device="cpu")
+    base_data = load_base_data()
+    corpus = synthesize_corpus(base_data, size, seed)
+    held_out = synthesize_corpus(base_data, size + queries, seed + 1)[-queries:]
+    encode = lambda texts: normalize_rows(model.encode([t['question'] for t in texts], batch_size=64, show_progress_bar=True))
+    return encode(corpus), encode(held_out)
+
+
+def exact_neighbors(corpus, queries, k, block=1024):
+    """Brute-force kosinüs ile her sorgunun en yakın k komşusu ve en yüksek kosinüs değeri."""
+    top_ids, top_cos = [], []
+    for start in range(0, len(queries), block):
+        sims = queries[start:start + block] @ corpus.T
+        idx = np.argpartition(-sims, min(k, sims.shape[1] - 1), axis=1)[:, :k]
+        order = np.take_along_axis(sims, idx, axis=1).argsort(axis=1)[:, ::-1]
+        idx = np.take_along_axis(idx, order, axis=1)
+        top_ids.append(idx)
+        top_cos.append(np.take_along_axis(sims, idx[:, :1], axis=1)[:, 0])
+    return np.vstack(top_ids), np.concatenate(top_cos)
+
+
+def measure_exact(corpus, queries):
+    latencies = []
+    wall_start = time.perf_counter()
+    for q in queries:
+        start = time.perf_counter()
+        int(np.argmax(corpus @ q))
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, time.perf_counter() - wall_start)
+
+
+def bench_configuration(client, corpus, queries, exact_ids, exact_cos, space, m, construction_ef, search_efs, k, threshold):
+    """Bir (ölçü, M, kurulum genişliği) için indeksi kurar ve her arama genişliğinde isabet/gecikme ölçer."""
+    name = f"bench_{space}_{m}_{construction_ef}"
+    collection = client.create_collection(name=name, configuration={"hnsw": {
+        "space": space, "max_neighbors": m, "ef_construction": construction_ef, "ef_search": search_efs[0]}})
+    ids = [str(i) for i in range(len(corpus))]
+    start = time.perf_counter()
+    for offset in range(0, len(corpus), 5000):
+        collection.add(ids=ids[offset:offset + 5000], embeddings=corpus[offset:offset + 5000].tolist())
+    build_seconds = time.perf_counter() - start
+
+    exact_accept = 2 * exact_cos - 1 >= threshold
+    rows = []
+    for ef in search_efs:
+        collection.modify(configuration={"hnsw": {"ef_search": ef}})
+        latencies, found, sims = [], [], []
+        wall_start = time.perf_counter()
+        for q in queries:
+            t = time.perf_counter()
+            result = collection.query(query_embeddings=[q.tolist()], n_results=k, include=['distances'])
+            latencies.append(time.perf_counter() - t)
+            found.append([int(i) for i in result['ids'][0]])
+            sims.append(similarity_from_distance(space, result['distances'][0][0]))
+        wall = time.perf_counter() - wall_start
+
+        recall_1 = np.mean([f[0] == e[0] for f, e in zip(found, exact_ids)])
+        recall_k = np.mean([len(set(f) & set(e)) / k for f, e in zip(found, exact_ids)])
+        # Aynı eşik, tam aramayla aynı kabul/ret kararını veriyor mu
+        agreement = np.mean((np.asarray(sims) >= threshold) == exact_accept)
+        max_shift = float(np.max(np.abs(np.asarray(sims) - (2 * exact_cos - 1))))
+        stats = summarize(latencies, wall)
+        stats.update({"space": space, "m": m, "construction_ef": construction_ef, "search_ef": ef,
+                      "build_seconds": round(build_seconds, 3), "recall@1": round(float(recall_1), 4),
+                      f"recall@{k}": round(float(recall_k), 4), "decision_agreement": round(float(agreement), 4),
+                      "max_similarity_shift": round(max_shift, 4)})
+        rows.append(stats)
+    client.delete_collection(name)
+    return rows
+
+
+def parse_list(text, cast=int):
+    return [cast(x) for x in text.split(',') if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChromaDB ölçü ve HNSW ayarlarının isabet (tam aramaya göre) ve gecikmesini ölçer.")
+    parser.add_argument('--sizes', default="1000,10000", help="Virgülle ayrılmış korpus boyutları.")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--dim', type=int, default=384, help="Sentetik vektör boyutu (--model verilmezse).")
+    parser.add_argument('--model', default=None, help="Verilirse sentetik korpus bu embedding modeliyle kodlanır.")
+    parser.add_argument('--spaces', default="cosine,l2")
+    parser.add_argument('--m', default="16", help="HNSW komşu sayıları (max_neighbors).")
+    parser.add_argument('--construction-ef', default="100")
+    parser.add_argument('--search-ef', default="10,50,100")
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--threshold', type=float, default=0.8, help="Karar uyumu için kullanılan similarity_threshold.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=None, help="Geçici ChromaDB dizini.")
+    parser.add_argument('--save', default=None, help="Sonuçların yazılacağı JSON dosyası.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="qa_index_bench_")
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "queries": args.queries, "threshold": args.threshold, "sizes": {}}
+    try:
+        client = chromadb.PersistentClient(path=workdir)
+        for size in parse_list(args.sizes):
+            if args.model:
+                corpus, queries = model_vectors(size, args.queries, args.model, args.seed)
+            else:
+                corpus, queries = synthetic_vectors(size, args.dim, args.queries, rng)
+            exact_ids, exact_cos = exact_neighbors(corpus, queries, args.k)
+            rows = []
+            for space in parse_list(args.spaces, str):
+                for m in parse_list(args.m):
+                    for construction_ef in parse_list(args.construction_ef):
+                        rows.extend(bench_configuration(client, corpus, queries, exact_ids, exact_cos, space, m,
+                                                        construction_ef, parse_list(args.search_ef), args.k, args.threshold))
+            report["sizes"][str(size)] = {"exact": measure_exact(corpus, queries), "configurations": rows}
+            print_size_report(size, report["sizes"][str(size)], args.k)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Sonuçlar '{args.save}' dosyasına kaydedildi.")
+
+
+def print_size_report(size, results, k):
+    exact = results["exact"]
+    print(f"\n=== Korpus boyutu: {size} (tam arama p50 {exact['p50_ms']} ms, p95 {exact['p95_ms']} ms) ===")
+    print(f"{'ölçü':<8}{'M':>4}{'kurulum':>9}{'arama':>7}{'recall@1':>10}{f'recall@{k}':>10}{'karar':>8}{'kayma':>8}{'p50 ms':>9}{'p95 ms':>9}{'kurulum sn':>12}")
+    for row in results["configurations"]:
+        print(f"{row['space']:<8}{row['m']:>4}{row['construction_ef']:>9}{row['search_ef']:>7}{row['recall@1']:>10}"
+              f"{row[f'recall@{k}']:>10}{row['decision_agreement']:>8}{row['max_similarity_shift']:>8}"
+              f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['build_seconds']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Konu sorusuna verilecek deterministik cevaplar
+STUB_TOPICS = ["Random Forest", "Supervised Learning", "Deep Learning Fundamentals", "Genel Makine Öğrenmesi"]
+
+
+def _digest(text):
+    return int(hashlib.sha1(text.encode('utf-8')).hexdigest(), 16)
+
+
+def _quiz_questions(topic, count):
+    slug = re.sub(r'\W+', '_', topic.lower()).strip('_') or 'konu'
+    return [{
+        "id": f"{slug}_stub_{i}",
+        "soru": f"{topic} ile ilgili {i + 1}. örnek soru?",
+        "siklar": {"A": "Birinci şık", "B": "İkinci şık", "C": "Üçüncü şık", "D": "Dördüncü şık"},
+        "dogru_cevap": "ABCD"[i % 4]
+    } for i in range(count)]
+
+
+def stub_completion(messages, response_format=None):
+    """İstem türüne göre deterministik bir cevap metni üretir."""
+    prompt = messages[-1].get('content', '') if messages else ''
+    if 'hangi makine öğrenmesi alt konularıyla' in prompt:
+        questions = re.findall(r'^\d+\. (.*)$', prompt, flags=re.MULTILINE)
+        return json.dumps({"topics": [STUB_TOPICS[_digest(q) % len(STUB_TOPICS)] for q in questions]}, ensure_ascii=False)
+    if 'hangi makine öğrenmesi alt konusuyla' in prompt:
+        return STUB_TOPICS[_digest(prompt) % len(STUB_TOPICS)]
+    if (response_format or {}).get('type') == 'json_object' or 'quiz sorusu' in prompt:
+        topic_match = re.search(r"'([^']+)' başlığı", prompt)
+        count_match = re.search(r"başlığı altında (\d+)", prompt)
+        topic = topic_match.group(1) if topic_match else "Makine Öğrenmesi"
+        count = int(count_match.group(1)) if count_match else 3
+        return json.dumps({"questions": _quiz_questions(topic, count)}, ensure_ascii=False)
+    return f"Bu, yerel stub model tarafından üretilmiş deterministik bir cevaptır (#{_digest(prompt) % 100000})."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """OpenAI Chat Completions ve Models uç noktalarının en küçük uyumlu alt kümesi."""
+
+    latency_seconds = 0.0
+    # İsteklerin bu oranı slow_latency_seconds kadar geciktirilir (kuyruk gecikmesi benzetimi)
+    slow_ratio = 0.0
+    slow_latency_seconds = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json({"object": "list", "data": [{"id": "gpt-3.5-turbo", "object": "model", "owned_by": "stub"}]})
+        else:
+            self._send_json({"error": {"message": "not found"}}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json({"error": {"message": "not found"}}, status=404)
+            return
+        if self.slow_ratio and random.random() < self.slow_ratio:
+            time.sleep(self.slow_latency_seconds)
+        elif self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        content = stub_completion(request.get('messages', []), request.get('response_format'))
+        self._send_json({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": request.get('model', 'gpt-3.5-turbo'),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        })
+
+
+def start_stub_server(host='127.0.0.1', port=0, latency_ms=0.0, slow_ratio=0.0, slow_latency_ms=0.0):
+    """
+    Stub sunucusunu arka plan iş parçacığında başlatır.
+    (sunucu, base_url) döndürür; base_url doğrudan OPENAI_BASE_URL olarak kullanılabilir.
+    """
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'latency_seconds': latency_ms / 1000.0, 'slow_ratio': slow_ratio,
+                                                             'slow_latency_seconds': slow_latency_ms / 1000.0})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministik, OpenAI uyumlu yerel LLM stub sunucusu.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Her cevaptan önce eklenecek yapay gecikme.")
+    parser.add_argument('--slow-ratio', type=float, default=0.0, help="Yavaş cevaplanacak isteklerin oranı (0-1).")
+    parser.add_argument('--slow-latency-ms', type=float, default=0.0, help="Yavaş isteklere eklenecek gecikme.")
+    args = parser.parse_args()
+    server, base_url = start_stub_server(port=args.port, latency_ms=args.latency_ms, slow_ratio=args.slow_ratio,
+                                         slow_latency_ms=args.slow_latency_ms)
+    print(f"Stub LLM sunucusu çalışıyor: {base_url} (OPENAI_BASE_URL olarak ayarlayın)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.corpus import PROJECT_ROOT, load_base_data, prepare_workdir, synthesize_corpus
+from benchmarks.llm_stub import start_stub_server
+
+SERVER_BOOT_TIMEOUT_SECONDS = 300
+
+
+# --- Oturum izleri ---
+
+def synthesize_session(session_id, corpus, rng, asks=5, quiz_rounds=3, novel_ratio=0.1):
+    """
+    Landbot'taki tipik bir öğrenci oturumunu taklit eden olay listesi üretir:
+    kayıt/giriş, sorular (bir kısmı veri setinde olmayan), yeniden üretme, puanlama ve quiz turları.
+    """
+    email = f"student{session_id}@example.com"
+    events = [{"op": "register", "email": email, "name": f"Öğrenci {session_id}", "sifre": "pw"},
+              {"op": "login", "email": email, "sifre": "pw"}]
+    for i in range(asks):
+        if rng.random() < novel_ratio:
+            question = f"Oturum {session_id} soru {i}: transformer dikkat başlıkları neden ölçeklenir?"
+        else:
+            question = rng.choice(corpus)['question']
+        events.append({"op": "ask", "email": email, "question": question})
+        roll = rng.random()
+        if roll < 0.2:
+            events.append({"op": "regenerate", "email": email})
+        if roll < 0.7:
+            events.append({"op": "rate", "rating": rng.choice([1, 2, 3, 4, 5, 5])})
+    events.append({"op": "quiz_status", "email": email})
+    for _ in range(quiz_rounds):
+        events.append({"op": "quiz_round", "email": email, "user_answer": rng.choice("ABCD")})
+    return events
+
+
+def load_traces(path):
+    """Her satırı {"session": [olaylar]} olan JSONL iz dosyasını okur."""
+    sessions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                sessions.append(json.loads(line)['session'])
+    return sessions
+
+
+# --- İstemci ---
+
+class SessionClient:
+    """Bir oturumun olaylarını sunucuya sırayla gönderir; gecikme ve hataları kaydeder."""
+
+    def __init__(self, base_url, stats):
+        self.base_url = base_url
+        self.stats = stats
+        self.last_answer = None
+
+    def post(self, op, path, payload):
+        data = json.dumps(payload).encode('utf-8')
+        request = urllib.request.Request(self.base_url + path, data=data, headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                body = json.loads(response.read().decode('utf-8'))
+            self.stats.record(op, time.perf_counter() - start, ok=True, app_error=body.get('status') == 'error')
+            return body
+        except urllib.error.HTTPError as e:
+            # 4xx cevapları uygulamanın doğrulama cevaplarıdır, sunucu hatası sayılmaz
+            self.stats.record(op, time.perf_counter() - start, ok=e.code < 500)
+        except Exception:
+            self.stats.record(op, time.perf_counter() - start, ok=False)
+        return None
+
+    def replay(self, events):
+        for event in events:
+            op = event['op']
+            if op == 'register':
+                self.post(op, '/register', {k: event[k] for k in ('name', 'email', 'sifre')})
+            elif op == 'login':
+                self.post(op, '/login', {"email": event['email'], "sifre": event['sifre']})
+            elif op == 'ask':
+                self.last_answer = self.post(op, '/ask', {"question": event['question'], "email": event['email']})
+            elif op == 'regenerate' and self.last_answer and self.last_answer.get('question_text_for_rating'):
+                self.last_answer = self.post(op, '/ask', {"question": self.last_answer['question_text_for_rating'],
+                                                          "email": event['email'], "request_type": "regenerate"})
+            elif op == 'rate' and self.last_answer and self.last_answer.get('answer'):
+                self.post(op, '/rate_answer', {"question": self.last_answer.get('question_text_for_rating'),
+                                               "answer": self.last_answer['answer'], "rating": event['rating'],
+                                               "answer_type_offered": self.last_answer.get('answer_type_offered', 'primary')})
+            elif op == 'quiz_status':
+                self.post(op, '/get_quiz_status', {"email": event['email']})
+            elif op == 'quiz_round':
+                question = self.post('get_quiz_question', '/get_quiz_question', {"email": event['email']})
+                if question and question.get('status') == 'question_found':
+                    self.post('check_quiz_answer', '/check_quiz_answer', {
+                        "email": event['email'], "topic": question['topic'],
+                        "question_id": question['question_id'], "user_answer": event['user_answer']})
+
+
+class LoadStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.app_errors = {}
+
+    def record(self, op, seconds, ok, app_error=False):
+        with self.lock:
+            self.latencies.setdefault(op, []).append(seconds)
+            if not ok:
+                self.errors[op] = self.errors.get(op, 0) + 1
+            if app_error:
+                self.app_errors[op] = self.app_errors.get(op, 0) + 1
+
+    def summary(self, wall_seconds):
+        def describe(values):
+            ms = np.asarray(values) * 1000.0
+            return {"count": int(ms.size), "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                    "p95_ms": round(float(np.percentile(ms, 95)), 2), "p99_ms": round(float(np.percentile(ms, 99)), 2)}
+
+        all_latencies = [v for values in self.latencies.values() for v in values]
+        result = {
+            "requests": len(all_latencies),
+            "throughput_rps": round(len(all_latencies) / wall_seconds, 2) if wall_seconds else 0.0,
+            "errors": sum(self.errors.values()),
+            "app_errors": sum(self.app_errors.values()),
+            "overall": describe(all_latencies) if all_latencies else {},
+            "per_op": {},
+        }
+        for op, values in sorted(self.latencies.items()):
+            result["per_op"][op] = dict(describe(values), errors=self.errors.get(op, 0), app_errors=self.app_errors.get(op, 0))
+        return result
+
+
+# --- Sunucu ---
+
+def start_app_server(workdir, port, openai_base_url, log_path):
+    """app.py'yi çalışma dizininde, çok iş parçacıklı Flask sunucusu olarak başlatır."""
+    env = dict(os.environ, OPENAI_BASE_URL=openai_base_url, PYTHONPATH=PROJECT_ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    code = f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True, debug=False)"
+    log = open(log_path, 'w', encoding='utf-8')
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+
+    deadline = time.time() + SERVER_BOOT_TIMEOUT_SECONDS
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"app.py başlatılamadı, ayrıntılar: {log_path}")
+        try:
+            urllib.request.urlopen(urllib.request.Request(base_url + '/login', data=b'{}', headers={'Content-Type': 'application/json'}), timeout=2)
+        except urllib.error.HTTPError:
+            return process, base_url
+        except Exception:
+            time.sleep(0.5)
+            continue
+        return process, base_url
+    process.terminate()
+    raise RuntimeError("app.py zamanında hazır olmadı.")
+
+
+def stop_app_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# --- Bozulma kontrolleri ---
+
+def check_state(workdir):
+    """Yük sonrası JSON dosyalarının ve vektör indeksinin tutarlılığını kontrol eder; bulunan sorunları döndürür."""
+    problems = []
+    loaded = {}
+    for name in ('data.json', 'low_score_qa.json', 'users.json', 'user_topics.json', 'quiz_questions.json'):
+        path = os.path.join(workdir, name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                loaded[name] = json.load(f)
+        except Exception as e:
+            problems.append(f"{name}: okunamadı ({e})")
+
+    data = loaded.get('data.json')
+    if isinstance(data, list):
+        questions = [item.get('question') for item in data]
+        if len(questions) != len(set(questions)):
+            problems.append(f"data.json: {len(questions) - len(set(questions))} tekrar eden soru")
+        for item in data:
+            missing = [k for k in ('question', 'answer', 'sorulma_sayisi', 'current_average') if k not in item]
+            if missing:
+                problems.append(f"data.json: '{str(item.get('question'))[:40]}' kaydında eksik alanlar {missing}")
+                break
+        try:
+            import chromadb
+            count = chromadb.PersistentClient(path=os.path.join(workdir, 'chroma_db_persistent')).get_collection("qa_collection_persistent").count()
+            if count != len(data):
+                problems.append(f"ChromaDB: koleksiyonda {count} öğe var, data.json'da {len(data)} kayıt")
+        except Exception as e:
+            problems.append(f"ChromaDB: koleksiyon okunamadı ({e})")
+
+    users = loaded.get('users.json')
+    if isinstance(users, list):
+        emails = [u.get('email') for u in users]
+        if len(emails) != len(set(emails)):
+            problems.append("users.json: tekrar eden e-posta")
+
+    user_topics = loaded.get('user_topics.json')
+    if isinstance(user_topics, list):
+        emails = [u.get('email') for u in user_topics]
+        if len(emails) != len(set(emails)):
+            problems.append("user_topics.json: tekrar eden e-posta")
+    return problems
+
+
+# --- Çalıştırma ---
+
+def run_level(workers, sessions, corpus, workdir, port, openai_base_url):
+    prepare_workdir(workdir, corpus)
+    process, base_url = start_app_server(workdir, port, openai_base_url, os.path.join(workdir, 'server.log'))
+    stats = LoadStats()
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda events: SessionClient(base_url, stats).replay(events), sessions))
+        wall = time.perf_counter() - start
+    finally:
+        stop_app_server(process)
+    result = stats.summary(wall)
+    result["workers"] = workers
+    result["state_problems"] = check_state(workdir)
+    return result
+
+
+def print_level(result):
+    overall = result.get("overall", {})
+    print(f"\n=== {result['workers']} istemci: {result['requests']} istek, {result['throughput_rps']} istek/sn, "
+          f"p95 {overall.get('p95_ms')} ms, p99 {overall.get('p99_ms')} ms, "
+          f"sunucu hatası {result['errors']}, uygulama hatası {result['app_errors']} ===")
+    for op, stats in result["per_op"].items():
+        print(f"  {op:<20} n={stats['count']:<6} p50 {stats['p50_ms']:>8} ms  p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  hata {stats['errors']}")
+    if result["state_problems"]:
+        print("  ❌ Durum kontrolü sorunları:")
+        for problem in result["state_problems"]:
+            print(f"    - {problem}")
+    else:
+        print("  ✅ JSON dosyaları ve indeks tutarlı.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="app.py'ye eşzamanlı Landbot oturumları oynatan yük testi.")
+    parser.add_argument('--workers', default="1,4,16", help="Virgülle ayrılmış eşzamanlı istemci sayıları.")
+    parser.add_argument('--sessions', type=int, default=50, help="Sentezlenecek oturum sayısı.")
+    parser.add_argument('--traces', default=None, help="Kayıtlı oturum izleri (JSONL, her satır {'session': [...]}).")
+    parser.add_argument('--corpus-size', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--llm-latency-ms', type=float, default=300.0, help="Stub LLM gecikmesi.")
+    parser.add_argument('--workdir', default=None)
+    parser.add_argument('--save', default=None, help="Sonuçların kaydedileceği JSON dosyası.")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = synthesize_corpus(load_base_data(), args.corpus_size, args.seed)
+    sessions = load_traces(args.traces) if args.traces else [synthesize_session(i, corpus, rng) for i in range(args.sessions)]
+    workdir_root = args.workdir or tempfile.mkdtemp(prefix="qa_load_")
+
+    server, openai_base_url = start_stub_server(latency_ms=args.llm_latency_ms)
+    results = []
+    try:
+        for workers in [int(w) for w in args.workers.split(',') if w.strip()]:
+            print(f"🚦 {workers} istemci ile {len(sessions)} oturum oynatılıyor...")
+            result = run_level(workers, sessions, corpus, os.path.join(workdir_root, f"workers_{workers}"), args.port, openai_base_url)
+            print_level(result)
+            results.append(result)
+    finally:
+        server.shutdown()
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({"sessions": len(sessions), "corpus_size": args.corpus_size, "levels": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Sonuçlar '{args.save}' dosyasına kaydedildi.")
+    if any(r["state_problems"] or r["errors"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
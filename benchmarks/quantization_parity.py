@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import PROJECT_ROOT, load_base_data, prepare_workdir, synthesize_corpus
+from benchmarks.run_benchmarks import novel_questions, quiet, summarize
+
+# Çalışma dizini değişse bile main.py içe aktarılabilsin
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+DEFAULT_CONFIGS = "float16,int8,int8:192,int8:128:pca"
+
+
+def parse_config(text):
+    """'int8:192:pca' -> ('int8', 192, 'pca')"""
+    parts = text.split(':')
+    return parts[0], int(parts[1]) if len(parts) > 1 and parts[1] else None, parts[2] if len(parts) > 2 else 'truncate'
+
+
+def build_queries(base_data, variants, novel, seed):
+    """data.json soruları, önek/sonekli farklı ifadeleri ve veri setinde olmayan sorular."""
+    queries = [item['question'] for item in base_data]
+    if variants > 0:
+        paraphrased = synthesize_corpus(base_data, len(base_data) * (variants + 1), seed)[len(base_data):]
+        queries.extend(item['question'] for item in paraphrased)
+    queries.extend(novel_questions("Parite sorusu", novel))
+    return list(dict.fromkeys(queries))
+
+
+def decisions(qa, queries):
+    """Her sorgu için find_best_match kararı (eşleşen soru veya None) ve gecikme özeti."""
+    result, latencies = [], []
+    with quiet():
+        wall_start = time.perf_counter()
+        for q in queries:
+            start = time.perf_counter()
+            item = qa.find_best_match(q)
+            latencies.append(time.perf_counter() - start)
+            result.append(item['question'] if item else None)
+        wall = time.perf_counter() - wall_start
+    return result, summarize(latencies, wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Küçültülmüş embedding araması ile float32 aramasının find_best_match kararlarını karşılaştırır.")
+    parser.add_argument('--data', default=None, help="QA veri dosyası (varsayılan: proje kökündeki data.json).")
+    parser.add_argument('--configs', default=DEFAULT_CONFIGS, help="hassasiyet[:boyut[:truncate|pca]] listesi.")
+    parser.add_argument('--variants', type=int, default=2, help="Her soru için üretilecek farklı ifade sayısı.")
+    parser.add_argument('--novel', type=int, default=50, help="Veri setinde olmayan soru sayısı.")
+    parser.add_argument('--model', default="all-MiniLM-L6-v2")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=None)
+    parser.add_argument('--save', default=None, help="Sonuçların yazılacağı JSON dosyası.")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    base_data = load_base_data(args.data)
+    queries = build_queries(base_data, args.variants, args.novel, args.seed)
+    workdir = prepare_workdir(args.workdir or tempfile.mkdtemp(prefix="qa_parity_"), base_data)
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        from main import QASystem
+        print(f"⏱️  {len(base_data)} kayıt için QASystem hazırlanıyor...")
+
+        def build(**kwargs):
+            # Tüm yapılandırmalar aynı anlık görüntüyü kullanır; embedding'ler sadece ilk kurulumda hesaplanır
+            with quiet():
+                return QASystem(model_name=args.model, load_api_key=False, background_maintenance=False,
+                                feedback_log_path=None, lemma_cache_path=None, **kwargs)
+
+        qa = build()
+        dim = len(qa.collection.get(limit=1, include=['embeddings'])['embeddings'][0])
+
+        baseline, baseline_latency = decisions(qa, queries)
+        report = {"queries": len(queries), "dim": dim, "float32": {"bytes_per_vector": 4 * dim, **baseline_latency}, "configs": {}}
+        print(f"float32: {sum(d is not None for d in baseline)}/{len(queries)} sorgu eşleşti, soru başına {4 * dim} bayt.")
+
+        failed = False
+        for text in args.configs.split(','):
+            precision, dims, projection = parse_config(text.strip())
+            qa = build(embedding_precision=precision, embedding_dims=dims, embedding_projection=projection)
+            found, latency = decisions(qa, queries)
+            mismatches = [(q, b, f) for q, b, f in zip(queries, baseline, found) if b != f]
+            bytes_per_vector = qa.collection.index.quantizer.bytes_per_vector(dim)
+            report["configs"][text] = {"bytes_per_vector": bytes_per_vector, "reduction": round(4 * dim / bytes_per_vector, 2),
+                                       "resident_bytes": qa.collection.nbytes(), "mismatches": len(mismatches), **latency}
+            status = "✅" if not mismatches else "❌"
+            print(f"{status} {text:<16} {bytes_per_vector:>5} bayt/soru ({4 * dim / bytes_per_vector:.1f}x küçük, "
+                  f"bellekte {qa.collection.nbytes()} bayt), {len(mismatches)} farklı karar, p50 {latency['p50_ms']} ms")
+            for q, b, f in mismatches[:5]:
+                print(f"     '{q[:60]}': float32 -> {b and b[:40]!r}, {text} -> {f and f[:40]!r}")
+            failed = failed or bool(mismatches)
+    finally:
+        os.chdir(original_cwd)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Sonuçlar '{args.save}' dosyasına kaydedildi.")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+
+from constants import DEFAULT_TOPIC
+from benchmarks.corpus import PROJECT_ROOT, load_base_data, prepare_workdir, synthesize_corpus
+from benchmarks.llm_stub import start_stub_server
+
+# Çalışma dizini değişse bile main.py / app.py içe aktarılabilsin
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+BENCH_EMAIL = "bench@example.com"
+
+
+class _NullWriter:
+    """Ölçüm sırasında DEBUG çıktısını yutar."""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def quiet():
+    return contextlib.redirect_stdout(_NullWriter())
+
+
+def peak_rss_mb():
+    """Sürecin şimdiye kadarki en yüksek RSS değeri (MB)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux KB, macOS byte döndürür
+    return peak / 1024.0 if sys.platform != 'darwin' else peak / (1024.0 * 1024.0)
+
+
+def summarize(latencies, wall_seconds):
+    latencies_ms = np.asarray(latencies, dtype=np.float64) * 1000.0
+    return {
+        "count": int(latencies_ms.size),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "rps": round(latencies_ms.size / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+    }
+
+
+def measure(fn, inputs):
+    """fn'i her girdi için çağırır ve gecikme özetini döndürür."""
+    latencies = []
+    with quiet():
+        wall_start = time.perf_counter()
+        for args in inputs:
+            start = time.perf_counter()
+            fn(*args)
+            latencies.append(time.perf_counter() - start)
+        wall = time.perf_counter() - wall_start
+    return summarize(latencies, wall)
+
+
+def novel_questions(prefix, count):
+    return [f"{prefix} {i}: kuantum tavlama ile hiperbolik gömme katmanları nasıl birleştirilir?" for i in range(count)]
+
+
+def bench_qa_system(qa, corpus, iterations, add_iterations, rng):
+    """QASystem sıcak yollarını doğrudan ölçer."""
+    hit_questions = [(rng.choice(corpus)['question'],) for _ in range(iterations)]
+    miss_questions = [(q,) for q in novel_questions("Eşleşmeyen soru", iterations)]
+    topic_hit_questions = [(item['question'], item.get('topic') or DEFAULT_TOPIC) for item in (rng.choice(corpus) for _ in range(iterations))]
+    results = {
+        "find_best_match.hit": measure(qa.find_best_match, hit_questions),
+        "find_best_match.miss": measure(qa.find_best_match, miss_questions),
+        "find_best_match.topic": measure(qa.find_best_match, topic_hit_questions),
+        "get_qa_topic": measure(qa.get_qa_topic, [(q,) for q in novel_questions("Konu sorusu", iterations)]),
+        "get_qa_topic.cached": measure(qa.get_qa_topic, hit_questions),
+    }
+
+    rated = []
+    for _ in range(iterations):
+        item = rng.choice(qa.data)
+        rated.append((item['question'], item['answer'], rng.randint(4, 5)))
+    results["update_answer_rating"] = measure(qa.update_answer_rating, rated)
+
+    added = [(q, "Stub cevap.", DEFAULT_TOPIC) for q in novel_questions("Yeni eklenen soru", add_iterations)]
+    results["add_new_qa_to_data"] = measure(qa.add_new_qa_to_data, added)
+    return results
+
+
+def bench_endpoints(app_module, corpus, iterations, rng):
+    """app.py'deki Flask uç noktalarını test istemcisiyle ölçer."""
+    client = app_module.app.test_client()
+    app_module.quiz_manager.add_topic_for_user(BENCH_EMAIL, next(iter(app_module.quiz_manager.quiz_questions), None))
+
+    def post(path, payload):
+        response = client.post(path, json=payload)
+        if response.status_code >= 500:
+            raise RuntimeError(f"{path} -> {response.status_code}")
+        return response.get_json()
+
+    def quiz_round():
+        question = post('/get_quiz_question', {"email": BENCH_EMAIL})
+        if question.get('status') == 'question_found':
+            post('/check_quiz_answer', {"email": BENCH_EMAIL, "topic": question['topic'],
+                                        "question_id": question['question_id'], "user_answer": "Z"})
+
+    hits = [rng.choice(corpus) for _ in range(iterations)]
+    return {
+        "POST /login": measure(lambda: post('/login', {"email": BENCH_EMAIL, "sifre": "bench"}), [()] * iterations),
+        "POST /ask.hit": measure(lambda q: post('/ask', {"question": q, "email": BENCH_EMAIL}),
+                                 [(item['question'],) for item in hits]),
+        "POST /ask.miss": measure(lambda q: post('/ask', {"question": q, "email": BENCH_EMAIL}),
+                                  [(q,) for q in novel_questions("Uç nokta sorusu", max(1, iterations // 10))]),
+        "POST /rate_answer": measure(lambda q, a: post('/rate_answer', {"question": q, "answer": a, "rating": 5}),
+                                     [(item['question'], item['answer']) for item in hits]),
+        "POST /get_quiz_question+check": measure(quiz_round, [()] * iterations),
+    }
+
+
+def run(sizes, iterations, add_iterations, seed, latency_ms, workdir_root):
+    server, base_url = start_stub_server(latency_ms=latency_ms)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    base_data = load_base_data()
+    original_cwd = os.getcwd()
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "iterations": iterations, "sizes": {}}
+
+    try:
+        for size in sizes:
+            rng = random.Random(seed)
+            corpus = synthesize_corpus(base_data, size, seed)
+            workdir = prepare_workdir(os.path.join(workdir_root, f"corpus_{size}"), corpus)
+            os.chdir(workdir)
+
+            print(f"⏱️  {size} kayıtlık korpus hazırlanıyor (başlatma + embedding)...")
+            # ChromaDB istemcileri göreli yola göre önbelleklenir; her korpus kendi dizinini açmalı
+            SharedSystemClient.clear_system_cache()
+            start = time.perf_counter()
+            with quiet():
+                # app.py modül seviyesinde QASystem kurar; her boyut için yeniden yüklenir
+                app_module = importlib.reload(sys.modules['app']) if 'app' in sys.modules else importlib.import_module('app')
+            startup_seconds = time.perf_counter() - start
+
+            results = {"startup_seconds": round(startup_seconds, 3)}
+            results.update(bench_qa_system(app_module.qa_system, corpus, iterations, add_iterations, rng))
+            results.update(bench_endpoints(app_module, corpus, iterations, rng))
+            results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+            # Bakım işleri göreli yollara yazar; çalışma dizini değişmeden önce uygulanmalı
+            with quiet():
+                app_module.qa_system.flush_maintenance()
+            report["sizes"][str(size)] = results
+            os.chdir(original_cwd)
+            print_size_report(size, results)
+    finally:
+        os.chdir(original_cwd)
+        server.shutdown()
+    return report
+
+
+def print_size_report(size, results):
+    print(f"\n=== Korpus boyutu: {size} (başlatma {results['startup_seconds']} sn, tepe RSS {results['peak_rss_mb']} MB) ===")
+    print(f"{'ölçüm':<32}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'istek/sn':>12}")
+    for name, stats in results.items():
+        if isinstance(stats, dict):
+            print(f"{name:<32}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['rps']:>12}")
+
+
+def compare(report, baseline, tolerance):
+    """p95 gecikme veya istek/sn değeri tolerans dışına çıkan ölçümleri listeler."""
+    regressions = []
+    for size, results in report["sizes"].items():
+        base_results = baseline.get("sizes", {}).get(size, {})
+        for name, stats in results.items():
+            base = base_results.get(name)
+            if not isinstance(stats, dict) or not isinstance(base, dict):
+                continue
+            if base['p95_ms'] and stats['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{size}/{name}: p95 {base['p95_ms']} -> {stats['p95_ms']} ms")
+            if base['rps'] and stats['rps'] < base['rps'] * (1 - tolerance):
+                regressions.append(f"{size}/{name}: istek/sn {base['rps']} -> {stats['rps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="QASystem ve Flask uç noktaları için gecikme / verim ölçümü.")
+    parser.add_argument('--sizes', default="200,1000", help="Virgülle ayrılmış korpus boyutları (ör. 200,10000,100000).")
+    parser.add_argument('--iterations', type=int, default=200, help="Her ölçüm için çağrı sayısı.")
+    parser.add_argument('--add-iterations', type=int, default=20, help="add_new_qa_to_data çağrı sayısı.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help="Stub LLM'e eklenecek yapay gecikme.")
+    parser.add_argument('--workdir', default=None, help="Geçici korpusların oluşturulacağı dizin.")
+    parser.add_argument('--save', default=None, help="Sonuçların kaydedileceği baseline JSON dosyası.")
+    parser.add_argument('--compare', default=None, help="Karşılaştırılacak baseline JSON dosyası.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Gerileme sayılmadan önce izin verilen oran.")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    workdir_root = args.workdir or tempfile.mkdtemp(prefix="qa_bench_")
+    report = run(sizes, args.iterations, args.add_iterations, args.seed, args.llm_latency_ms, workdir_root)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Sonuçlar '{args.save}' dosyasına kaydedildi.")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} gerileme bulundu (tolerans %{args.tolerance * 100:.0f}):")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\n✅ Baseline'a göre gerileme yok.")
+
+
+if __name__ == "__main__":
+    main()
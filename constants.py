@@ -0,0 +1,4 @@
+# Modüller arasında paylaşılan sabitler; bu modül proje içinden hiçbir şey içe aktarmaz
+
+# Konusu olmayan kayıtların, analitik sayaçlarının ve LLM konu tespitinin varsayılan konusu
+DEFAULT_TOPIC = 'Genel Makine Öğrenmesi'
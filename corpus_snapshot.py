@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from constants import DEFAULT_TOPIC
+
+# Dosya düzeni değiştiğinde artırılır; farklı sürümdeki anlık görüntüler yok sayılır
+FORMAT_VERSION = 1
+SNAPSHOT_DIR = 'corpus_snapshot'
+MANIFEST_NAME = 'manifest.json'
+
+
+def records_digest(records: List[Dict]) -> str:
+    """Anlık görüntüye yazılan alanların (soru, cevap, konu) sıralı özeti; tazelik kontrolünde karşılaştırılır."""
+    digest = hashlib.sha1()
+    for item in records:
+        for value in (item['question'], item['answer'], item.get('topic') or DEFAULT_TOPIC):
+            digest.update(value.encode('utf-8'))
+            digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def _write_string_table(path_prefix: str, values: List[str]):
+    """Metinleri tek bir UTF-8 blob'a ve (n + 1) uzunluğunda int64 ofset dizisine yazar."""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with open(path_prefix + '.bin', 'wb') as f:
+        for b in encoded:
+            f.write(b)
+    offsets.tofile(path_prefix + '.idx')
+
+
+def _open_memmap(path: str, dtype, shape=None):
+    # Boş dosyalar memmap ile açılamaz
+    if os.path.getsize(path) == 0:
+        return np.zeros(shape or (0,), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+
+class StringTable:
+    """Ofset dizisiyle indekslenen, memmap üzerinden okunan salt okunur metin tablosu."""
+
+    def __init__(self, path_prefix: str):
+        self.blob = _open_memmap(path_prefix + '.bin', np.uint8)
+        self.offsets = _open_memmap(path_prefix + '.idx', np.int64)
+
+    def __len__(self):
+        return max(0, len(self.offsets) - 1)
+
+    def __getitem__(self, i: int) -> str:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return bytes(self.blob[start:end]).decode('utf-8')
+
+    def to_list(self) -> List[str]:
+        return [self[i] for i in range(len(self))]
+
+
+class CorpusSnapshot:
+    """
+    Aktif korpusun sürümlü ikili anlık görüntüsü: float32 embedding matrisi, soru/cevap metin tabloları
+    ve konu kimlikleri. Tüm diziler np.memmap ile açılır; aynı anlık görüntüyü açan süreçler
+    işletim sisteminin sayfa önbelleğindeki tek kopyayı paylaşır.
+    """
+
+    def __init__(self, path: str, manifest: Dict):
+        self.path = path
+        self.manifest = manifest
+        count, dim = manifest['count'], manifest['dim']
+        self.embeddings = _open_memmap(os.path.join(path, 'embeddings.f32'), np.float32, (count, dim) if count else (0, dim))
+        self.questions = StringTable(os.path.join(path, 'questions'))
+        self.answers = StringTable(os.path.join(path, 'answers'))
+        self.topic_ids = _open_memmap(os.path.join(path, 'topic_ids.i32'), np.int32)
+        self.topics: List[str] = manifest['topics']
+        self._positions: Optional[Dict[str, int]] = None
+
+    def __len__(self):
+        return self.manifest['count']
+
+    def topic(self, i: int) -> str:
+        return self.topics[int(self.topic_ids[i])]
+
+    def record(self, i: int) -> Dict:
+        return {"question": self.questions[i], "answer": self.answers[i], "topic": self.topic(i)}
+
+    def position_of(self, question: str) -> Optional[int]:
+        """Sorunun anlık görüntüdeki satırı (ilk kullanımda soru -> satır sözlüğü kurulur)."""
+        if self._positions is None:
+            self._positions = {q: i for i, q in enumerate(self.questions.to_list())}
+        return self._positions.get(question)
+
+    def embeddings_for(self, questions: List[str]) -> Dict[str, np.ndarray]:
+        """Anlık görüntüde bulunan soruların embedding'lerini döndürür; bulunmayanlar sonuçta yer almaz."""
+        found = {}
+        for question in questions:
+            i = self.position_of(question)
+            if i is not None:
+                found[question] = np.asarray(self.embeddings[i])
+        return found
+
+    def matches(self, records: List[Dict]) -> bool:
+        """Anlık görüntü verilen kayıtlarla (aynı sırada, aynı soru/cevap/konu) yazılmışsa True."""
+        return self.manifest.get('records_sha1') == records_digest(records)
+
+
+def build_snapshot(path: str, records: List[Dict], embeddings: np.ndarray, model_name: str) -> str:
+    """
+    Kayıtlar ve aynı sıradaki embedding'lerden anlık görüntü yazar. Önce geçici dizine yazılır,
+    sonra eski anlık görüntünün yerine taşınır; okuyucular yarım yazılmış dosya görmez.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if len(records) != len(embeddings):
+        raise ValueError(f"Kayıt sayısı ({len(records)}) ile embedding sayısı ({len(embeddings)}) eşleşmiyor.")
+
+    questions = [item['question'] for item in records]
+    topics = sorted({item.get('topic') or DEFAULT_TOPIC for item in records})
+    topic_index = {topic: i for i, topic in enumerate(topics)}
+
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    embeddings.tofile(os.path.join(tmp_path, 'embeddings.f32'))
+    _write_string_table(os.path.join(tmp_path, 'questions'), questions)
+    _write_string_table(os.path.join(tmp_path, 'answers'), [item['answer'] for item in records])
+    np.asarray([topic_index[item.get('topic') or DEFAULT_TOPIC] for item in records], dtype=np.int32).tofile(os.path.join(tmp_path, 'topic_ids.i32'))
+
+    manifest = {
+        "version": FORMAT_VERSION,
+        "model_name": model_name,
+        "count": len(records),
+        "dim": int(embeddings.shape[1]) if embeddings.ndim == 2 and len(embeddings) else 0,
+        "topics": topics,
+        "records_sha1": records_digest(records),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(tmp_path, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    old_path = path + '.old'
+    if os.path.exists(path):
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+    return path
+
+
+def load_snapshot(path: str = SNAPSHOT_DIR, model_name: str = None) -> Optional[CorpusSnapshot]:
+    """
+    Anlık görüntüyü açar. Yoksa, biçim sürümü veya embedding modeli farklıysa None döner;
+    çağıran taraf JSON + embedding yoluna geri düşer.
+    """
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Uyarı: '{manifest_path}' okunamadı: {e}. Anlık görüntü kullanılmayacak.")
+        return None
+    if manifest.get('version') != FORMAT_VERSION:
+        print(f"DEBUG: Anlık görüntü sürümü ({manifest.get('version')}) desteklenmiyor, JSON yolu kullanılacak.")
+        return None
+    if model_name and manifest.get('model_name') != model_name:
+        print(f"DEBUG: Anlık görüntü '{manifest.get('model_name')}' modeliyle oluşturulmuş, JSON yolu kullanılacak.")
+        return None
+    try:
+        return CorpusSnapshot(path, manifest)
+    except (OSError, ValueError) as e:
+        print(f"Uyarı: '{path}' anlık görüntüsü açılamadı: {e}. JSON yolu kullanılacak.")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="data.json ve embedding'lerinden memmap ile açılan ikili anlık görüntü oluşturur.")
+    parser.add_argument('--data', default='data.json', help="QA veri dosyası.")
+    parser.add_argument('--out', default=SNAPSHOT_DIR, help="Anlık görüntü dizini.")
+    parser.add_argument('--model', default="all-MiniLM-L6-v2", help="Embedding modeli.")
+    parser.add_argument('--chroma-dir', default='chroma_db_persistent', help="Embedding'lerin önce okunacağı ChromaDB dizini.")
+    args = parser.parse_args()
+
+    with open(args.data, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    # Aynı metin iki kez varsa anlık görüntüde tek satır tutulur
+    unique = list({item['question']: item for item in records}.values())
+    questions = [item['question'] for item in unique]
+    print(f"📚 '{args.data}' dosyasından {len(unique)} benzersiz soru okundu.")
+
+    embeddings = {}
+    previous = load_snapshot(args.out, args.model)
+    if previous is not None:
+        embeddings.update(previous.embeddings_for(questions))
+    if os.path.isdir(args.chroma_dir):
+        try:
+            import chromadb
+            from main import QASystem
+            collection = chromadb.PersistentClient(path=args.chroma_dir).get_collection("qa_collection_persistent")
+            missing = [q for q in questions if q not in embeddings]
+            for start in range(0, len(missing), 1000):
+                batch = missing[start:start + 1000]
+                stored = collection.get(ids=[QASystem._qa_id(q) for q in batch], include=['documents', 'embeddings'])
+                embeddings.update({doc: np.asarray(emb, dtype=np.float32) for doc, emb in zip(stored['documents'], stored['embeddings'])})
+        except Exception as e:
+            print(f"Uyarı: ChromaDB'den embedding okunamadı: {e}")
+
+    missing = [q for q in questions if q not in embeddings]
+    if missing:
+        print(f"🧮 {len(missing)} soru için embedding hesaplanıyor...")
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(args.model, device="cpu")
+        embeddings.update(zip(missing, model.encode(missing, batch_size=64, show_progress_bar=True)))
+
+    matrix = np.stack([embeddings[q] for q in questions]) if questions else np.zeros((0, 0), dtype=np.float32)
+    build_snapshot(args.out, unique, matrix, args.model)
+    print(f"✅ {len(unique)} kayıtlık anlık görüntü '{args.out}' dizinine yazıldı (sürüm {FORMAT_VERSION}).")
+
+
+if __name__ == "__main__":
+    main()
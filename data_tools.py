@@ -0,0 +1,184 @@
+import argparse
+import json
+import sys
+
+import rating_store
+import turkish_lemmatizer
+from lexical_index import TOKEN_PATTERN, turkish_lower
+from json_stream import iter_json_array, transform_json_array, write_json_array
+
+DATASET_PATH = 'data.json'
+KEYWORDS_PATH = 'keywords.json'
+CLEAN_KEYWORDS_PATH = 'keywords_clean.json'
+
+TURKISH_STOP_WORDS = set([
+    'acaba', 'ama', 'aslında', 'az', 'bazı', 'belki', 'biri', 'birkaç', 'birşey',
+    'biz', 'bu', 'buna', 'bunda', 'bundan', 'bunlar', 'bunu', 'bunun', 'burada',
+    'çok', 'çünkü', 'da', 'daha', 'de', 'defa', 'diye', 'eğer', 'en', 'gibi',
+    'hem', 'hep', 'hepsi', 'her', 'hiç', 'için', 'ile', 'ise', 'kez', 'ki', 'kim',
+    'mı', 'mu', 'mü', 'nasıl', 'ne', 'neden', 'nedir', 'nerde', 'nerede', 'nereye',
+    'niçin', 'niye', 'o', 'sanki', 'şey', 'siz', 'şu', 'tüm', 've', 'veya', 'ya',
+    'yani', 'vb', 'olan', 'olarak', 'kadar', 'göre', 'ait', 'arasında', 'görevi',
+    'fark', 'farkı', 'nedenlerinden', 'nelerdir', 'anlama', 'gelir', 'yarar', 'nasıl',
+    'önlenir', 'olabilir', 'olur'
+])
+# Kısa olmasına rağmen korunan anahtar kelimeler
+SHORT_KEYWORDS = ['ai', 'ml', 'k', 'svm', 'cnn', 'rnn', 'lstm', 'gru', 'gpt', 'gan', 'vae']
+
+
+def add_rating_fields(input_path, output_path=None):
+    """Puanlama alanları eksik kayıtlara 'sorulma_sayisi', 'rating_stats' ve 'current_average' ekler."""
+    def transform(item):
+        item.setdefault('sorulma_sayisi', 0)
+        if 'rating_stats' not in item and 'ratings' not in item:
+            item['rating_stats'] = rating_store.empty_stats()
+        item.setdefault('current_average', 0.0)
+        return item
+    return transform_json_array(input_path, transform, output_path)
+
+
+def add_answer2(input_path, output_path=None):
+    """'answer2' alanı olmayan kayıtlara boş string olarak ekler."""
+    def transform(item):
+        item.setdefault('answer2', "")
+        return item
+    return transform_json_array(input_path, transform, output_path)
+
+
+def migrate_ratings(input_path, output_path=None):
+    """Eski 'ratings' listelerini sabit boyutlu 'rating_stats' özetlerine çevirir."""
+    def transform(item):
+        rating_store.migrate_record(item)
+        return item
+    return transform_json_array(input_path, transform, output_path)
+
+
+def count_entries(input_path, by_topic=False):
+    """Kayıtları belleğe almadan sayar; istenirse konu dağılımını da döndürür."""
+    total = 0
+    topics = {}
+    for item in iter_json_array(input_path):
+        total += 1
+        if by_topic:
+            topic = item.get('topic', 'Konusuz') if isinstance(item, dict) else 'Konusuz'
+            topics[topic] = topics.get(topic, 0) + 1
+    return total, topics
+
+
+def _filtered_keywords(input_path):
+    for keyword in iter_json_array(input_path):
+        keyword = keyword.lower().strip()
+        if len(keyword.split()) > 4 or keyword in TURKISH_STOP_WORDS: continue
+        if len(keyword) < 3 and keyword not in SHORT_KEYWORDS: continue
+        yield keyword
+
+
+def clean_keywords(input_path=KEYWORDS_PATH, output_path=CLEAN_KEYWORDS_PATH, processes=None,
+                   lemma_cache_path=turkish_lemmatizer.LEMMA_CACHE_PATH):
+    """
+    Anahtar kelimeleri Zemberek ile köklerine indirger, stop word ve çok kısa/uzun ifadeleri atar.
+    Girdi akış halinde okunur; bellekte sadece temizlenmiş benzersiz kelimeler tutulur.
+    Kökler kalıcı önbellekten okunur, eksikler süreç havuzunda paralel çözümlenir.
+    """
+    if not turkish_lemmatizer.zemberek_available():
+        raise ImportError("zemberek modülü bulunamadı")
+    lemmatizer = turkish_lemmatizer.Lemmatizer(lemma_cache_path, processes=processes, background=False)
+
+    read = 0
+    clean = set()
+    for keyword, root in lemmatizer.iter_lemmas(_filtered_keywords(input_path)):
+        read += 1
+        if root == keyword:
+            clean.add(keyword)
+        elif len(root) > 2 and root not in TURKISH_STOP_WORDS:
+            clean.add(root)
+    lemmatizer.close()
+
+    written = write_json_array(output_path, sorted(clean))
+    return {"read": read, "written": written}
+
+
+def warm_lemma_cache(data_path=DATASET_PATH, keywords_path=KEYWORDS_PATH, processes=None,
+                     lemma_cache_path=turkish_lemmatizer.LEMMA_CACHE_PATH):
+    """Veri setindeki soruların ve anahtar kelimelerin tüm kelimelerini kök önbelleğine ekler."""
+    if not turkish_lemmatizer.zemberek_available():
+        raise ImportError("zemberek modülü bulunamadı")
+    lemmatizer = turkish_lemmatizer.Lemmatizer(lemma_cache_path, processes=processes, background=False)
+    before = len(lemmatizer)
+
+    def words():
+        for item in iter_json_array(data_path):
+            yield from TOKEN_PATTERN.findall(turkish_lower(item.get('question', '')))
+        if keywords_path:
+            for keyword in iter_json_array(keywords_path):
+                yield from TOKEN_PATTERN.findall(turkish_lower(keyword))
+
+    seen = sum(1 for _ in lemmatizer.iter_lemmas(words()))
+    lemmatizer.close()
+    return {"read": seen, "written": len(lemmatizer) - before}
+
+
+def print_stats(name, path, stats):
+    print(f"✅ {name}: '{path}' -> {stats['read']} kayıt okundu, {stats['changed']} kayıt değişti, {stats['written']} kayıt yazıldı.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Veri dosyaları için akışlı bakım araçları (sabit bellek, atomik yazma).")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, help_text in [('add-rating-fields', "Eksik puanlama alanlarını ekler."),
+                            ('add-answer2', "Eksik 'answer2' alanlarını ekler."),
+                            ('migrate-ratings', "'ratings' listelerini 'rating_stats' özetlerine çevirir.")]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('--data', default=DATASET_PATH, help="Girdi JSON dosyası.")
+        sub.add_argument('--output', default=None, help="Çıktı dosyası (varsayılan: girdinin yerine).")
+
+    count_parser = subparsers.add_parser('count', help="Kayıt sayısını raporlar.")
+    count_parser.add_argument('--data', default=DATASET_PATH)
+    count_parser.add_argument('--by-topic', action='store_true', help="Konu dağılımını da göster.")
+
+    keywords_parser = subparsers.add_parser('clean-keywords', help="Anahtar kelimeleri köklerine indirger ve temizler.")
+    keywords_parser.add_argument('--input', default=KEYWORDS_PATH)
+    keywords_parser.add_argument('--output', default=CLEAN_KEYWORDS_PATH)
+
+    lemma_parser = subparsers.add_parser('lemmatize', help="Soruların ve anahtar kelimelerin köklerini önbelleğe alır.")
+    lemma_parser.add_argument('--data', default=DATASET_PATH)
+    lemma_parser.add_argument('--keywords', default=KEYWORDS_PATH)
+
+    for sub in (keywords_parser, lemma_parser):
+        sub.add_argument('--processes', type=int, default=None, help="Zemberek süreç sayısı (varsayılan: çekirdek sayısı - 1).")
+        sub.add_argument('--lemma-cache', default=turkish_lemmatizer.LEMMA_CACHE_PATH, help="Kalıcı kök önbelleği dosyası.")
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'count':
+            total, topics = count_entries(args.data, args.by_topic)
+            print("\n" + "="*40)
+            print(f"📊 Veri Seti Raporu 📊")
+            print("="*40)
+            print(f"'{args.data}' dosyasında toplam {total} adet soru-cevap çifti bulunmaktadır.")
+            for topic, count in sorted(topics.items(), key=lambda t: -t[1]):
+                print(f"  {topic:<40} {count}")
+            print("="*40 + "\n")
+        elif args.command == 'clean-keywords':
+            stats = clean_keywords(args.input, args.output, args.processes, args.lemma_cache)
+            print(f"🎉 '{args.output}' dosyası {stats['written']} temiz kelime ile oluşturuldu ({stats['read']} kelime okundu).")
+        elif args.command == 'lemmatize':
+            stats = warm_lemma_cache(args.data, args.keywords, args.processes, args.lemma_cache)
+            print(f"✅ {stats['read']} benzersiz kelime işlendi, '{args.lemma_cache}' önbelleğine {stats['written']} yeni kök eklendi.")
+        else:
+            action = {'add-rating-fields': add_rating_fields, 'add-answer2': add_answer2, 'migrate-ratings': migrate_ratings}[args.command]
+            print_stats(args.command, args.output or args.data, action(args.data, args.output))
+    except ImportError as e:
+        print(f"❌ HATA: Zemberek başlatılamadı (pip install zemberek-python). Hata: {e}")
+        sys.exit(1)
+    except FileNotFoundError as e:
+        print(f"❌ HATA: Dosya bulunamadı: {e}")
+        sys.exit(1)
+    except (ValueError, json.JSONDecodeError) as e:
+        print(f"❌ HATA: Dosya geçerli bir JSON dizisi değil veya bozuk: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+PRECISIONS = ('float32', 'float16', 'int8')
+PROJECTIONS = ('truncate', 'pca')
+# Skorlar bu kadar satırlık bloklar halinde hesaplanır; geçici float32 kopya blok boyutuyla sınırlı kalır
+SCORE_BLOCK_ROWS = 8192
+# Kodlayıcı (PCA, int8 ölçekleri) en fazla bu kadar satırlık düzenli bir örnekle eğitilir
+FIT_SAMPLE_ROWS = 50000
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class Quantizer:
+    """
+    Embedding'leri arama için küçültür: isteğe bağlı boyut indirgeme (ilk `dims` boyut — Matryoshka tarzı
+    kesme — veya PCA), ardından float16 ya da boyut başına ölçekli int8 kodlama.
+    Kodlar sadece aday bulmak içindir; kesin skorlar tam hassasiyetli vektörlerle yeniden hesaplanır.
+    """
+
+    def __init__(self, precision: str = 'int8', dims: int = None, projection: str = 'truncate'):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Geçersiz hassasiyet: '{precision}' ({', '.join(PRECISIONS)} olmalı).")
+        if projection not in PROJECTIONS:
+            raise ValueError(f"Geçersiz indirgeme: '{projection}' ({', '.join(PROJECTIONS)} olmalı).")
+        self.precision = precision
+        self.dims = dims
+        self.projection = projection
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    def fit(self, matrix: np.ndarray) -> 'Quantizer':
+        """PCA bileşenlerini ve int8 ölçeklerini verilen (tam hassasiyetli) embedding'lerden öğrenir."""
+        matrix = normalize_rows(matrix)
+        if self.dims is not None and self.projection == 'pca':
+            if len(matrix) <= self.dims:
+                print(f"DEBUG: PCA için yeterli örnek yok ({len(matrix)} <= {self.dims}); ilk {self.dims} boyut kullanılacak.")
+                self.projection = 'truncate'
+            else:
+                self.mean = matrix.mean(axis=0)
+                _, _, vt = np.linalg.svd(matrix - self.mean, full_matrices=False)
+                self.components = vt[:self.dims].astype(np.float32)
+        if self.precision == 'int8':
+            projected = self.project(matrix)
+            # Aykırı birkaç değer tüm boyutun çözünürlüğünü düşürmesin
+            bound = np.percentile(np.abs(projected), 99.9, axis=0) if len(projected) else np.ones(projected.shape[1])
+            self.scale = (np.maximum(bound, 1e-6) / 127.0).astype(np.float32)
+        return self
+
+    def project(self, matrix: np.ndarray) -> np.ndarray:
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if self.dims is None:
+            return matrix
+        if self.components is not None:
+            return normalize_rows((matrix - self.mean) @ self.components.T)
+        return normalize_rows(matrix[:, :self.dims])
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        projected = self.project(np.atleast_2d(matrix))
+        if self.precision == 'int8':
+            return np.clip(np.rint(projected / self.scale), -127, 127).astype(np.int8)
+        if self.precision == 'float16':
+            return projected.astype(np.float16)
+        return projected.astype(np.float32)
+
+    def query_vector(self, query: np.ndarray) -> np.ndarray:
+        """Sorgu vektörünü, kodlarla doğrudan çarpılabilecek biçime getirir (int8 ölçeği sorguya katılır)."""
+        projected = self.project(np.atleast_2d(query))[0]
+        return projected * self.scale if self.precision == 'int8' else projected
+
+    def bytes_per_vector(self, full_dim: int) -> int:
+        dims = self.dims or full_dim
+        return dims * {'float32': 4, 'float16': 2, 'int8': 1}[self.precision]
+
+
+class CompactIndex:
+    """
+    Küçültülmüş embedding kodları üzerinde bellek içi kaba arama. Her satır bir QA kimliği ve konu taşır;
+    silinen satırlar işaretlenir ve sayıları artınca dizi sıkıştırılır. Kaba arama sonuçları çağıran tarafta
+    tam hassasiyetli vektörlerle yeniden skorlanmalıdır (bkz. CompactCollection).
+    """
+
+    def __init__(self, quantizer: Quantizer):
+        self.quantizer = quantizer
+        self._lock = threading.Lock()
+        self.full_dim = 0
+        self.ids: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self.codes: Optional[np.ndarray] = None
+        self.topic_ids = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.topics: Dict[str, int] = {}
+        self.topic_names: List[str] = []
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _topic_id(self, topic: str) -> int:
+        topic_id = self.topics.get(topic)
+        if topic_id is None:
+            topic_id = self.topics[topic] = len(self.topic_names)
+            self.topic_names.append(topic)
+        return topic_id
+
+    def build(self, ids: List[str], embeddings: np.ndarray, topics: List[str]):
+        """
+        Kodlayıcıyı verilen embedding'lerle (en fazla FIT_SAMPLE_ROWS satırlık örnekle) eğitir ve indeksi baştan
+        kurar. embeddings bir memmap olabilir; kodlama bloklar halinde yapılır, tam bir float32 kopya oluşmaz.
+        """
+        step = max(1, len(embeddings) // FIT_SAMPLE_ROWS)
+        self.quantizer.fit(np.asarray(embeddings[::step], dtype=np.float32))
+        codes = np.concatenate([self.quantizer.encode(embeddings[start:start + SCORE_BLOCK_ROWS])
+                                for start in range(0, len(embeddings), SCORE_BLOCK_ROWS)]) if len(ids) else None
+        with self._lock:
+            self.full_dim = embeddings.shape[1] if np.ndim(embeddings) == 2 else 0
+            self.ids = list(ids)
+            self.rows = {doc_id: i for i, doc_id in enumerate(ids)}
+            self.codes = codes
+            self.topics, self.topic_names = {}, []
+            self.topic_ids = np.asarray([self._topic_id(t) for t in topics], dtype=np.int32)
+            self.alive = np.ones(len(ids), dtype=bool)
+
+    @property
+    def fitted(self) -> bool:
+        return self.codes is not None
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray, topics: List[str]):
+        if not ids:
+            return
+        codes = self.quantizer.encode(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            new_rows = []
+            for doc_id, code, topic in zip(ids, codes, topics):
+                row = self.rows.get(doc_id)
+                if row is None:
+                    new_rows.append((doc_id, code, topic))
+                else:
+                    self.codes[row] = code
+                    self.topic_ids[row] = self._topic_id(topic)
+            if new_rows:
+                start = len(self.ids)
+                added = np.stack([code for _, code, _ in new_rows])
+                # Okuyan istekler eski dizileri görmeye devam eder; yeni diziler tek atamayla devreye girer
+                self.codes = added if self.codes is None else np.concatenate([self.codes, added])
+                self.topic_ids = np.concatenate([self.topic_ids, np.asarray([self._topic_id(t) for _, _, t in new_rows], dtype=np.int32)])
+                self.alive = np.concatenate([self.alive, np.ones(len(new_rows), dtype=bool)])
+                for offset, (doc_id, _, _) in enumerate(new_rows):
+                    self.ids.append(doc_id)
+                    self.rows[doc_id] = start + offset
+
+    def remove(self, ids: List[str]):
+        with self._lock:
+            for doc_id in ids:
+                row = self.rows.pop(doc_id, None)
+                if row is not None:
+                    self.alive[row] = False
+                    self.ids[row] = None
+            if len(self.ids) > 64 and len(self.rows) < len(self.ids) * 0.75:
+                self._compact()
+
+    def _compact(self):
+        keep = np.flatnonzero(self.alive)
+        self.codes = self.codes[keep] if self.codes is not None else None
+        self.topic_ids = self.topic_ids[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.ids = [self.ids[i] for i in keep]
+        self.rows = {doc_id: i for i, doc_id in enumerate(self.ids)}
+
+    def set_topics(self, ids: List[str], topics: List[str]):
+        with self._lock:
+            for doc_id, topic in zip(ids, topics):
+                row = self.rows.get(doc_id)
+                if row is not None:
+                    self.topic_ids[row] = self._topic_id(topic)
+
+    def topic_of(self, doc_id: str) -> Optional[str]:
+        """Satırın konusunu döndürür; kimlik indekste yoksa None."""
+        with self._lock:
+            row = self.rows.get(doc_id)
+            return self.topic_names[int(self.topic_ids[row])] if row is not None else None
+
+    def live_ids(self, topic: str = None) -> List[str]:
+        """Silinmemiş satırların kimlikleri (satır sırasıyla); topic verilirse sadece o konudakiler."""
+        with self._lock:
+            if topic is None:
+                return [doc_id for doc_id in self.ids if doc_id is not None]
+            topic_id = self.topics.get(topic)
+            if topic_id is None:
+                return []
+            return [self.ids[i] for i in np.flatnonzero(self.alive & (self.topic_ids == topic_id))]
+
+    def search(self, query: np.ndarray, n: int, topic: str = None) -> List[str]:
+        """Kaba skora göre en iyi n kimliği döndürür; topic verilirse sadece o konunun satırları aranır."""
+        with self._lock:
+            codes, alive, topic_ids, ids = self.codes, self.alive, self.topic_ids, self.ids
+            topic_id = self.topics.get(topic) if topic is not None else None
+        if codes is None or n <= 0 or (topic is not None and topic_id is None):
+            return []
+        q = self.quantizer.query_vector(np.asarray(query, dtype=np.float32))
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            scores[start:start + SCORE_BLOCK_ROWS] = codes[start:start + SCORE_BLOCK_ROWS].astype(np.float32) @ q
+        mask = alive if topic_id is None else alive & (topic_ids == topic_id)
+        scores[~mask] = -np.inf
+        n = min(n, int(mask.sum()))
+        if n == 0:
+            return []
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top])]
+        return [ids[i] for i in top if ids[i] is not None]
+
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes) if self.codes is not None else 0
+
+
+class CompactCollection:
+    """
+    Küçültülmüş modda ChromaDB QA koleksiyonunun yerini alan depo. Bellekte sadece küçültülmüş kodlar
+    (CompactIndex) ve kimlikler tutulur; tam hassasiyetli vektörler, soru ve cevap metinleri diskteki anlık
+    görüntüden (corpus_snapshot, memmap) okunur ve yeniden skorlamada sadece adayların satırlarına dokunulur.
+    Son anlık görüntüden sonra eklenen kayıtlar, anlık görüntü yeniden yazılıp attach_snapshot ile bağlanana
+    kadar bellekte bekler.
+    QASystem'in kullandığı Collection alt kümesini (count, get, query, upsert, update, delete) aynı dönüş
+    biçimiyle sağlar; mesafeler `space` ölçüsündedir (birim vektörlerde cosine/ip: 1 - cos, l2: 2 - 2·cos).
+    Kaba arama kodlar üzerinde bloklu doğrusal taramadır; where filtresi olarak sadece {'topic': ...} desteklenir.
+    """
+
+    def __init__(self, quantizer: Quantizer, id_fn: Callable[[str], str], space: str = 'cosine', rescore_factor: int = 4):
+        self.index = CompactIndex(quantizer)
+        self.id_fn = id_fn
+        self.space = space
+        self.rescore_factor = max(1, rescore_factor)
+        self._lock = threading.Lock()
+        self.snapshot = None
+        self._snapshot_rows: Dict[str, int] = {}
+        # Anlık görüntüde olmayan kayıtlar: kimlik -> (tam hassasiyetli vektör, belge, metadata)
+        self._pending: Dict[str, tuple] = {}
+        # Anlık görüntüdeki kayıtların sonradan değişen metadata'sı (ör. terfi eden cevap)
+        self._metadata: Dict[str, Dict] = {}
+
+    def count(self) -> int:
+        return len(self.index)
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def nbytes(self) -> int:
+        """Bellekte tutulan vektör baytları: kodlar ve henüz anlık görüntüye yazılmamış tam vektörler."""
+        with self._lock:
+            pending = sum(vector.nbytes for vector, _, _ in self._pending.values())
+        return self.index.nbytes() + pending
+
+    @staticmethod
+    def _topic_filter(where: Optional[Dict]) -> Optional[str]:
+        if not where:
+            return None
+        if set(where) != {'topic'}:
+            raise ValueError(f"Küçültülmüş koleksiyon sadece 'topic' filtresini destekler: {where}")
+        return where['topic']
+
+    def attach_snapshot(self, snapshot):
+        """
+        Anlık görüntüyü vektör kaynağı yapar ve kodları ondan yeniden kurar (kodlayıcı da yeniden eğitilir).
+        İlk bağlamada anlık görüntüdeki tüm kayıtlar yüklenir; sonrakilerde sadece canlı kayıtlar tutulur.
+        Anlık görüntüye yazılmış bekleyen kayıtlar bellekten atılır.
+        """
+        questions = snapshot.questions.to_list()
+        rows = {self.id_fn(q): i for i, q in enumerate(questions)}
+        with self._lock:
+            first = not self.index.fitted and not self._pending
+            live = set(rows) if first else set(self.index.live_ids())
+            topics_before = {} if first else {doc_id: self.index.topic_of(doc_id) for doc_id in live}
+            ids = [doc_id for doc_id in rows if doc_id in live]
+            positions = np.fromiter((rows[doc_id] for doc_id in ids), dtype=np.int64, count=len(ids))
+            # Anlık görüntü canlı kayıtlarla birebir aynıysa memmap doğrudan kullanılır, kopya oluşmaz
+            embeddings = snapshot.embeddings if len(ids) == len(snapshot) else snapshot.embeddings[positions]
+            topics = [topics_before.get(doc_id) or snapshot.topic(row) for doc_id, row in zip(ids, positions)]
+            pending = {doc_id: entry for doc_id, entry in self._pending.items() if doc_id in live and doc_id not in rows}
+            metadata = {doc_id: m for doc_id, m in self._metadata.items()
+                        if doc_id in rows and doc_id in live and m.get('answer') != snapshot.answers[rows[doc_id]]}
+
+            index = CompactIndex(self.index.quantizer)
+            index.build(ids, embeddings, topics)
+            if pending:
+                index.upsert(list(pending), np.stack([vector for vector, _, _ in pending.values()]),
+                             [topics_before.get(doc_id) or (entry[2] or {}).get('topic') for doc_id, entry in pending.items()])
+            self.index, self.snapshot, self._snapshot_rows = index, snapshot, rows
+            self._pending, self._metadata = pending, metadata
+
+    def _entries(self, ids: List[str]):
+        """Her kimlik için (kimlik, vektör, belge, metadata) döndürür; bilinmeyen kimlikler atlanır."""
+        with self._lock:
+            snapshot, rows, pending, overrides = self.snapshot, self._snapshot_rows, dict(self._pending), dict(self._metadata)
+        entries = []
+        for doc_id in ids:
+            topic = self.index.topic_of(doc_id)
+            if topic is None:
+                continue
+            if doc_id in pending:
+                vector, document, metadata = pending[doc_id]
+            elif doc_id in rows:
+                row = rows[doc_id]
+                vector, document = snapshot.embeddings[row], snapshot.questions[row]
+                metadata = overrides.get(doc_id) or {'question': document, 'answer': snapshot.answers[row]}
+            else:
+                continue
+            entries.append((doc_id, vector, document, dict(metadata or {}, topic=topic)))
+        return entries
+
+    def get(self, ids: List[str] = None, where: Dict = None, include=('metadatas', 'documents'),
+            limit: int = None, offset: int = None) -> Dict:
+        topic = self._topic_filter(where)
+        if ids is None:
+            ids = self.index.live_ids(topic)
+        elif topic is not None:
+            ids = [doc_id for doc_id in ids if self.index.topic_of(doc_id) == topic]
+        start = offset or 0
+        ids = ids[start:start + limit] if limit is not None else ids[start:]
+        entries = self._entries(ids)
+        result = {'ids': [doc_id for doc_id, _, _, _ in entries]}
+        if 'embeddings' in include:
+            result['embeddings'] = np.asarray([vector for _, vector, _, _ in entries], dtype=np.float32)
+        if 'documents' in include:
+            result['documents'] = [document for _, _, document, _ in entries]
+        if 'metadatas' in include:
+            result['metadatas'] = [metadata for _, _, _, metadata in entries]
+        return result
+
+    def query(self, query_embeddings, n_results: int = 10, where: Dict = None,
+              include=('metadatas', 'documents', 'distances')) -> Dict:
+        """Her sorgu için kodlarla n_results * rescore_factor aday bulur, tam hassasiyetli vektörlerle sıralar."""
+        topic = self._topic_filter(where)
+        result = {key: [] for key in ('ids', 'distances', 'documents', 'metadatas') if key == 'ids' or key in include}
+        for query in np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)):
+            entries = self._entries(self.index.search(query, n_results * self.rescore_factor, topic))
+            if entries:
+                full = np.asarray([vector for _, vector, _, _ in entries], dtype=np.float32)
+                cosines = full @ query / np.maximum(np.linalg.norm(full, axis=1) * np.linalg.norm(query), 1e-12)
+                order = np.argsort(-cosines)[:n_results]
+            else:
+                cosines, order = np.zeros(0), []
+            result['ids'].append([entries[i][0] for i in order])
+            if 'distances' in result:
+                scale = 2.0 if self.space == 'l2' else 1.0
+                result['distances'].append([scale * (1.0 - float(cosines[i])) for i in order])
+            if 'documents' in result:
+                result['documents'].append([entries[i][2] for i in order])
+            if 'metadatas' in result:
+                result['metadatas'].append([entries[i][3] for i in order])
+        return result
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str] = None, metadatas: List[Dict] = None):
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+        topics = [(m or {}).get('topic') for m in metadatas]
+        with self._lock:
+            for doc_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                self._pending[doc_id] = (vector.copy(), document, metadata)
+                self._metadata.pop(doc_id, None)
+            if self.index.fitted:
+                self.index.upsert(list(ids), vectors, topics)
+            else:
+                # Anlık görüntü yokken ilk toplu ekleme kodlayıcıyı eğitir
+                self.index.build(list(ids), vectors, topics)
+
+    def update(self, ids: List[str], metadatas: List[Dict]):
+        self.index.set_topics(ids, [(m or {}).get('topic') for m in metadatas])
+        with self._lock:
+            for doc_id, metadata in zip(ids, metadatas):
+                if doc_id in self._pending:
+                    vector, document, _ = self._pending[doc_id]
+                    self._pending[doc_id] = (vector, document, metadata)
+                elif doc_id in self._snapshot_rows and (metadata or {}).get('answer') == self.snapshot.answers[self._snapshot_rows[doc_id]]:
+                    # Cevap anlık görüntüdekiyle aynıysa (ör. sadece konu değişti) kopya tutulmaz
+                    self._metadata.pop(doc_id, None)
+                else:
+                    self._metadata[doc_id] = metadata
+
+    def delete(self, ids: List[str]):
+        self.index.remove(ids)
+        with self._lock:
+            for doc_id in ids:
+                self._pending.pop(doc_id, None)
+                self._metadata.pop(doc_id, None)
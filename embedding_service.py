@@ -0,0 +1,290 @@
+import argparse
+import http.client
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Bir gruba en fazla bu kadar metin alınır
+MAX_BATCH_SIZE = 64
+# İlk istek geldikten sonra aynı gruba katılacak istekler için beklenen süre (ms)
+MAX_WAIT_MS = 5.0
+CLIENT_TIMEOUT_SECONDS = 10.0
+# Büyük listeler (ör. veri setinin ilk kodlanması) sunucuya bu boyutta parçalar halinde gönderilir
+CLIENT_CHUNK_SIZE = 256
+# Sunucuya ulaşılamazsa bu süre boyunca yerel modele düşülür, sonra sunucu yeniden denenir (sn)
+RETRY_INTERVAL_SECONDS = 30.0
+
+
+class MicroBatcher:
+    """
+    Eşzamanlı encode isteklerini kısa bir pencerede toplayıp modeli tek çağrıyla çalıştırır.
+    Her istek bir Future alır; grup kodlandığında sonuç satırları isteklere geri dağıtılır.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_ms: float = MAX_WAIT_MS):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self.batches = 0
+        self.texts = 0
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype=np.float32))
+        else:
+            self._queue.put((list(texts), future))
+        return future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def _collect(self):
+        """İlk isteği bekler, ardından pencere dolana veya grup boyutuna ulaşılana kadar yenilerini ekler."""
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            texts = [text for batch, _ in pending for text in batch]
+            try:
+                vectors = np.asarray(self.encode_fn(texts), dtype=np.float32)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            offset = 0
+            for batch, future in pending:
+                future.set_result(vectors[offset:offset + len(batch)])
+                offset += len(batch)
+
+
+class EmbeddingServer:
+    """
+    Modeli bir kez yükleyen yerel HTTP embedding sunucusu.
+    POST /encode  {"texts": [...]} -> float32 satırlar (little-endian ham bayt, boyut X-Embedding-Dim başlığında)
+    GET  /health  -> {"model": ..., "dim": ..., "batches": ..., "texts": ...}
+    """
+
+    def __init__(self, model_name: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS, device: str = None):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.model = SentenceTransformer(model_name, device=self.device)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.batcher = MicroBatcher(self._encode, max_batch_size, max_wait_ms)
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=self.batcher.max_batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str, headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_json(self, status: int, payload: dict):
+                self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+            def do_GET(self):
+                if self.path != '/health':
+                    self._send_json(404, {"error": "Bulunamadı"})
+                    return
+                self._send_json(200, {"model": server.model_name, "dim": server.dim,
+                                      "batches": server.batcher.batches, "texts": server.batcher.texts})
+
+            def do_POST(self):
+                if self.path != '/encode':
+                    self._send_json(404, {"error": "Bulunamadı"})
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', 0))
+                    texts = json.loads(self.rfile.read(length).decode('utf-8'))['texts']
+                    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                        raise ValueError("'texts' bir metin listesi olmalı")
+                except (ValueError, KeyError, TypeError) as e:
+                    self._send_json(400, {"error": f"Geçersiz istek: {e}"})
+                    return
+                try:
+                    vectors = server.batcher.encode(texts) if texts else np.zeros((0, server.dim), dtype=np.float32)
+                except Exception as e:
+                    self._send_json(500, {"error": f"Kodlama başarısız: {e}"})
+                    return
+                self._send(200, np.ascontiguousarray(vectors, dtype='<f4').tobytes(), 'application/octet-stream',
+                           {"X-Embedding-Dim": str(server.dim), "X-Embedding-Model": server.model_name})
+
+        return Handler
+
+    def serve_forever(self):
+        host, port = self.httpd.server_address[:2]
+        print(f"DEBUG: Embedding sunucusu http://{host}:{port} adresinde hazır (model: '{self.model_name}', "
+              f"grup: {self.batcher.max_batch_size}, bekleme: {self.batcher.max_wait * 1000:.1f} ms).")
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class EmbeddingClient:
+    """
+    SentenceTransformer.encode ile aynı şekilde çağrılabilen embedding sunucusu istemcisi.
+    Sunucuya ulaşılamazsa veya sunucu başka bir model çalıştırıyorsa `fallback_factory` ile yerel model
+    yüklenir (sadece ilk ihtiyaçta) ve RETRY_INTERVAL_SECONDS sonra sunucu yeniden denenir.
+    """
+
+    def __init__(self, url: str, model_name: str, fallback_factory: Callable[[], object] = None,
+                 timeout: float = CLIENT_TIMEOUT_SECONDS, retry_interval: float = RETRY_INTERVAL_SECONDS):
+        parsed = urlparse(url if '://' in url else f"http://{url}")
+        self.host = parsed.hostname or DEFAULT_HOST
+        self.port = parsed.port or DEFAULT_PORT
+        self.model_name = model_name
+        self.fallback_factory = fallback_factory
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._local = threading.local()
+        self._fallback_model = None
+        self._fallback_lock = threading.Lock()
+        self._unavailable_until = 0.0
+        self._checked = False
+
+    def _connection(self) -> http.client.HTTPConnection:
+        # Her iş parçacığı kendi kalıcı (keep-alive) bağlantısını kullanır
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method: str, path: str, body: bytes = None):
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers={"Content-Type": "application/json"} if body else {})
+                response = conn.getresponse()
+                return response, response.read()
+            except (http.client.HTTPException, OSError):
+                # Sunucu boşta kalan bağlantıyı kapatmış olabilir; bir kez yeni bağlantıyla denenir
+                conn.close()
+                self._local.conn = None
+                if attempt == 1:
+                    raise
+
+    def _check_server(self):
+        response, body = self._request('GET', '/health')
+        if response.status != 200:
+            raise ConnectionError(f"Sağlık kontrolü başarısız (HTTP {response.status})")
+        served = json.loads(body.decode('utf-8')).get('model')
+        if served != self.model_name:
+            raise ConnectionError(f"Sunucu farklı bir model çalıştırıyor ('{served}' != '{self.model_name}')")
+        self._checked = True
+        print(f"DEBUG: Embedding sunucusu kullanılıyor: {self.host}:{self.port} ('{served}').")
+
+    def _encode_remote(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if not self._checked:
+            self._check_server()
+        parts = []
+        for start in range(0, len(texts), CLIENT_CHUNK_SIZE):
+            chunk = texts[start:start + CLIENT_CHUNK_SIZE]
+            response, body = self._request('POST', '/encode', json.dumps({"texts": chunk}, ensure_ascii=False).encode('utf-8'))
+            if response.status != 200:
+                raise ConnectionError(f"Embedding sunucusu hata döndürdü (HTTP {response.status}): {body[:200]!r}")
+            dim = int(response.getheader('X-Embedding-Dim'))
+            parts.append(np.frombuffer(body, dtype='<f4').reshape(len(chunk), dim))
+        return np.vstack(parts) if len(parts) > 1 else parts[0]
+
+    def _fallback(self):
+        if self._fallback_model is None:
+            if self.fallback_factory is None:
+                raise ConnectionError("Embedding sunucusuna ulaşılamıyor ve yerel model tanımlı değil.")
+            with self._fallback_lock:
+                if self._fallback_model is None:
+                    print(f"DEBUG: Yerel embedding modeli yükleniyor ('{self.model_name}').")
+                    self._fallback_model = self.fallback_factory()
+        return self._fallback_model
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, convert_to_tensor: bool = False, **kwargs):
+        """Tek metin için 1 boyutlu, liste için 2 boyutlu numpy dizisi döndürür."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors: Optional[np.ndarray] = None
+        if time.time() >= self._unavailable_until:
+            try:
+                vectors = self._encode_remote(texts)
+            except (ConnectionError, OSError, http.client.HTTPException, ValueError, TypeError) as e:
+                self._unavailable_until = time.time() + self.retry_interval
+                self._checked = False
+                print(f"Uyarı: Embedding sunucusu kullanılamıyor: {e}. {self.retry_interval:.0f} sn boyunca yerel model kullanılacak.")
+        if vectors is None:
+            vectors = np.asarray(self._fallback().encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar,
+                                                         convert_to_numpy=True), dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Birden fazla uygulama sürecinin paylaştığı yerel embedding sunucusu (dinamik mikro gruplama).")
+    parser.add_argument('--model', default="all-MiniLM-L6-v2")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH_SIZE, help="Bir gruptaki en fazla metin sayısı.")
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS, help="Gruba katılacak istekler için bekleme süresi (ms).")
+    parser.add_argument('--device', default=None, help="'cpu' veya 'cuda' (varsayılan: varsa cuda).")
+    args = parser.parse_args()
+
+    server = EmbeddingServer(args.model, args.host, args.port, args.max_batch, args.max_wait_ms, args.device)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEmbedding sunucusu kapatılıyor.")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
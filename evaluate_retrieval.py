@@ -0,0 +1,160 @@
+import argparse
+import json
+import re
+
+import numpy as np
+
+from main import QASystem
+
+# Değerlendirilecek veri seti
+DATASET_PATH = 'data.json'
+# Her LLM'e düşüşün yaklaşık maliyeti (saniye)
+LLM_FALLBACK_COST_SECONDS = 1.0
+
+
+def make_query_variants(question, stop_words):
+    """
+    Veri setindeki bir sorudan, eşleşmesi beklenen basit varyasyonlar üretir.
+    (tam metin, küçük harf/noktalamasız, stop word'süz, son kelimesi atılmış)
+    """
+    variants = [("exact", question)]
+    plain = re.sub(r'[^\w\s]', ' ', question.lower())
+    tokens = plain.split()
+    if tokens:
+        variants.append(("lower_nopunct", " ".join(tokens)))
+    content_tokens = [t for t in tokens if t not in stop_words]
+    if content_tokens and len(content_tokens) != len(tokens):
+        variants.append(("no_stopwords", " ".join(content_tokens)))
+    if len(tokens) >= 3:
+        variants.append(("truncated", " ".join(tokens[:-1])))
+    return variants
+
+
+def load_queries(qa_system, queries_path=None, limit=None):
+    """
+    Değerlendirme sorgularını (sorgu, beklenen soru, varyasyon) olarak döndürür.
+    queries_path verilirse her satırı {"query": ..., "expected": ...} olan bir JSONL dosyası okunur.
+    """
+    if queries_path:
+        queries = []
+        with open(queries_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    queries.append((record['query'], record['expected'], record.get('variant', 'custom')))
+        return queries[:limit] if limit else queries
+
+    items = qa_system.data[:limit] if limit else qa_system.data
+    queries = []
+    for item in items:
+        for variant, query in make_query_variants(item['question'], qa_system.stop_words):
+            queries.append((query, item['question'], variant))
+    return queries
+
+
+def sweep_thresholds(scores, correct, thresholds):
+    """Her eşik için isabet, yanlış eşleşme ve LLM'e düşüş oranlarını hesaplar."""
+    rows = []
+    n = max(len(scores), 1)
+    for t in thresholds:
+        accepted = scores >= t
+        rows.append({
+            "threshold": round(float(t), 4),
+            "hit_rate": float(np.sum(accepted & correct)) / n,
+            "wrong_rate": float(np.sum(accepted & ~correct)) / n,
+            "fallback_rate": float(np.sum(~accepted)) / n,
+        })
+    return rows
+
+
+def evaluate(qa_system, queries, max_wrong_rate):
+    """Sorguları çalıştırır, mevcut eşikteki sonuçları ve eşik taramasını döndürür."""
+    scores, correct, variants = [], [], []
+    for query, expected, variant in queries:
+        candidates = qa_system.retrieve_candidates(query)
+        best = candidates[0] if candidates else None
+        scores.append(best['score'] if best else float('-inf'))
+        correct.append(bool(best and best['question'] == expected))
+        variants.append(variant)
+
+    scores = np.array(scores, dtype=np.float64)
+    correct = np.array(correct, dtype=bool)
+    current_threshold = qa_system._acceptance_threshold()
+    current = sweep_thresholds(scores, correct, [current_threshold])[0]
+
+    finite_scores = scores[np.isfinite(scores)]
+    if finite_scores.size:
+        grid = np.unique(np.round(np.linspace(finite_scores.min(), finite_scores.max(), 41), 4))
+    else:
+        grid = np.array([current_threshold])
+    sweep = sweep_thresholds(scores, correct, grid)
+
+    # Yanlış eşleşme oranı sınırı içinde kalan en düşük eşik = en az LLM çağrısı
+    eligible = [row for row in sweep if row['wrong_rate'] <= max_wrong_rate]
+    recommended = min(eligible, key=lambda row: row['threshold']) if eligible else None
+
+    per_variant = {}
+    for variant in sorted(set(variants)):
+        mask = np.array([v == variant for v in variants])
+        per_variant[variant] = sweep_thresholds(scores[mask], correct[mask], [current_threshold])[0]
+
+    return {
+        "query_count": len(queries),
+        "score_type": "rerank" if qa_system.reranker is not None else "similarity",
+        "current": current,
+        "per_variant": per_variant,
+        "recommended": recommended,
+        "sweep": sweep,
+    }
+
+
+def print_report(report, max_wrong_rate):
+    current = report['current']
+    print("\n" + "=" * 50)
+    print("📊 Eşleştirme Değerlendirme Raporu 📊")
+    print("=" * 50)
+    print(f"Sorgu sayısı: {report['query_count']} (skor türü: {report['score_type']})")
+    print(f"Mevcut eşik {current['threshold']}: isabet %{current['hit_rate'] * 100:.1f}, "
+          f"yanlış eşleşme %{current['wrong_rate'] * 100:.1f}, LLM'e düşüş %{current['fallback_rate'] * 100:.1f}")
+    for variant, row in report['per_variant'].items():
+        print(f"  - {variant:<14} isabet %{row['hit_rate'] * 100:.1f}, yanlış %{row['wrong_rate'] * 100:.1f}, düşüş %{row['fallback_rate'] * 100:.1f}")
+
+    recommended = report['recommended']
+    if recommended:
+        saved = (current['fallback_rate'] - recommended['fallback_rate']) * report['query_count']
+        print(f"\nÖnerilen eşik (yanlış eşleşme ≤ %{max_wrong_rate * 100:.1f}): {recommended['threshold']}")
+        print(f"  isabet %{recommended['hit_rate'] * 100:.1f}, LLM'e düşüş %{recommended['fallback_rate'] * 100:.1f} "
+              f"(≈{max(saved, 0):.0f} LLM çağrısı / ≈{max(saved, 0) * LLM_FALLBACK_COST_SECONDS:.0f} sn tasarruf)")
+    else:
+        print(f"\nYanlış eşleşme oranı ≤ %{max_wrong_rate * 100:.1f} olan bir eşik bulunamadı.")
+    print("=" * 50 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="find_best_match isabet / LLM'e düşüş oranını değerlendirir ve eşik önerir.")
+    parser.add_argument('--data', default=DATASET_PATH, help="Değerlendirilecek QA veri dosyası.")
+    parser.add_argument('--queries', default=None, help="İsteğe bağlı JSONL sorgu dosyası ({'query', 'expected'}).")
+    parser.add_argument('--limit', type=int, default=None, help="Değerlendirilecek en fazla kayıt/sorgu sayısı.")
+    parser.add_argument('--top-k', type=int, default=5, help="Getirilecek aday sayısı.")
+    parser.add_argument('--reranker', default=None, help="İsteğe bağlı CrossEncoder model adı.")
+    parser.add_argument('--lexical-weight', type=float, default=0.25, help="BM25 skorunun birleştirme ağırlığı (0 = sadece embedding).")
+    parser.add_argument('--max-wrong-rate', type=float, default=0.02, help="Önerilen eşik için kabul edilen en yüksek yanlış eşleşme oranı.")
+    parser.add_argument('--output', default=None, help="Raporun JSON olarak kaydedileceği dosya.")
+    args = parser.parse_args()
+
+    qa_system = QASystem(data_path=args.data, retrieval_top_k=args.top_k,
+                         reranker_model_name=args.reranker, lexical_weight=args.lexical_weight,
+                         load_api_key=False)
+    queries = load_queries(qa_system, args.queries, args.limit)
+    report = evaluate(qa_system, queries, args.max_wrong_rate)
+    print_report(report, args.max_wrong_rate)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Rapor '{args.output}' dosyasına kaydedildi.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
-import google.generativeai as genai
+import argparse
 import os
 import json
 import time
-import random 
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import rating_store
 
 GOOGLE_API_KEY = "geminiapikeyburayayayazilir" 
 
@@ -22,17 +26,164 @@ TOPICS = [
     "Destek Vektör Makineleri (SVM)", "Rastgele Orman (Random Forest)", "Naive Bayes Sınıflandırıcısı",
     "Boyut Azaltma ve PCA", "Kümeleme (Clustering) ve K-Means", "ROC Eğrisi ve AUC Değeri"
 ]
+
+# Aynı anda çalışan istek sayısı
+WORKER_COUNT = 4
+# API kotası (dakikadaki istek sayısı); token bucket bu hızla doldurulur
+REQUESTS_PER_MINUTE = 15
+# Her kaç kabul edilen çiftte bir data.json'a ara kayıt yapılacağı
+CHECKPOINT_EVERY = 10
+# Bu benzerliğin üzerindeki sorular mevcut bir sorunun tekrarı sayılır
+DUPLICATE_SIMILARITY_THRESHOLD = 0.9
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# 429 (kota aşımı) sonrası yeniden deneme sayısı ve ilk bekleme süresi (saniye)
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 2.0
 # --- AYARLAR SONU ---
 
 
-if "BURAYA_YENİ_VE_GÜVENLİ_API_ANAHTARINIZI_YAPIŞTIRIN" in GOOGLE_API_KEY:
-    raise ValueError("Lütfen 1. ADIM'daki GOOGLE_API_KEY değişkenini YENİ ve GÜVENLİ anahtarınızla güncelleyin.")
+class TokenBucket:
+    """
+    Basit token bucket hız sınırlayıcı. Her istek bir token harcar; tokenlar
+    dakikadaki istek kotasına göre dolar. 429 alındığında kova bir süre dondurulur.
+    """
+
+    def __init__(self, requests_per_minute, capacity=None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = capacity or max(1, requests_per_minute // 4)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Bir token alınana kadar bekler."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                    self.updated_at = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait_seconds = (1 - self.tokens) / self.rate
+                else:
+                    wait_seconds = self.paused_until - now
+            time.sleep(wait_seconds)
+
+    def pause(self, seconds):
+        """Kota aşımında tüm işçileri `seconds` saniye bekletir ve kovayı boşaltır."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+            self.updated_at = self.paused_until
+
+
+class GeminiModel:
+    """Gemini API'si üzerinden metin üreten model."""
+
+    def __init__(self, api_key=GOOGLE_API_KEY, model_name='gemini-1.5-flash-latest'):
+        if "BURAYA_YENİ_VE_GÜVENLİ_API_ANAHTARINIZI_YAPIŞTIRIN" in api_key:
+            raise ValueError("Lütfen 1. ADIM'daki GOOGLE_API_KEY değişkenini YENİ ve GÜVENLİ anahtarınızla güncelleyin.")
+        import google.generativeai as genai
+        # Gemini API'sini yapılandır
+        genai.configure(api_key=api_key)
+        # Kullanılacak Gemini modelini seç
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        return self.model.generate_content(prompt).text
+
+
+class RateLimitError(Exception):
+    """Yerel stub modelin ürettiği 429 benzeri hata."""
+
+
+class StubModel:
+    """
+    Testler ve deneme çalıştırmaları için yerel, deterministik model.
+    API'ye gitmeden geçerli JSON soru-cevap çiftleri üretir; isteğe bağlı olarak
+    her `rate_limit_every` istekte bir 429 hatası taklit eder.
+    """
+
+    ASPECTS = ["temel fikir", "en sık yapılan hata", "tipik kullanım alanı", "avantaj ve dezavantajlar",
+               "basit bir örnek", "hiperparametre seçimi", "değerlendirme yöntemi", "veri gereksinimi"]
+    SCENARIOS = ["Küçük bir veri setinde", "Gerçek zamanlı bir uygulamada", "Dengesiz sınıflarda",
+                 "Bir öğrenci projesinde", "Üretim ortamında"]
+
+    def __init__(self, seed=0, latency_seconds=0.0, rate_limit_every=0):
+        self.random = random.Random(seed)
+        self.latency_seconds = latency_seconds
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def generate(self, prompt):
+        with self.lock:
+            self.calls += 1
+            call_no = self.calls
+            number = self.random.randint(0, 10 ** 6)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if self.rate_limit_every and call_no % self.rate_limit_every == 0:
+            raise RateLimitError("429 Resource has been exhausted (stub)")
+        topic = prompt.split("'")[1] if "'" in prompt else "Makine öğrenmesi"
+        aspect = self.ASPECTS[number % len(self.ASPECTS)]
+        scenario = self.SCENARIOS[(number // len(self.ASPECTS)) % len(self.SCENARIOS)]
+        return json.dumps({
+            "question": f"{scenario} {topic} için {aspect} nedir? (#{number})",
+            "answer": f"Bu, {topic} konusunda {aspect} için yerel stub model tarafından üretilmiş {number} numaralı cevaptır."
+        }, ensure_ascii=False)
+
+
+def is_rate_limit_error(error):
+    """Hatanın kota aşımı (HTTP 429 / ResourceExhausted) olup olmadığını kontrol eder."""
+    return "429" in str(error) or type(error).__name__ in ("ResourceExhausted", "RateLimitError", "TooManyRequests")
+
+
+class NearDuplicateFilter:
+    """
+    Yeni soruları mevcut korpusla embedding benzerliği üzerinden karşılaştırır.
+    sentence-transformers yüklenemezse sadece birebir (küçük harf) eşleşme kontrolü yapılır.
+    """
+
+    def __init__(self, questions, threshold=DUPLICATE_SIMILARITY_THRESHOLD, model_name=EMBEDDING_MODEL_NAME, use_embeddings=True):
+        self.threshold = threshold
+        self.normalized = {q.lower().strip() for q in questions}
+        self.model = None
+        self.embeddings = None
+        if use_embeddings:
+            try:
+                import numpy as np
+                from sentence_transformers import SentenceTransformer
+                self.np = np
+                self.model = SentenceTransformer(model_name, device="cpu")
+                self.embeddings = self._encode(list(questions)) if questions else np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+                print(f"✅ Tekrar kontrolü için {len(questions)} soru embedding'e çevrildi.")
+            except Exception as e:
+                print(f"⚠️  Uyarı: Embedding modeli yüklenemedi ({e}). Sadece birebir tekrar kontrolü yapılacak.")
+                self.model = None
+
+    def _encode(self, texts):
+        return self.np.asarray(self.model.encode(texts, normalize_embeddings=True, show_progress_bar=False), dtype=self.np.float32)
 
-# Gemini API'sini yapılandır
-genai.configure(api_key=GOOGLE_API_KEY)
+    def check_and_add(self, question):
+        """Soru yeniyse korpusa ekleyip (True, benzerlik) döndürür, tekrar ise (False, benzerlik)."""
+        key = question.lower().strip()
+        if key in self.normalized:
+            return False, 1.0
+        best = 0.0
+        if self.model is not None:
+            emb = self._encode([question])
+            if len(self.embeddings):
+                best = float((self.embeddings @ emb[0]).max())
+                if best >= self.threshold:
+                    return False, best
+            self.embeddings = self.np.vstack([self.embeddings, emb])
+        self.normalized.add(key)
+        return True, best
 
-# Kullanılacak Gemini modelini seç
-model = genai.GenerativeModel('gemini-1.5-flash-latest')
 
 def load_existing_data(filepath):
     """Mevcut JSON dosyasını okur ve içeriğini döndürür."""
@@ -43,24 +194,23 @@ def load_existing_data(filepath):
         return []
 
 def save_data_to_json(filepath, data):
-    """Veriyi JSON dosyasına güzel bir formatla (indent) yazar."""
-    with open(filepath, 'w', encoding='utf-8') as f:
+    """Veriyi JSON dosyasına güzel bir formatla (indent) yazar. Yarım kalan yazma dosyayı bozmasın diye önce geçici dosyaya yazılır."""
+    tmp_path = filepath + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, filepath)
 
-def generate_new_qa_pair(existing_questions_normalized, topic):
-    """Gemini API'sini kullanarak yeni ve benzersiz bir soru-cevap çifti oluşturur."""
-    print(f"\n🌀 '{topic}' konusunda yeni bir soru-cevap çifti oluşturuluyor...")
+def build_prompt(existing_questions_sample, topic):
+    existing_questions_str = "\n- ".join(existing_questions_sample)
 
-    existing_questions_str = "\n- ".join(list(existing_questions_normalized)[:15])
-    
     # --- ÇÖZÜM 2: Daha akıllı ve yaratıcı olmasını isteyen prompt ---
-    prompt = f"""
+    return f"""
     Sen, Makine Öğrenmesi (ML) konusuna yeni başlayanlar için bir SSS listesi hazırlayan bir uzmansın.
     Görevin, '{topic}' konusu hakkında, daha önce sorulmuş olanlardan FARKLI, konunun başka bir yönünü ele alan, temel seviyede ve yaratıcı bir soru sormaktır.
     Cevap, bu soruyu 2-3 cümlelik basit ve anlaşılır bir dille açıklamalıdır.
 
     Aşağıda daha önce sorulmuş olan sorular listelenmiştir. Lütfen bu listede OLMAYAN ve bu listeye BENZEMEYEN yeni bir soru üret.
-    
+
     Mevcut Sorular:
     - {existing_questions_str}
 
@@ -71,57 +221,135 @@ def generate_new_qa_pair(existing_questions_normalized, topic):
       "answer": "Buraya sorunun 2-3 cümlelik basit ve anlaşılır cevabını yaz"
     }}
     """
-    
-    try:
-        response = model.generate_content(prompt)
-        cleaned_response_text = response.text.strip().replace("```json", "").replace("```", "").strip()
-        qa_pair = json.loads(cleaned_response_text)
-        
-        if "question" in qa_pair and "answer" in qa_pair:
-            return qa_pair
-        else:
-            print("  ❌ HATA: Gemini'den gelen yanıt beklenen formatta değil.")
+
+def generate_new_qa_pair(model, bucket, existing_questions_sample, topic):
+    """
+    Modeli kullanarak yeni bir soru-cevap çifti oluşturur.
+    Her deneme öncesi hız sınırlayıcıdan token alınır; 429 hatalarında üstel geri çekilme uygulanır.
+    """
+    print(f"\n🌀 '{topic}' konusunda yeni bir soru-cevap çifti oluşturuluyor...")
+    prompt = build_prompt(existing_questions_sample, topic)
+
+    for attempt in range(MAX_RETRIES + 1):
+        bucket.acquire()
+        try:
+            response_text = model.generate(prompt)
+        except Exception as e:
+            if is_rate_limit_error(e) and attempt < MAX_RETRIES:
+                delay = BACKOFF_BASE_SECONDS * (2 ** attempt) * (1 + random.random() * 0.25)
+                print(f"  ⏳ Kota aşıldı (429). {delay:.1f} saniye geri çekiliniyor (deneme {attempt + 1}/{MAX_RETRIES}).")
+                bucket.pause(delay)
+                continue
+            print(f"  ❌ HATA: Model çağrısı sırasında bir hata oluştu: {e}")
             return None
-            
-    except Exception as e:
-        print(f"  ❌ HATA: Gemini API çağrısı veya JSON ayrıştırma sırasında bir hata oluştu: {e}")
+
+        try:
+            cleaned_response_text = response_text.strip().replace("```json", "").replace("```", "").strip()
+            qa_pair = json.loads(cleaned_response_text)
+        except json.JSONDecodeError as e:
+            print(f"  ❌ HATA: Yanıt JSON olarak ayrıştırılamadı: {e}")
+            return None
+
+        if isinstance(qa_pair, dict) and qa_pair.get("question") and qa_pair.get("answer"):
+            return qa_pair
+        print("  ❌ HATA: Modelden gelen yanıt beklenen formatta değil.")
         return None
+    return None
+
+def new_qa_entry(qa_pair):
+    """Üretilen çifti QASystem'in beklediği alanlarla bir data.json kaydına çevirir."""
+    return {
+        "question": qa_pair['question'].strip(),
+        "answer": qa_pair['answer'].strip(),
+        "answer2": "",
+        "sorulma_sayisi": 0,
+        "rating_stats": rating_store.empty_stats(),
+        "current_average": 0.0
+    }
+
+def run_generation(model, dataset_path=DATASET_PATH, target=TARGET_QUESTION_COUNT, workers=WORKER_COUNT,
+                   requests_per_minute=REQUESTS_PER_MINUTE, checkpoint_every=CHECKPOINT_EVERY,
+                   duplicate_filter=None):
+    """
+    Hedef soru sayısına ulaşılana kadar `workers` eşzamanlı istekle yeni çiftler üretir.
+    Kabul edilen çiftler her `checkpoint_every` adımda ve işlem sonunda toplu olarak kaydedilir.
+    """
+    data = load_existing_data(dataset_path)
+    print(f"📚 Mevcut veri setinde {len(data)} adet soru-cevap çifti bulunuyor.")
+    if len(data) >= target:
+        print(f"🎉 Hedef olan {target} soruya zaten ulaşılmış veya geçilmiş. Program sonlandırılıyor.")
+        return data
+
+    if duplicate_filter is None:
+        duplicate_filter = NearDuplicateFilter([item['question'] for item in data])
+    bucket = TokenBucket(requests_per_minute)
+    recent_questions = [item['question'] for item in data[-15:]]
+    unsaved = 0
+    stats = {"accepted": 0, "duplicates": 0, "failed": 0}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        while len(data) < target or in_flight:
+            # Hedefi aşmamak için eksik soru sayısından fazla istek göndermiyoruz
+            while len(data) + len(in_flight) < target and len(in_flight) < workers:
+                # --- ÇÖZÜM 1: Konuyu rastgele seçiyoruz ---
+                topic = random.choice(TOPICS)
+                in_flight.add(executor.submit(generate_new_qa_pair, model, bucket, list(recent_questions), topic))
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                new_qa = future.result()
+                if not new_qa:
+                    stats["failed"] += 1
+                    print("⚠️  Uyarı: Geçerli bir çift oluşturulamadı, tekrar denenecek.")
+                    continue
+                if len(data) >= target:
+                    continue
+
+                is_new, similarity = duplicate_filter.check_and_add(new_qa['question'])
+                if not is_new:
+                    stats["duplicates"] += 1
+                    print(f"⚠️  Uyarı: Oluşturulan soru '{new_qa['question']}' mevcut bir soruya çok benziyor (benzerlik: {similarity:.2f}). Tekrar denenecek.")
+                    continue
+
+                data.append(new_qa_entry(new_qa))
+                recent_questions = (recent_questions + [new_qa['question']])[-15:]
+                stats["accepted"] += 1
+                unsaved += 1
+                print(f"✅ Başarıyla eklendi! Toplam soru sayısı: {len(data)}. (Hedef: {target})")
+
+                if unsaved >= checkpoint_every:
+                    save_data_to_json(dataset_path, data)
+                    unsaved = 0
+                    print(f"💾 Ara kayıt yapıldı ({len(data)} soru).")
+
+    if unsaved:
+        save_data_to_json(dataset_path, data)
+
+    print(f"\n🎉 İşlem tamamlandı! Hedeflenen {target} soruya ulaşıldı.")
+    print(f"Toplam soru sayısı artık {len(data)}. (Eklenen: {stats['accepted']}, tekrar: {stats['duplicates']}, başarısız: {stats['failed']})")
+    return data
 
 def main():
-    """Ana program döngüsü."""
-    data = load_existing_data(DATASET_PATH)
-    current_count = len(data)
-    print(f"📚 Mevcut veri setinde {current_count} adet soru-cevap çifti bulunuyor.")
-    
-    if current_count >= TARGET_QUESTION_COUNT:
-        print(f"🎉 Hedef olan {TARGET_QUESTION_COUNT} soruya zaten ulaşılmış veya geçilmiş. Program sonlandırılıyor.")
-        return
-
-    existing_questions_normalized = {item['question'].lower().strip() for item in data}
-    
-    while len(data) < TARGET_QUESTION_COUNT:
-        # --- ÇÖZÜM 1: Konuyu rastgele seçiyoruz ---
-        topic = random.choice(TOPICS) 
-        
-        new_qa = generate_new_qa_pair(existing_questions_normalized, topic)
-        
-        if new_qa and new_qa['question'].lower().strip() not in existing_questions_normalized:
-            data.append(new_qa)
-            existing_questions_normalized.add(new_qa['question'].lower().strip())
-            
-            save_data_to_json(DATASET_PATH, data)
-            print(f"✅ Başarıyla eklendi! Toplam soru sayısı: {len(data)}. (Hedef: {TARGET_QUESTION_COUNT})")
-        else:
-            if new_qa:
-                print(f"⚠️  Uyarı: Oluşturulan soru '{new_qa['question']}' zaten mevcut. Tekrar denenecek.")
-            else:
-                print("⚠️  Uyarı: Geçerli bir çift oluşturulamadı, tekrar denenecek.")
-            
-        print("...İstek limitini aşmamak için 5 saniye bekleniyor...")
-        time.sleep(5) 
-
-    print(f"\n🎉 İşlem tamamlandı! Hedeflenen {TARGET_QUESTION_COUNT} soruya ulaşıldı.")
-    print(f"Toplam soru sayısı artık {len(data)}.")
+    """Ana program."""
+    parser = argparse.ArgumentParser(description="Gemini ile data.json için yeni soru-cevap çiftleri üretir.")
+    parser.add_argument('--output', default=DATASET_PATH, help="Yazılacak veri dosyası.")
+    parser.add_argument('--target', type=int, default=TARGET_QUESTION_COUNT, help="Ulaşılacak toplam soru sayısı.")
+    parser.add_argument('--workers', type=int, default=WORKER_COUNT, help="Eşzamanlı istek sayısı.")
+    parser.add_argument('--rpm', type=int, default=REQUESTS_PER_MINUTE, help="Dakikadaki en fazla istek sayısı.")
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY, help="Kaç yeni çiftte bir ara kayıt yapılacağı.")
+    parser.add_argument('--stub', action='store_true', help="Gemini yerine yerel deterministik stub modeli kullan.")
+    parser.add_argument('--no-embeddings', action='store_true', help="Embedding tabanlı tekrar kontrolünü kapat.")
+    args = parser.parse_args()
+
+    model = StubModel() if args.stub else GeminiModel()
+    duplicate_filter = NearDuplicateFilter(
+        [item['question'] for item in load_existing_data(args.output)],
+        use_embeddings=not args.no_embeddings
+    )
+    run_generation(model, dataset_path=args.output, target=args.target, workers=args.workers,
+                   requests_per_minute=args.rpm, checkpoint_every=args.checkpoint_every,
+                   duplicate_filter=duplicate_filter)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,120 @@
+import json
+import os
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+# Dosyadan tek seferde okunan karakter sayısı; bellek kullanımı bu değer + en büyük tek kayıt ile sınırlıdır
+CHUNK_SIZE = 1 << 16
+
+
+def iter_json_array(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """
+    Üst seviyesi dizi olan bir JSON dosyasının elemanlarını tek tek döndürür.
+    Dosyanın tamamı hiçbir zaman belleğe alınmaz.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        eof = False
+
+        def fill():
+            nonlocal buffer, eof
+            chunk = f.read(chunk_size)
+            if chunk:
+                buffer += chunk
+            else:
+                eof = True
+
+        def next_char():
+            nonlocal buffer
+            buffer = buffer.lstrip()
+            while not buffer and not eof:
+                fill()
+                buffer = buffer.lstrip()
+            return buffer[:1]
+
+        if next_char() != '[':
+            raise ValueError(f"'{path}' bir JSON dizisi değil.")
+        buffer = buffer[1:]
+
+        expect_value = True
+        first = True
+        while True:
+            char = next_char()
+            if not char:
+                raise ValueError(f"'{path}' beklenmedik şekilde bitti (yarım yazılmış olabilir).")
+            if char == ']' and (first or not expect_value):
+                return
+            if not expect_value:
+                if char != ',':
+                    raise ValueError(f"'{path}' içinde ',' bekleniyordu, '{char}' bulundu.")
+                buffer = buffer[1:]
+                expect_value = True
+                continue
+            try:
+                value, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # Parça bir sayının ortasında bitmiş olabilir ('2.' | '5e10' ilk denemede 2 olarak çözülür);
+            # değer ancak ardından ',' veya ']' geliyorsa kabul edilir, yoksa tampon doldurulup yeniden çözülür
+            if not eof and buffer[end:].lstrip()[:1] not in (',', ']'):
+                fill()
+                continue
+            buffer = buffer[end:]
+            first = False
+            expect_value = False
+            yield value
+
+
+def write_json_array(path: str, records: Iterable, indent: int = 2) -> int:
+    """
+    Kayıtları `json.dump(..., indent=indent)` ile aynı biçimde, akış halinde yazar.
+    Önce geçici dosyaya yazılır ve ancak tamamı yazıldıktan sonra hedefin yerine taşınır;
+    yarıda kalan bir çalıştırma hedef dosyayı bozmaz. Yazılan kayıt sayısını döndürür.
+    """
+    tmp_path = path + '.tmp'
+    pad = ' ' * indent
+    count = 0
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('[')
+            for record in records:
+                f.write(',\n' if count else '\n')
+                text = json.dumps(record, ensure_ascii=False, indent=indent)
+                f.write('\n'.join(pad + line for line in text.split('\n')) if indent else text)
+                count += 1
+            f.write('\n]' if count else ']')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def transform_json_array(input_path: str, transform: Callable[[Dict], Optional[Dict]],
+                         output_path: str = None, indent: int = 2) -> Dict[str, int]:
+    """
+    Kayıtları okur, `transform` ile dönüştürür ve yazar (output_path verilmezse girdinin yerine).
+    transform None döndürürse kayıt çıkarılır. {'read', 'written', 'changed'} sayılarını döndürür.
+    """
+    stats = {"read": 0, "written": 0, "changed": 0}
+
+    def records():
+        for record in iter_json_array(input_path):
+            stats["read"] += 1
+            before = json.dumps(record, ensure_ascii=False, sort_keys=True)
+            result = transform(record)
+            if result is None:
+                stats["changed"] += 1
+                continue
+            if json.dumps(result, ensure_ascii=False, sort_keys=True) != before:
+                stats["changed"] += 1
+            yield result
+
+    stats["written"] = write_json_array(output_path or input_path, records(), indent)
+    return stats
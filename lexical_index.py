@@ -0,0 +1,172 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def turkish_lower(text: str) -> str:
+    """Türkçe 'I' / 'İ' harflerini doğru küçülterek metni küçük harfe çevirir."""
+    return text.replace('I', 'ı').replace('İ', 'i').lower()
+
+
+class BM25Index:
+    """
+    Aktif sorular üzerinde bellek içi ters indeks (BM25).
+    Belgeler soru metniyle anahtarlanır; ekleme ve silme işlemleri artımlıdır,
+    tüm indeksi yeniden kurmaya gerek yoktur. Ekleme/silme ile puanlama aynı kilitle sıralanır; /ask
+    istekleri yeni soru eklenirken değişen posting sözlüklerini gezmez.
+    normalize verilirse her terim (ör. kelime kökü) bu fonksiyondan geçirilir; belgeler ve sorgular aynı şekilde işlenir.
+    """
+
+    def __init__(self, stop_words: Optional[Set[str]] = None, keywords: Optional[Iterable[str]] = None,
+                 k1: float = 1.5, b: float = 0.75, keyword_boost: float = 1.5,
+                 normalize: Optional[Callable[[str], str]] = None):
+        self.stop_words = {turkish_lower(w) for w in (stop_words or set())}
+        self.normalize = normalize
+        self.keyword_tokens = set()
+        for keyword in keywords or []:
+            self.keyword_tokens.update(self.tokenize(keyword, drop_stop_words=False))
+        self.k1 = k1
+        self.b = b
+        self.keyword_boost = keyword_boost
+
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Counter] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        self.signatures: Dict[frozenset, Set[str]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_terms
+
+    def tokenize(self, text: str, drop_stop_words: bool = True) -> List[str]:
+        """Metni küçük harfe çevirip stop word'leri atarak terimlere ayırır."""
+        tokens = TOKEN_PATTERN.findall(turkish_lower(text))
+        if drop_stop_words:
+            tokens = [t for t in tokens if t not in self.stop_words]
+        if self.normalize is not None:
+            tokens = [self.normalize(t) for t in tokens]
+        return tokens
+
+    def is_keyword_query(self, tokens: List[str]) -> bool:
+        """Tüm terimler keywords.json sözlüğünde geçiyorsa True döner."""
+        return bool(tokens) and all(t in self.keyword_tokens for t in tokens)
+
+    def _term_weight(self, term: str) -> float:
+        return self.keyword_boost if term in self.keyword_tokens else 1.0
+
+    def add(self, doc_id: str, text: str):
+        """Belgeyi indekse ekler; aynı kimlikle kayıt varsa önce çıkarır."""
+        tokens = self.tokenize(text)
+        terms = Counter(tokens)
+        with self._lock:
+            if doc_id in self.doc_terms:
+                self.remove(doc_id)
+            self.doc_terms[doc_id] = terms
+            self.doc_lengths[doc_id] = len(tokens)
+            self.total_length += len(tokens)
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+            self.signatures.setdefault(frozenset(terms), set()).add(doc_id)
+
+    def remove(self, doc_id: str):
+        """Belgeyi indeksten çıkarır (yoksa sessizce geçer)."""
+        with self._lock:
+            terms = self.doc_terms.pop(doc_id, None)
+            if terms is None:
+                return
+            self.total_length -= self.doc_lengths.pop(doc_id, 0)
+            for term in terms:
+                docs = self.postings.get(term)
+                if docs is not None:
+                    docs.pop(doc_id, None)
+                    if not docs:
+                        del self.postings[term]
+            signature = frozenset(terms)
+            owners = self.signatures.get(signature)
+            if owners is not None:
+                owners.discard(doc_id)
+                if not owners:
+                    del self.signatures[signature]
+
+    def refresh_terms(self, terms: Iterable[str], text_of: Callable[[str], str] = lambda doc_id: doc_id) -> int:
+        """
+        Verilen terimleri içeren belgeleri yeniden tokenize edip indeksler; normalize fonksiyonunun sonucu
+        değiştiğinde (ör. kelimenin kökü sonradan öğrenildi) belgeler güncel terimlerle yer alır.
+        text_of belge kimliğinden metni verir (varsayılan: kimlik metnin kendisi). Yenilenen belge sayısını döndürür.
+        """
+        with self._lock:
+            doc_ids = {doc_id for term in terms for doc_id in self.postings.get(term, ())}
+            for doc_id in doc_ids:
+                self.add(doc_id, text_of(doc_id))
+        return len(doc_ids)
+
+    def idf(self, term: str) -> float:
+        n_docs = len(self.doc_terms)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def _avg_length(self) -> float:
+        return self.total_length / len(self.doc_terms) if self.doc_terms else 0.0
+
+    def _term_score(self, idf: float, tf: int, doc_length: int, avg_length: float) -> float:
+        norm = 1 - self.b + self.b * (doc_length / avg_length if avg_length else 0.0)
+        return idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+
+    def score(self, query_tokens: List[str], doc_ids: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """
+        Sorgu terimleri için BM25 skorlarını döndürür.
+        doc_ids verilirse sadece bu belgeler puanlanır, aksi halde en az bir terimi içeren tüm belgeler.
+        """
+        wanted = set(doc_ids) if doc_ids is not None else None
+        scores: Dict[str, float] = {}
+        with self._lock:
+            avg_length = self._avg_length()
+            for term, qtf in Counter(query_tokens).items():
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                weight = self.idf(term) * self._term_weight(term) * qtf
+                for doc_id, tf in docs.items():
+                    if wanted is not None and doc_id not in wanted:
+                        continue
+                    scores[doc_id] = scores.get(doc_id, 0.0) + self._term_score(weight, tf, self.doc_lengths[doc_id], avg_length)
+        return scores
+
+    def self_score(self, query_tokens: List[str]) -> float:
+        """Sorgunun kendisiyle birebir aynı bir belgenin alacağı skor (normalizasyon için üst sınır)."""
+        terms = Counter(query_tokens)
+        total = 0.0
+        with self._lock:
+            avg_length = self._avg_length()
+            for term, qtf in terms.items():
+                weight = self.idf(term) * self._term_weight(term) * qtf
+                total += self._term_score(weight, qtf, len(query_tokens), avg_length)
+        return total
+
+    def normalized_scores(self, query_tokens: List[str], doc_ids: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """BM25 skorlarını sorgunun öz skoruna bölerek [0, 1] aralığına çeker."""
+        upper = self.self_score(query_tokens)
+        if upper <= 0:
+            return {}
+        return {doc_id: min(s / upper, 1.0) for doc_id, s in self.score(query_tokens, doc_ids).items()}
+
+    def top_k(self, query_tokens: List[str], k: int) -> List[Tuple[str, float]]:
+        """En yüksek normalize skorlu k belgeyi döndürür."""
+        scores = self.normalized_scores(query_tokens)
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    def exact_match(self, query_tokens: List[str]) -> Optional[str]:
+        """Terim kümesi sorguyla birebir aynı olan tek belgeyi döndürür; yoksa veya birden fazlaysa None."""
+        with self._lock:
+            owners = self.signatures.get(frozenset(query_tokens))
+            if owners and len(owners) == 1:
+                return next(iter(owners))
+        return None
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+import numpy as np
+
+# Bir /ask isteğinin LLM için harcayabileceği varsayılan süre (sn)
+DEFAULT_DEADLINE_SECONDS = 8.0
+# Yedek istek, son başarılı çağrıların bu yüzdelik gecikmesi aşılınca gönderilir
+HEDGE_PERCENTILE = 95.0
+# Yeterli gecikme örneği yokken kullanılan yedekleme gecikmesi (sn)
+INITIAL_HEDGE_DELAY_SECONDS = 2.0
+MIN_HEDGE_SAMPLES = 20
+LATENCY_WINDOW = 200
+# Art arda bu kadar başarısız/zaman aşımına uğrayan çağrıdan sonra devre açılır. Zaman aşımı sadece
+# çağrıya en az yedekleme gecikmesi kadar süre verildiyse sayılır; bütçesi zaten tükenmek üzere olan
+# isteklerin zaman aşımları LLM'in durumu hakkında bilgi taşımaz.
+BREAKER_FAILURE_THRESHOLD = 5
+# Açık devre bu süre sonra tek bir deneme isteğine izin verir (sn)
+BREAKER_RESET_SECONDS = 30.0
+
+
+class LLMUnavailable(Exception):
+    """LLM cevabı süre bütçesi içinde alınamadı veya devre açık."""
+
+
+class CircuitBreaker:
+    """
+    Kapalı / açık / yarı açık devre kesici. Açıkken çağrılar hiç yapılmaz; reset_seconds sonra tek bir
+    deneme çağrısına izin verilir, başarılı olursa devre kapanır.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'half_open' if time.time() - self.opened_at >= self.reset_seconds else 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at < self.reset_seconds or self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print("DEBUG: LLM devre kesicisi kapandı.")
+            self.failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def release(self):
+        """Çağrı sonucu sayılmadan biter; yarı açık devrede deneme hakkı sonraki çağrıya bırakılır."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"DEBUG: LLM devre kesicisi açıldı ({self.failures} art arda hata); "
+                          f"{self.reset_seconds:.0f} sn boyunca LLM çağrılmayacak.")
+                self.opened_at = time.time()
+
+
+class HedgedCaller:
+    """
+    LLM çağrılarını süre bütçesiyle sınırlar. Çağrı, son başarılı çağrıların HEDGE_PERCENTILE gecikmesi
+    içinde bitmezse aynı istek bir kez daha gönderilir ve önce gelen cevap kullanılır. Bütçe dolarsa veya
+    devre açıksa LLMUnavailable fırlatılır; geride kalan çağrılar kendi zaman aşımlarıyla arka planda biter.
+    `call_fn(timeout)` tek bir istek yapar ve en fazla timeout saniye bekler.
+    """
+
+    def __init__(self, max_workers: int = 16, hedge_percentile: float = HEDGE_PERCENTILE,
+                 initial_hedge_delay: float = INITIAL_HEDGE_DELAY_SECONDS, max_hedges: int = 1,
+                 breaker: CircuitBreaker = None):
+        self.hedge_percentile = hedge_percentile
+        self.initial_hedge_delay = initial_hedge_delay
+        self.max_hedges = max(0, max_hedges)
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def hedge_delay(self) -> float:
+        with self._lock:
+            samples = list(self._latencies)
+        if len(samples) < MIN_HEDGE_SAMPLES:
+            return self.initial_hedge_delay
+        return float(np.percentile(samples, self.hedge_percentile))
+
+    def _timed(self, call_fn: Callable[[float], str], timeout: float):
+        start = time.perf_counter()
+        result = call_fn(timeout)
+        return result, time.perf_counter() - start
+
+    def call(self, call_fn: Callable[[float], str], deadline_seconds: float = DEFAULT_DEADLINE_SECONDS,
+             max_hedges: int = None) -> str:
+        """max_hedges verilirse bu çağrı için yedek istek sayısı olarak kullanılır (0 = yedek istek yok)."""
+        if not self.breaker.allow():
+            raise LLMUnavailable("LLM devre kesicisi açık")
+        self.calls += 1
+        deadline = time.perf_counter() + deadline_seconds
+        max_attempts = 1 + (self.max_hedges if max_hedges is None else max(0, max_hedges))
+        delay = self.hedge_delay()
+        futures = {}
+        started = 0
+        next_hedge = 0.0
+        last_error: Optional[BaseException] = None
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            # İlk istek, hata veren isteğin yerine yenisi veya gecikme aşıldığında yedek istek (bütçe kaldıkça)
+            if started < max_attempts and (not futures or now >= next_hedge):
+                if futures:
+                    self.hedged += 1
+                    print(f"DEBUG: LLM çağrısı {delay:.2f} sn içinde bitmedi, yedek istek gönderiliyor.")
+                futures[self._executor.submit(self._timed, call_fn, deadline - now)] = started
+                started += 1
+                next_hedge = now + delay
+            if not futures:
+                break
+            wait_until = min(deadline, next_hedge) if started < max_attempts else deadline
+            done, _ = wait(list(futures), timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                attempt = futures.pop(future)
+                try:
+                    result, latency = future.result()
+                except Exception as e:
+                    last_error = e
+                    print(f"DEBUG: LLM çağrısı başarısız (deneme {attempt + 1}): {e}")
+                    continue
+                with self._lock:
+                    self._latencies.append(latency)
+                if attempt > 0:
+                    self.hedge_wins += 1
+                self.breaker.record_success()
+                return result
+
+        if last_error is not None or deadline_seconds >= delay:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+        if futures or last_error is None:
+            self.timeouts += 1
+            raise LLMUnavailable(f"LLM {deadline_seconds:.1f} sn içinde cevap vermedi")
+        raise LLMUnavailable(str(last_error))
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "hedged": self.hedged, "hedge_wins": self.hedge_wins, "timeouts": self.timeouts,
+                "hedge_delay_seconds": round(self.hedge_delay(), 3), "breaker": self.breaker.state}
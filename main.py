@@ -9,6 +9,34 @@ import openai
 from openai.types.chat import ChatCompletionMessageParam
 from typing import List, Tuple, Dict
 import re 
+import hashlib
+import tempfile
+import threading
+import queue
+import time
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from lexical_index import BM25Index, turkish_lower
+import qa_dedup
+import rating_store
+import corpus_snapshot
+import topic_resolver
+import threshold_calibration
+import turkish_lemmatizer
+import embedding_quantization
+import embedding_service
+import llm_guard
+import analytics
+import random
+from constants import DEFAULT_TOPIC
+
+# Quiz sorusu üretimi (uzun bir cevap) için süre sınırı (sn)
+QUIZ_GENERATION_DEADLINE_SECONDS = 60.0
+# Konusu olmayan kayıtların eski sürümlerde indekse yazıldığı varsayılan konu (bkz. _migrate_legacy_topic_metadata)
+LEGACY_DEFAULT_TOPIC = 'Genel'
+# Küçültülmüş modda bellekte bekleyen (anlık görüntüye yazılmamış) bu kadar soru birikince anlık görüntü yenilenir
+COMPACT_SNAPSHOT_PENDING = 256
+
 
 class QASystem:
     def __init__(self,
@@ -18,11 +46,113 @@ class QASystem:
                  api_key_path='openai_api.json',
                  chatgpt_model="gpt-3.5-turbo",
                  keywords_path='keywords.json', 
+                 stopwords_path='stopwords.json',
                  chroma_dir: str ='chroma_db_persistent',
                  low_score_qa_path='low_score_qa.json',
-                 quiz_questions_path='quiz_questions.json'): 
+                 quiz_questions_path='quiz_questions.json',
+                 retrieval_top_k: int = 5,
+                 reranker_model_name: str = None,
+                 rerank_threshold: float = 0.5,
+                 lexical_weight: float = 0.25,
+                 lexical_fast_path_max_tokens: int = 3,
+                 topic_cache_path='topic_cache.json',
+                 topic_cache_max_entries: int = 5000,
+                 duplicate_threshold: float = 0.9,
+                 background_maintenance: bool = True,
+                 maintenance_interval: float = 1.0,
+                 maintenance_queue_size: int = 1000,
+                 rating_log_path='ratings_log.jsonl',
+                 rating_decay: float = 0.0,
+                 demotion_min_votes: int = 3,
+                 demotion_threshold: float = 3.0,
+                 snapshot_path=corpus_snapshot.SNAPSHOT_DIR,
+                 topic_batch_window: float = topic_resolver.COALESCE_WINDOW_SECONDS,
+                 feedback_log_path=threshold_calibration.FEEDBACK_LOG_PATH,
+                 thresholds_path=threshold_calibration.THRESHOLDS_PATH,
+                 threshold_explore_rate: float = 0.0,
+                 threshold_explore_margin: float = 0.05,
+                 lemma_cache_path=turkish_lemmatizer.LEMMA_CACHE_PATH,
+                 topic_partition_search: bool = True,
+                 index_space: str = 'cosine',
+                 hnsw_m: int = 16,
+                 hnsw_construction_ef: int = 100,
+                 hnsw_search_ef: int = 100,
+                 embedding_precision: str = 'float32',
+                 embedding_dims: int = None,
+                 embedding_projection: str = 'truncate',
+                 rescore_factor: int = 4,
+                 embedding_server_url: str = None,
+                 llm_deadline_seconds: float = llm_guard.DEFAULT_DEADLINE_SECONDS,
+                 llm_hedge_percentile: float = llm_guard.HEDGE_PERCENTILE,
+                 llm_max_hedges: int = 1,
+                 degraded_min_score: float = 0.3,
+                 analytics_path=analytics.ANALYTICS_PATH,
+                 load_api_key: bool = True): 
         """
         Soru-cevap sistemini başlatır ve gerekli tüm bileşenleri yükler.
+
+        retrieval_top_k: find_best_match'in ChromaDB'den çektiği aday sayısı.
+        reranker_model_name: Verilirse adaylar bu CrossEncoder modeliyle (CPU) yeniden sıralanır
+            ve kabul kararı rerank_threshold ile verilir. None ise sadece embedding benzerliği kullanılır.
+        lexical_weight: BM25 (sözcüksel) skorunun embedding benzerliğiyle birleştirilirken aldığı ağırlık (0 = kapalı).
+            Birleştirilmiş skor benzerliğin altına inmez; sözcüksel sinyal sadece adayı yükseltebilir.
+        lexical_fast_path_max_tokens: Bu kadar veya daha az anahtar kelimeden oluşan sorgular, terim kümesi
+            birebir eşleşen tek bir soru varsa embedding hesaplanmadan cevaplanır (0 = kapalı).
+        topic_cache_path: data.json'da olmayan sorular için soru -> konu önbelleği dosyası.
+        duplicate_threshold: Yeni soru, aktif havuzdaki bir soruya bu benzerlikte (similarity_threshold ile aynı
+            ölçek) veya daha yakınsa eklenmez. None ise kontrol kapalıdır.
+        background_maintenance: True ise puanlama sonrası pasif havuza taşıma, answer2 terfisinin indekse
+            yansıtılması ve JSON kayıtları arka plan bakım iş parçacığında toplu olarak uygulanır.
+            False ise aynı işler çağrı içinde hemen uygulanır.
+        maintenance_interval: Bakım iş parçacığının ilk işten sonra diğer işleri toplamak için beklediği süre (sn).
+        maintenance_queue_size: Bakım kuyruğunun üst sınırı; kuyruk doluysa iş çağrı içinde uygulanır.
+        rating_log_path: Ham puanların eklendiği JSONL günlüğü (None = kapalı). Kayıtlarda sadece
+            sabit boyutlu puan özeti ('rating_stats') tutulur.
+        rating_decay: 0'dan büyükse pasife taşıma kararı, yeni puanlara bu ağırlığı veren azalan ortalamayla verilir.
+        demotion_min_votes / demotion_threshold: Bu sayıdan fazla puan almış ve ortalaması eşiğin altında
+            kalan birincil cevap pasife taşınır (answer2 varsa o terfi ettirilir).
+        snapshot_path: Embedding'lerin memmap ile okunduğu ikili anlık görüntü dizini (None = kapalı).
+            Anlık görüntüde bulunan sorular için embedding yeniden hesaplanmaz; indeks eşitlenirken
+            yeni embedding hesaplandıysa anlık görüntü yenilenir.
+        topic_batch_window: Eşik altındaki sorular için LLM konu tespitlerinin tek bir çok-sorulu istemde
+            birleştirildiği pencere (sn). None ise her soru için ayrı istem gönderilir.
+        feedback_log_path: Eşleşme skorlarının, sunulma kararlarının ve sonraki puanların yazıldığı günlük
+            (None = kapalı). threshold_calibration.py bu günlükten konu bazlı eşikleri çıkarır.
+        thresholds_path: threshold_calibration.py'nin yazdığı eşik dosyası; varsa başlangıçta yüklenir.
+        threshold_explore_rate / threshold_explore_margin: Eşiğin en fazla margin altında kalan adaylar bu
+            olasılıkla yine de sunulur; böylece eşiğin altı için de puan toplanır ve öğrenilen eşikler düşebilir
+            (0 = kapalı). Oran MAX_EXPLORE_RATE ile sınırlıdır; geri bildirim günlüğü kapalıysa keşif yapılmaz.
+        lemma_cache_path: Zemberek ile bulunan kelime köklerinin kalıcı önbelleği (None = kökleme kapalı).
+            Sözcüksel indeks ve anahtar kelime kontrolü kökler üzerinden yapılır ("ağaçları" ile "ağaç" eşleşir);
+            istek sırasında sadece önbelleğe bakılır, bilinmeyen kelimeler arka planda çözümlenir.
+        topic_partition_search: find_best_match'e konu verildiğinde önce sadece o konunun soruları ('topic'
+            metadata filtresi) aranır; en iyi aday kabul eşiğini geçemezse tüm havuzda aranır.
+        index_space: ChromaDB koleksiyonlarının mesafe ölçüsü ('cosine', 'l2' veya 'ip'). Benzerlik skorları
+            ve tüm eşikler ölçüden bağımsız olarak aynı ölçektedir: birim vektörler arasında 1 - L2² (= 2·cos - 1).
+        hnsw_m / hnsw_construction_ef / hnsw_search_ef: HNSW komşu sayısı, kurulum ve arama genişliği.
+            Mevcut kalıcı koleksiyon farklı ölçü/M/kurulum ayarlarıyla oluşturulmuşsa embedding'ler yeniden
+            hesaplanmadan yeni ayarlı bir koleksiyona taşınır; sadece arama genişliği farklıysa yerinde güncellenir.
+        embedding_precision / embedding_dims / embedding_projection: 'float16' veya 'int8' seçilirse (veya boyut
+            indirgeme verilirse) QA araması bellekteki küçültülmüş kodlar üzerinde yapılır; 'truncate' ilk
+            embedding_dims boyutu, 'pca' veri setinden öğrenilen PCA bileşenlerini kullanır. 'float32' ve
+            embedding_dims=None ise arama doğrudan ChromaDB'de yapılır. Küçültülmüş modda QA koleksiyonu
+            ChromaDB'de açılmaz (CompactCollection): bellekte sadece kodlar tutulur, tam hassasiyetli vektörler
+            ve metinler diskteki anlık görüntüden (memmap, süreçler arasında paylaşılan sayfa önbelleği) okunur.
+            Bu yüzden snapshot_path gerekir (None verilirse varsayılan dizin kullanılır). Arama HNSW yerine
+            kodlar üzerinde doğrusal taramadır; çok büyük havuzlarda float32 + HNSW daha hızlı olabilir.
+        rescore_factor: Küçültülmüş aramada top_k * rescore_factor aday alınır ve anlık görüntüdeki tam
+            hassasiyetli embedding'lerle yeniden skorlanır. Kabul kararları tam hassasiyetli skorla verilir.
+        embedding_server_url: Verilirse (ör. 'http://127.0.0.1:8765') sorular embedding_service.py sunucusunda
+            kodlanır; model süreçte yüklenmez. Sunucuya ulaşılamazsa model yerelde yüklenip kullanılır.
+        llm_deadline_seconds: ChatGPT cevabı için varsayılan süre bütçesi (sn); aşılırsa çağrı hata sayılır.
+        llm_hedge_percentile / llm_max_hedges: Çağrı, son gecikmelerin bu yüzdeliğini aşınca aynı istek en fazla
+            llm_max_hedges kez daha gönderilir ve ilk gelen cevap kullanılır (0 = yedek istek yok). Art arda
+            hatalar devre kesiciyi açar; açıkken LLM hiç çağrılmaz.
+        degraded_min_score: LLM cevap veremediğinde closest_match'in eşik altındaki bir adayı sunabilmesi için
+            gereken en düşük skor.
+        analytics_path: Konu ve gün bazlı özet sayaçlarının (puanlar, düşürülen cevaplar, yeni sorular) tutulduğu
+            dosya (None = kapalı). Sayaçlar puanlama ve yeni soru eklemede artımlı güncellenir; bkz. analytics.py.
+        load_api_key: False ise OpenAI anahtarı yüklenmez (çevrimdışı değerlendirme betikleri için).
         """
         self.data_path = data_path
         self.low_score_qa_path = low_score_qa_path 
@@ -32,35 +162,214 @@ class QASystem:
         self.api_key_path = api_key_path
         self.chatgpt_model = chatgpt_model
         self.ml_keywords = keywords_path
+        self.stopwords_path = stopwords_path
         self.chroma_dir = chroma_dir
+        self.retrieval_top_k = max(1, retrieval_top_k)
+        self.reranker_model_name = reranker_model_name
+        self.rerank_threshold = rerank_threshold
+        self.lexical_weight = lexical_weight
+        self.lexical_fast_path_max_tokens = lexical_fast_path_max_tokens
+        self.topic_cache_path = topic_cache_path
+        self.topic_cache_max_entries = topic_cache_max_entries
+        self.duplicate_threshold = duplicate_threshold
+        self.background_maintenance = background_maintenance
+        self.maintenance_interval = maintenance_interval
+        self.rating_log = rating_store.RatingLog(rating_log_path) if rating_log_path else None
+        self.rating_decay = rating_decay
+        self.demotion_min_votes = demotion_min_votes
+        self.demotion_threshold = demotion_threshold
+        self.compact_mode = embedding_precision != 'float32' or embedding_dims is not None
+        if self.compact_mode and not snapshot_path:
+            print("DEBUG: Küçültülmüş mod tam vektörleri anlık görüntüden okur; varsayılan anlık görüntü dizini kullanılıyor.")
+            snapshot_path = corpus_snapshot.SNAPSHOT_DIR
+        self.snapshot_path = snapshot_path
+        self.topic_resolver = topic_resolver.TopicResolver(self._ask_llm_for_topics, key_fn=self._question_key,
+                                                           window_seconds=topic_batch_window) if topic_batch_window is not None else None
+        # Aynı yeni konunun eşzamanlı isteklerde iki kez oluşturulmasını engeller
+        self._topic_creation_lock = threading.Lock()
 
         # Konu benzerliği için eşik (QA eşleşmesinden ayrı)
         self.TOPIC_SIMILARITY_THRESHOLD = 0.4 
+        self.feedback_log = threshold_calibration.FeedbackLog(feedback_log_path) if feedback_log_path else None
+        self.threshold_explore_rate = min(max(threshold_explore_rate, 0.0), threshold_calibration.MAX_EXPLORE_RATE)
+        self.threshold_explore_margin = threshold_explore_margin
+        self.topic_thresholds: Dict[str, float] = {}
+        self._load_thresholds(thresholds_path)
+        self.lemmatizer = turkish_lemmatizer.Lemmatizer(lemma_cache_path) if lemma_cache_path else None
+        if self.lemmatizer is not None:
+            self.lemmatizer.add_listener(self._on_lemmas_learned)
+        self.topic_partition_search = topic_partition_search
+        if index_space not in ('cosine', 'l2', 'ip'):
+            raise ValueError(f"Geçersiz index_space: '{index_space}' ('cosine', 'l2' veya 'ip' olmalı).")
+        self.index_space = index_space
+        self.hnsw_m = hnsw_m
+        self.hnsw_construction_ef = hnsw_construction_ef
+        self.hnsw_search_ef = hnsw_search_ef
+        self.rescore_factor = max(1, rescore_factor)
+        self.llm_deadline_seconds = llm_deadline_seconds
+        self.llm_caller = llm_guard.HedgedCaller(hedge_percentile=llm_hedge_percentile, max_hedges=llm_max_hedges)
+        # Arka plan üretimleri (yeni konu quiz soruları) kendi devre kesicisini kullanır; hataları /ask
+        # isteklerinin devre kesicisini açmaz
+        self.background_llm_caller = llm_guard.HedgedCaller(max_workers=2, max_hedges=0)
+        self.degraded_min_score = degraded_min_score
+        self.analytics = analytics.AnalyticsStore(analytics_path) if analytics_path else None
+        self._llm_client = None
+        self._llm_client_key = None
         print(f"DEBUG: TOPIC_SIMILARITY_THRESHOLD ayarlandı: {self.TOPIC_SIMILARITY_THRESHOLD}")
 
         self.device = ("cuda" if torch.cuda.is_available() else "cpu")
-        self.model = SentenceTransformer(model_name, device=self.device)
+        if embedding_server_url:
+            self.model = embedding_service.EmbeddingClient(
+                embedding_server_url, model_name, fallback_factory=lambda: SentenceTransformer(model_name, device=self.device))
+        else:
+            self.model = SentenceTransformer(model_name, device=self.device)
+        self.reranker = self._load_reranker()
+        self.snapshot = corpus_snapshot.load_snapshot(snapshot_path, model_name) if snapshot_path else None
 
         print(f"ChromaDB verileri '{self.chroma_dir}' dizininde saklanacak/yüklenecek.")
         self.chroma_client: chromadb.ClientAPI = chromadb.PersistentClient(path=self.chroma_dir)
         
         self.collection_name: str = "qa_collection_persistent"
-        self.collection: chromadb.Collection = self.chroma_client.get_or_create_collection(name=self.collection_name)
+        if self.compact_mode:
+            # QA vektörleri ChromaDB'de tutulmaz: kodlar bellekte, tam vektörler anlık görüntüde
+            self.collection = embedding_quantization.CompactCollection(
+                embedding_quantization.Quantizer(embedding_precision, embedding_dims, embedding_projection),
+                self._qa_id, space=index_space, rescore_factor=self.rescore_factor)
+        else:
+            self.collection: chromadb.Collection = self._open_collection(self.collection_name)
         
         self.topic_collection_name: str = "qa_topic_collection_persistent"
-        self.topic_collection: chromadb.Collection = self.chroma_client.get_or_create_collection(name=self.topic_collection_name)
+        self.topic_collection: chromadb.Collection = self._open_collection(self.topic_collection_name)
         
         self.data = [] 
         self.low_score_qa_data = [] 
         self.quiz_questions_data = {} 
         self.questions = [] 
-        self.canonical_topics = [] 
+        self.canonical_topics = set() 
+        self.lexical_index: BM25Index = None
+        self.topic_cache: Dict[str, str] = {}
+        # topic_cache değişiklikleri bu kilitle sıralanır; dosyaya her istekte değil, bakım iş parçacığında
+        # toplu olarak yazılır (_topic_cache_dirty bekleyen bir kayıt işi olduğunu gösterir)
+        self._topic_cache_lock = threading.Lock()
+        self._topic_cache_dirty = False
+        # İzlenen veri dosyalarının son yüklenen/yazılan (boyut, mtime) imzaları; sıcak yeniden yükleme için
+        self._file_signatures: Dict[str, Tuple[int, int]] = {}
+        self._reload_lock = threading.Lock()
+        self._reload_listeners = []
+        # Yeni oluşturulan konular bu dinleyicilere bildirilir (ör. QuizReplenisher); dinleyici yoksa konunun
+        # ilk quiz soruları arka planda üretilir
+        self._topic_listeners = []
+        # Dosyaya en son yazılan/dosyadan okunan sorular ve quiz konuları; yeniden yüklemede dosyada olmayan bir
+        # kaydın çevrimdışı mı silindiğini yoksa canlı mı eklendiğini (henüz yazılmamış) ayırt etmek için
+        self._synced_questions = set()
+        self._synced_topics = set()
+        self._reload_schedule_lock = threading.Lock()
+        self._scheduled_reloads = set()
+
+        # Bellekteki veri üzerindeki değişiklikler bu kilitle sıralanır (Flask çok iş parçacıklı çalışır)
+        self._data_lock = threading.RLock()
+        # Pasif havuza taşınmasına karar verilmiş ama bakım işi henüz uygulanmamış sorular; eşleşmede sunulmazlar
+        self.tombstones = set()
+        self._data_dirty = False
+        self._maintenance_queue = queue.Queue(maxsize=max(1, maintenance_queue_size))
+        # Son anlık görüntüden beri modelden geçirilen soru sayısı
+        self._encoded_since_snapshot = 0
 
         self._load_ml_keywords_and_stopwords()
         self.load_data() 
+        self._refresh_snapshot()
         self._load_and_embed_topics() 
+        self._load_topic_cache()
         self.embed_questions() 
-        self.load_openai_key()
+        if self.compact_mode:
+            quantizer = self.collection.index.quantizer
+            print(f"DEBUG: Küçültülmüş QA indeksi: {self.collection.count()} soru, bellekte {self.collection.nbytes()} bayt "
+                  f"({quantizer.precision}, {quantizer.dims or 'tüm'} boyut); tam vektörler '{self.snapshot_path}' anlık görüntüsünden okunur.")
+        if load_api_key:
+            self.load_openai_key()
+        if self.background_maintenance:
+            threading.Thread(target=self._maintenance_loop, name="qa-maintenance", daemon=True).start()
+            atexit.register(self.flush_maintenance)
+
+    # --- ChromaDB koleksiyon ayarları ---
+
+    def _hnsw_configuration(self) -> Dict:
+        return {"hnsw": {"space": self.index_space, "max_neighbors": self.hnsw_m,
+                         "ef_construction": self.hnsw_construction_ef, "ef_search": self.hnsw_search_ef}}
+
+    @staticmethod
+    def _collection_hnsw(collection) -> Dict:
+        """Koleksiyonun mevcut HNSW ayarları (eski ChromaDB sürümlerinde 'hnsw:*' metadata anahtarları)."""
+        configuration = getattr(collection, 'configuration', None) or {}
+        if configuration.get('hnsw'):
+            return configuration['hnsw']
+        metadata = collection.metadata or {}
+        return {"space": metadata.get('hnsw:space', 'l2'), "max_neighbors": metadata.get('hnsw:M', 16),
+                "ef_construction": metadata.get('hnsw:construction_ef', 100), "ef_search": metadata.get('hnsw:search_ef', 10)}
+
+    def _open_collection(self, name: str) -> chromadb.Collection:
+        """
+        Koleksiyonu istenen ölçü ve HNSW ayarlarıyla açar. Mevcut koleksiyonun ölçüsü, M'i veya kurulum
+        genişliği farklıysa taşınır; yarıda kalmış bir taşımadan kalan geçici koleksiyon varsa o devralınır.
+        """
+        migrating_name = name + "_migrating"
+        existing = {c if isinstance(c, str) else c.name for c in self.chroma_client.list_collections()}
+        if name not in existing and migrating_name in existing:
+            print(f"DEBUG: '{name}' taşıması yarıda kalmış; '{migrating_name}' koleksiyonu devralınıyor.")
+            self.chroma_client.get_collection(migrating_name).modify(name=name)
+
+        collection = self.chroma_client.get_or_create_collection(name=name, configuration=self._hnsw_configuration())
+        current = self._collection_hnsw(collection)
+        wanted = self._hnsw_configuration()["hnsw"]
+        if any(current.get(key) != wanted[key] for key in ("space", "max_neighbors", "ef_construction")):
+            return self._migrate_collection(collection, current)
+        if current.get("ef_search") != wanted["ef_search"]:
+            collection.modify(configuration={"hnsw": {"ef_search": wanted["ef_search"]}})
+            print(f"DEBUG: '{name}' arama genişliği (ef_search) {current.get('ef_search')} -> {wanted['ef_search']} olarak güncellendi.")
+        return collection
+
+    def _migrate_collection(self, old: chromadb.Collection, current: Dict, batch_size: int = 1000) -> chromadb.Collection:
+        """
+        HNSW ölçüsü/kurulum ayarları oluşturulduktan sonra değiştirilemediği için kayıtları (embedding'ler dahil)
+        yeni ayarlı geçici bir koleksiyona kopyalar, eskisini silip geçici koleksiyonu aynı ada taşır.
+        """
+        name = old.name
+        migrating_name = name + "_migrating"
+        print(f"DEBUG: '{name}' koleksiyonu taşınıyor: {current.get('space')}/M={current.get('max_neighbors')} -> "
+              f"{self.index_space}/M={self.hnsw_m} ({old.count()} kayıt).")
+        try:
+            self.chroma_client.delete_collection(migrating_name)
+        except Exception:
+            pass
+        target = self.chroma_client.create_collection(name=migrating_name, configuration=self._hnsw_configuration())
+        offset = 0
+        while True:
+            batch = old.get(include=['embeddings', 'documents', 'metadatas'], limit=batch_size, offset=offset)
+            if not batch['ids']:
+                break
+            target.add(ids=batch['ids'], embeddings=batch['embeddings'], documents=batch['documents'],
+                       metadatas=batch['metadatas'])
+            offset += len(batch['ids'])
+        self.chroma_client.delete_collection(name)
+        target.modify(name=name)
+        print(f"DEBUG: '{name}' koleksiyonu {offset} kayıtla yeni ayarlara taşındı.")
+        return self.chroma_client.get_collection(name)
+
+    def _load_reranker(self):
+        """
+        İsteğe bağlı CrossEncoder modelini CPU üzerinde yükler.
+        Model verilmemişse veya yüklenemezse None döner ve sadece embedding benzerliği kullanılır.
+        """
+        if not self.reranker_model_name:
+            return None
+        try:
+            from sentence_transformers import CrossEncoder
+            reranker = CrossEncoder(self.reranker_model_name, device="cpu")
+            print(f"DEBUG: Yeniden sıralama modeli yüklendi: '{self.reranker_model_name}' (eşik: {self.rerank_threshold})")
+            return reranker
+        except Exception as e:
+            print(f"Uyarı: Yeniden sıralama modeli '{self.reranker_model_name}' yüklenemedi: {e}. Sadece embedding benzerliği kullanılacak.")
+            return None
 
     def _load_json(self, path, default=None):
         """Yardımcı fonksiyon: JSON dosyasını yükler."""
@@ -71,13 +380,37 @@ class QASystem:
             with open(path, 'r', encoding='utf-8') as f: return json.load(f)
         except (json.JSONDecodeError, FileNotFoundError): return default
 
-    def _save_json(self, data, path):
-        """Yardımcı fonksiyon: JSON dosyasını kaydeder."""
+    def _save_json(self, data, path) -> bool:
+        """
+        Yardımcı fonksiyon: JSON dosyasını kaydeder. İzlenen bir dosya son yüklemeden/yazmadan sonra dışarıdan
+        değiştirilmişse üzerine yazılmaz (çevrimdışı düzenleme kaybolmasın); dosya arka planda yeniden yüklenip
+        bellekteki değişikliklerle birleştirilir ve birleştirilmiş veri bir sonraki kayıtta yazılır.
+        Dosya yazıldıysa True döndürür.
+        """
+        if path in self._file_signatures and self._file_signature(path) != self._file_signatures[path]:
+            print(f"DEBUG: '{path}' son yüklemeden sonra dışarıdan değiştirilmiş; üzerine yazılmadı, önce birleştirilecek.")
+            self._schedule_reload(path)
+            return False
+        tmp_path = None
         try:
-            with open(path, 'w', encoding='utf-8') as f:
+            # Geçici dosyaya yazıp taşımak, yazma yarıda kesilirse eski dosyayı sağlam bırakır; geçici dosya
+            # adı her yazım için benzersizdir, eşzamanlı iki yazım birbirinin dosyasını ezmez
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                            prefix=os.path.basename(path) + '.', suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+            tmp_path = None
+            if path in self._file_signatures:
+                # Kendi yazdığımız değişiklik dosya izleyicisi tarafından yeniden yüklenmemeli
+                self._remember_signature(path)
+            return True
         except IOError as e:
             print(f"Hata: '{path}' dosyasına yazılırken sorun oluştu: {e}")
+            return False
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
 
     def load_data(self):
         """
@@ -87,6 +420,8 @@ class QASystem:
             with open(self.data_path, 'r', encoding='utf-8') as file:
                 self.data = json.load(file)
                 self.questions = [item['question'] for item in self.data]
+            self._remember_signature(self.data_path)
+            self._synced_questions = set(self.questions)
         except (FileNotFoundError, json.JSONDecodeError) as e:
             print(f"Uyarı: '{self.data_path}' veri dosyası bulunamadı veya hatalı: {e}. Boş aktif liste ile devam ediliyor.")
             self.data = []
@@ -99,13 +434,70 @@ class QASystem:
             print(f"Uyarı: '{self.low_score_qa_path}' düşük puanlı QA dosyası bulunamadı veya hatalı: {e}. Boş pasif liste ile devam ediliyor.")
             self.low_score_qa_data = []
         
+        self._migrate_rating_lists()
         self.quiz_questions_data = self._load_json(self.quiz_questions_path, default={})
-        self.canonical_topics = [topic.title() for topic in list(self.quiz_questions_data.keys())]
+        self._remember_signature(self.quiz_questions_path)
+        self._synced_topics = set(self.quiz_questions_data)
+        self.canonical_topics = {topic.title() for topic in self.quiz_questions_data.keys()}
+        self._build_lexical_index()
+
+    def _migrate_rating_lists(self):
+        """
+        Eski biçimdeki 'ratings' listelerini sabit boyutlu 'rating_stats' özetlerine çevirip dosyaları bir kez yeniden
+        yazar. Ham puanlar önce puan günlüğüne eklenir; eklenemeyen listeler kayıtta kalır.
+        """
+        migrated_active = sum(rating_store.migrate_record(item, self.rating_decay, self.rating_log) for item in self.data)
+        migrated_passive = sum(rating_store.migrate_record(item, self.rating_decay, self.rating_log) for item in self.low_score_qa_data)
+        if migrated_active:
+            self._save_data()
+        if migrated_passive:
+            self._save_low_score_qa_data()
+        if migrated_active or migrated_passive:
+            print(f"DEBUG: {migrated_active} aktif ve {migrated_passive} pasif kaydın puan listesi özete çevrildi.")
 
+    def _build_lexical_index(self, questions: List[str] = None, warm: bool = True):
+        """
+        Aktif sorular için BM25 ters indeksini stop words ve anahtar kelimelerle kurar.
+        İndeks ayrı bir nesnede oluşturulup tek atamayla devreye alınır; okuyanlar yarım indeks görmez.
+        warm=False ise kök önbelleği ısıtılmaz (çağıran _data_lock'u tutarken; bkz. _warm_lemmas).
+        """
+        questions = self.questions if questions is None else questions
+        normalize = None
+        if self.lemmatizer is not None:
+            if warm:
+                self._warm_lemmas(questions)
+            normalize = self.lemmatizer.lookup
+        lexical_index = BM25Index(stop_words=self.stop_words, keywords=self.ml_keywords_set, normalize=normalize)
+        for question in questions:
+            lexical_index.add(question, question)
+        self.lexical_index = lexical_index
+        print(f"DEBUG: Sözcüksel (BM25) indeks {len(self.lexical_index)} soru ile oluşturuldu.")
+
+    def _on_lemmas_learned(self, lemmas: Dict[str, str]):
+        """
+        Kökü arka planda bulunan kelimeler, önbellekte yokken eklenen sorularda yüzey haliyle indekslenmiştir;
+        bu kelimeleri içeren sorular BM25 indeksinde kök halleriyle yeniden indekslenir.
+        """
+        lexical_index = self.lexical_index
+        if lexical_index is None:
+            return
+        refreshed = lexical_index.refresh_terms(lemmas)
+        if refreshed:
+            print(f"DEBUG: Yeni öğrenilen kökler için {refreshed} soru sözcüksel indekste yenilendi.")
+
+    def _warm_lemmas(self, questions: List[str]):
+        """
+        İndekse girecek tüm kelimelerin kökünü önceden bulur; sorgu anında önbellek yeterli olur.
+        Zemberek başlatma ve önbellek yazımı saniyeler sürebileceği için _data_lock dışında çağrılmalıdır.
+        """
+        if self.lemmatizer is not None:
+            self.lemmatizer.warm(list(questions) + list(self.ml_keywords_set))
 
     def _save_data(self):
         """Aktif QA verisini data.json'a kaydeder."""
-        self._save_json(self.data, self.data_path)
+        data = list(self.data)
+        if self._save_json(data, self.data_path):
+            self._synced_questions = {item['question'] for item in data}
 
     def _save_low_score_qa_data(self):
         """Düşük puanlı QA verisini low_score_qa.json'a kaydeder."""
@@ -113,112 +505,408 @@ class QASystem:
 
     def _save_quiz_questions_data(self):
         """Quiz soruları verisini quiz_questions.json'a kaydeder."""
-        self._save_json(self.quiz_questions_data, self.quiz_questions_path)
+        quiz_questions_data = dict(self.quiz_questions_data)
+        if self._save_json(quiz_questions_data, self.quiz_questions_path):
+            self._synced_topics = set(quiz_questions_data)
+
+    @staticmethod
+    def _topic_slug(topic: str) -> str:
+        """Okunabilir konu kısaltması: küçük harfli, harf/rakam dışı karakterleri '_' olan konu adı."""
+        return re.sub(r'[^0-9a-zçğıöşü]+', '_', turkish_lower(topic)).strip('_') or 'konu'
+
+    @classmethod
+    def _topic_id(cls, topic: str) -> str:
+        """
+        Konu koleksiyonundaki kalıcı kimlik: slug ve tam konu adının kısa özeti. Sadece noktalama veya boşlukla
+        ayrılan iki konu ('K-Means' ve 'K Means') aynı slug'a düşse de ayrı kimlik alır; biri diğerinin
+        embedding'ini ezmez.
+        """
+        return f"{cls._topic_slug(topic)}_{hashlib.sha1(topic.encode('utf-8')).hexdigest()[:8]}"
+
+    # --- Sıcak yeniden yükleme ---
+
+    @staticmethod
+    def _file_signature(path: str):
+        try:
+            stat = os.stat(path)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def _remember_signature(self, path: str):
+        self._file_signatures[path] = self._file_signature(path)
+
+    def changed_data_files(self) -> List[str]:
+        """Son yüklemeden veya kendi yazmamızdan bu yana dışarıdan değiştirilmiş izlenen dosyalar."""
+        return [path for path, signature in list(self._file_signatures.items()) if self._file_signature(path) != signature]
+
+    def _schedule_reload(self, path: str):
+        """Dosyayı arka planda yeniden yükler; aynı dosya için bekleyen bir yükleme varsa yenisi başlatılmaz."""
+        with self._reload_schedule_lock:
+            if path in self._scheduled_reloads:
+                return
+            self._scheduled_reloads.add(path)
+
+        def reload():
+            try:
+                self.reload_data_files([path])
+            except Exception as e:
+                print(f"DEBUG: '{path}' yeniden yüklenemedi: {e}")
+            finally:
+                with self._reload_schedule_lock:
+                    self._scheduled_reloads.discard(path)
+
+        threading.Thread(target=reload, name="qa-merge-reload", daemon=True).start()
+
+    def add_reload_listener(self, callback):
+        """Yeniden yüklemeden sonra değişen dosya listesiyle çağrılacak fonksiyonu kaydeder (ör. QuizManager)."""
+        self._reload_listeners.append(callback)
+
+    def add_topic_listener(self, callback):
+        """Yeni bir konu oluşturulduğunda konu adıyla çağrılacak fonksiyonu kaydeder."""
+        self._topic_listeners.append(callback)
+
+    def reload_data_files(self, paths: List[str] = None) -> Dict:
+        """
+        Değişen veri dosyalarını (varsayılan: changed_data_files) süreci yeniden başlatmadan yükler.
+        Yeni yapılar yan tarafta kurulur ve tek atamayla devreye alınır (read-copy-update); vektör
+        indeksine sadece eklenen/değişen/silinen kayıtlar yazılır. Süren istekler eski yapılarla tamamlanır.
+        """
+        with self._reload_lock:
+            paths = self.changed_data_files() if paths is None else list(paths)
+            summary = {"reloaded": paths}
+            if not paths:
+                return summary
+            print(f"DEBUG: Veri dosyaları yeniden yükleniyor: {paths}")
+
+            lexical_changed = self.ml_keywords in paths or self.stopwords_path in paths
+            if lexical_changed:
+                self._load_ml_keywords_and_stopwords()
+            if self.quiz_questions_path in paths:
+                summary["topics"] = self._reload_quiz_questions()
+            if self.data_path in paths:
+                summary.update(self._reload_qa_data())
+            elif lexical_changed:
+                self._build_lexical_index()
+
+            for callback in self._reload_listeners:
+                try:
+                    callback(paths)
+                except Exception as e:
+                    print(f"DEBUG: Yeniden yükleme dinleyicisi hata verdi: {e}")
+            print(f"DEBUG: Yeniden yükleme tamamlandı: {summary}")
+            return summary
+
+    def _reload_quiz_questions(self) -> int:
+        try:
+            with open(self.quiz_questions_path, 'r', encoding='utf-8') as f:
+                quiz_questions_data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Uyarı: '{self.quiz_questions_path}' okunamadı: {e}. Mevcut konular korunuyor.")
+            return len(self.canonical_topics)
+        # Dosyaya henüz yazılamamış, canlı oluşturulan konular korunur ve birleştirilmiş hali yazılır
+        live_topics = {topic: questions for topic, questions in self.quiz_questions_data.items()
+                       if topic not in quiz_questions_data and topic not in self._synced_topics}
+        self._synced_topics = set(quiz_questions_data)
+        quiz_questions_data.update(live_topics)
+        self.quiz_questions_data = quiz_questions_data
+        self._remember_signature(self.quiz_questions_path)
+        if live_topics:
+            self._save_quiz_questions_data()
+        self._load_and_embed_topics()
+        self._load_topic_cache()
+        return len(self.canonical_topics)
+
+    def _reload_qa_data(self) -> Dict:
+        """
+        data.json'u bellekteki veriyle karşılaştırır. Soru/cevap/konu alanlarında dosya esastır;
+        puan alanları (canlı puanlamalar dosyaya henüz yazılmamış olabilir) bellekten korunur.
+        Dosyada olmayan bir soru, dosyanın son okunan/yazılan halinde (_synced_questions) varsa çevrimdışı
+        silinmiş sayılır; yoksa canlı eklenmiş (henüz yazılmamış) sayılıp korunur. Aynı şekilde canlı silinen
+        (pasife taşınan) sorular dosyada dursa da geri gelmez.
+        """
+        try:
+            with open(self.data_path, 'r', encoding='utf-8') as f:
+                new_records = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Uyarı: '{self.data_path}' okunamadı: {e}. Mevcut veri korunuyor.")
+            return {"error": str(e)}
+        current = {item['question']: item for item in self.data}
+        for item in new_records:
+            # Canlı kayıtların puanları zaten özette ve günlükte; dosyadaki listeleri tekrar günlüğe yazılmaz
+            rating_store.migrate_record(item, self.rating_decay, self.rating_log if item['question'] not in current else None)
+
+        synced = self._synced_questions
+        new_by_question = {item['question']: item for item in new_records}
+        added = [item for q, item in new_by_question.items() if q not in current and q not in synced]
+        changed = [item for q, item in new_by_question.items() if q in current and self._qa_metadata(item) != self._qa_metadata(current[q])]
+        removed = [q for q in current if q not in new_by_question and q in synced]
+
+        # Önce yeni/değişen kayıtlar indekse yazılır ve kökler önbelleğe alınır; bu sırada istekler eski
+        # listelerle çalışmaya devam eder
+        self._warm_lemmas(list(new_by_question))
+        try:
+            self._add_to_index(added)
+            if changed:
+                self.collection.update(ids=[self._qa_id(item['question']) for item in changed],
+                                       metadatas=[self._qa_metadata(item) for item in changed])
+        except Exception as e:
+            print(f"DEBUG: Yeniden yükleme sırasında ChromaDB güncellenemedi: {e}. Mevcut veri korunuyor.")
+            return {"error": str(e)}
+
+        with self._data_lock:
+            # Aynı metinli kayıtlar sırayla eşlenir (update_answer_rating ilkini puanlar)
+            live: Dict[str, List[Dict]] = {}
+            for item in self.data:
+                live.setdefault(item['question'], []).append(item)
+            merged = []
+            for item in new_records:
+                if item['question'] in self.tombstones or (item['question'] not in live and item['question'] in synced):
+                    continue
+                occurrences = live.get(item['question'])
+                live_item = occurrences.pop(0) if occurrences else None
+                if live_item is not None:
+                    for field in ('rating_stats', 'sorulma_sayisi', 'current_average'):
+                        if field in live_item:
+                            item[field] = live_item[field]
+                merged.append(item)
+            # Canlı eklenen ama dosyada henüz olmayan sorular
+            merged.extend(item for q, items in live.items() if q not in new_by_question and q not in synced for item in items)
+
+            questions = [item['question'] for item in merged]
+            self._build_lexical_index(questions, warm=False)
+            self.data = merged
+            self.questions = questions
+            self._remember_signature(self.data_path)
+            self._synced_questions = set(new_by_question)
+            self._mark_data_dirty()
+
+        if removed:
+            self.collection.delete(ids=[self._qa_id(q) for q in removed])
+        with self._topic_cache_lock:
+            for item in added + changed:
+                if item.get('topic') and self._is_known_topic(item['topic']):
+                    self.topic_cache[self._question_key(item['question'])] = item['topic']
+        return {"added": len(added), "changed": len(changed), "removed": len(removed)}
+
+    def start_file_watcher(self, interval: float = 2.0):
+        """İzlenen veri dosyalarını `interval` saniyede bir kontrol eden ve değişince yeniden yükleyen iş parçacığını başlatır."""
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.changed_data_files():
+                        self.reload_data_files()
+                except Exception as e:
+                    print(f"DEBUG: Dosya izleyici hatası: {e}")
+
+        threading.Thread(target=watch, name="qa-file-watcher", daemon=True).start()
+        print(f"DEBUG: Veri dosyası izleyicisi başlatıldı ({interval} sn aralıkla).")
 
     def _load_and_embed_topics(self):
         """
-        quiz_questions.json'daki konuları yükler ve embedding'lerini ChromaDB'ye kaydeder.
+        quiz_questions.json'daki konuları konu koleksiyonuyla eşitler. Kimlikler konu adından (_topic_id) türetildiği için
+        sadece yeni eklenen veya adı değişen konuların embedding'i (tek toplu çağrıda) hesaplanır,
+        artık olmayan konular silinir.
         """
-        current_topics_in_quiz_file = [topic.title() for topic in list(self.quiz_questions_data.keys())]
-        num_topics_in_collection = self.topic_collection.count()
+        current_topics_in_quiz_file = [topic.title() for topic in self.quiz_questions_data.keys()]
+        self.canonical_topics = set(current_topics_in_quiz_file)
+
+        existing = {}
+        if self.topic_collection.count() > 0:
+            stored = self.topic_collection.get(include=['documents'])
+            existing = dict(zip(stored['ids'], stored['documents']))
+
+        desired = {self._topic_id(topic): topic for topic in current_topics_in_quiz_file}
+        stale_ids = [topic_id for topic_id in existing if topic_id not in desired]
+        if stale_ids:
+            self.topic_collection.delete(ids=stale_ids)
+            print(f"DEBUG: Konu koleksiyonundan {len(stale_ids)} artık kullanılmayan konu silindi.")
 
-        if not current_topics_in_quiz_file:
-            print("DEBUG: Quiz soruları dosyasında hiç konu bulunamadı.")
-            if num_topics_in_collection > 0:
-                all_ids = self.topic_collection.get(include=[])['ids']
-                if all_ids:
-                    self.topic_collection.delete(ids=all_ids)
-                    print(f"DEBUG: Konu koleksiyonundaki {len(all_ids)} öğe silindi.")
+        changed = [topic for topic_id, topic in desired.items() if existing.get(topic_id) != topic]
+        if not changed:
+            print("DEBUG: Mevcut konu embedding'leri güncel. Yeniden oluşturmaya gerek yok.")
             return
+        self._upsert_topics(changed)
 
-        if num_topics_in_collection != len(current_topics_in_quiz_file):
-            print(f"DEBUG: Konu koleksiyonundaki öğe sayısı ({num_topics_in_collection}) ile quiz konuları sayısı ({len(current_topics_in_quiz_file)}) eşleşmiyor.")
-            print("DEBUG: Konu koleksiyonu temizlenip yeniden embedding oluşturulacak/güncellenecek.")
-            
-            if num_topics_in_collection > 0:
-                all_ids = self.topic_collection.get(include=[])['ids']
-                if all_ids:
-                    self.topic_collection.delete(ids=all_ids)
-                    print(f"DEBUG: Konu koleksiyonundaki {len(all_ids)} öğe silindi.")
-
-            print("DEBUG: Konular için embedding'ler oluşturuluyor...")
-            embeddings: List[List[float]] = self.model.encode(current_topics_in_quiz_file, convert_to_tensor=False, show_progress_bar=True).tolist()
-            ids: List[str] = [str(i) for i in range(len(current_topics_in_quiz_file))]
-            
+    def _upsert_topics(self, topics: List[str]):
+        """Konuların embedding'lerini tek toplu çağrıda hesaplayıp kalıcı kimlikleriyle koleksiyona yazar."""
+        try:
+            embeddings: List[List[float]] = self.model.encode(topics, convert_to_tensor=False, show_progress_bar=len(topics) > 100).tolist()
+            self.topic_collection.upsert(
+                ids=[self._topic_id(topic) for topic in topics],
+                documents=topics,
+                embeddings=embeddings
+            )
+            self.canonical_topics.update(topics)
+            print(f"DEBUG: {len(topics)} adet konu embedding'i ChromaDB'ye yazıldı.")
+        except Exception as e:
+            print(f"DEBUG: Konu embedding eklenirken hata oluştu: {e}")
+
+    @staticmethod
+    def _qa_id(question_text: str) -> str:
+        """QA koleksiyonundaki kalıcı kimlik: soru metninin özeti (liste sırasından bağımsız)."""
+        return hashlib.sha1(question_text.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _qa_metadata(item: Dict) -> Dict:
+        return {'question': item['question'], 'answer': item['answer'], 'topic': item.get('topic') or DEFAULT_TOPIC}
+
+    def _add_to_index(self, items: List[Dict]):
+        """Verilen kayıtların embedding'lerini tek toplu çağrıda hesaplayıp QA koleksiyonuna ekler."""
+        if not items:
+            return
+        questions = [item['question'] for item in items]
+        embeddings: List[List[float]] = self._encode_questions(questions).tolist()
+        self.collection.upsert(
+            ids=[self._qa_id(q) for q in questions],
+            documents=questions,
+            embeddings=embeddings,
+            metadatas=[self._qa_metadata(item) for item in items]
+        )
+
+    def _encode_questions(self, questions: List[str]) -> np.ndarray:
+        """Soruların embedding'lerini döndürür; anlık görüntüde bulunanlar modelden geçirilmez."""
+        cached = self.snapshot.embeddings_for(questions) if self.snapshot is not None else {}
+        missing = [q for q in questions if q not in cached]
+        if missing:
+            encoded = self.model.encode(missing, convert_to_tensor=False, show_progress_bar=len(missing) > 100)
+            cached.update(zip(missing, encoded))
+        if cached and len(missing) < len(questions):
+            print(f"DEBUG: {len(questions) - len(missing)} embedding anlık görüntüden okundu, {len(missing)} tanesi hesaplandı.")
+        self._encoded_since_snapshot += len(missing)
+        return np.asarray([cached[q] for q in questions], dtype=np.float32)
+
+    def save_snapshot(self) -> bool:
+        """
+        Aktif veri ve QA koleksiyonundaki embedding'lerden ikili anlık görüntüyü yeniden yazar. Küçültülmüş
+        modda yeni anlık görüntü koleksiyona bağlanır ve bellekte bekleyen vektörler bırakılır.
+        """
+        if not self.snapshot_path or not self.data:
+            return False
+        records = self._snapshot_records()
+        ids = [self._qa_id(item['question']) for item in records]
+        try:
+            stored = self.collection.get(ids=ids, include=['embeddings'])
+            by_id = dict(zip(stored['ids'], stored['embeddings']))
+            if len(by_id) != len(ids):
+                print("DEBUG: İndekste eksik embedding var, anlık görüntü yazılmadı.")
+                return False
+            corpus_snapshot.build_snapshot(self.snapshot_path, records, np.asarray([by_id[i] for i in ids], dtype=np.float32),
+                                           self.model_name)
+        except Exception as e:
+            print(f"DEBUG: Anlık görüntü yazılırken hata oluştu: {e}")
+            return False
+        self.snapshot = corpus_snapshot.load_snapshot(self.snapshot_path, self.model_name)
+        self._encoded_since_snapshot = 0
+        if self.compact_mode and self.snapshot is not None:
+            self.collection.attach_snapshot(self.snapshot)
+        print(f"DEBUG: {len(records)} kayıtlık anlık görüntü '{self.snapshot_path}' dizinine yazıldı.")
+        return True
+
+    def _snapshot_records(self) -> List[Dict]:
+        # Aynı metin iki kez varsa anlık görüntüde tek satır tutulur
+        return list({item['question']: item for item in self.data}.values())
+
+    def _refresh_snapshot(self):
+        """
+        Başlangıçta anlık görüntüyü yüklenen veriyle karşılaştırır; data.json çevrimdışı değiştiyse (soru, cevap
+        veya konu farklıysa) anlık görüntü yeniden yazılır. Embedding'ler soru metnine bağlı olduğu için eski anlık
+        görüntü bu sırada önbellek olarak kullanılır, sadece yeni sorular kodlanır. Küçültülmüş modda QA
+        koleksiyonu güncel anlık görüntüye bağlanır.
+        """
+        if self.snapshot is None:
+            return
+        records = self._snapshot_records()
+        if not self.snapshot.matches(records):
+            print(f"DEBUG: '{self.snapshot_path}' anlık görüntüsü aktif veriyle uyuşmuyor, yeniden yazılıyor.")
             try:
-                self.topic_collection.add(
-                    ids=ids,
-                    documents=current_topics_in_quiz_file, 
-                    embeddings=embeddings
-                )
-                print(f"DEBUG: {len(ids)} adet konu embedding'i ChromaDB'ye başarıyla eklendi.")
-                self.canonical_topics = current_topics_in_quiz_file # In-memory listeyi güncelle
+                if not records:
+                    raise ValueError("aktif soru yok")
+                embeddings = self._encode_questions([item['question'] for item in records])
+                corpus_snapshot.build_snapshot(self.snapshot_path, records, embeddings, self.model_name)
+                self.snapshot = corpus_snapshot.load_snapshot(self.snapshot_path, self.model_name)
+                self._encoded_since_snapshot = 0
             except Exception as e:
-                print(f"DEBUG: Konu embedding eklenirken hata oluştu: {e}")
-        else:
-            print("DEBUG: Mevcut konu embedding'leri güncel. Yeniden oluşturmaya gerek yok.")
-            self.canonical_topics = current_topics_in_quiz_file # In-memory listeyi güncelle
+                # Eski anlık görüntü metin kaynağı olarak kullanılmaz; embed_questions eksikleri yeniden hesaplar
+                print(f"DEBUG: Anlık görüntü yenilenemedi: {e}")
+                self.snapshot = None
+        if self.compact_mode and self.snapshot is not None:
+            self.collection.attach_snapshot(self.snapshot)
 
+    def _migrate_legacy_topic_metadata(self):
+        """
+        Konusu olmayan kayıtlar eskiden 'Genel' metadata'sıyla indekslenirdi; analitik ve kalibrasyonla aynı
+        varsayılan konuda buluşmaları için bu kayıtların metadata'sı embedding'e dokunmadan güncellenir.
+        """
+        try:
+            legacy = self.collection.get(where={'topic': LEGACY_DEFAULT_TOPIC}, include=['metadatas'])
+            if legacy['ids']:
+                self.collection.update(ids=legacy['ids'],
+                                       metadatas=[dict(m or {}, topic=DEFAULT_TOPIC) for m in legacy['metadatas']])
+                print(f"DEBUG: {len(legacy['ids'])} kaydın varsayılan konusu '{DEFAULT_TOPIC}' olarak güncellendi.")
+        except Exception as e:
+            print(f"DEBUG: Varsayılan konu metadata'sı güncellenemedi: {e}")
 
-    def embed_questions(self):
+    def embed_questions(self, force_rebuild: bool = False):
         """
-        `self.questions` listesindeki (aktif data) soruların embedding'lerini oluşturur ve ChromaDB'ye kaydeder.
+        QA koleksiyonunu aktif veriyle (`self.data`) eşitler. Kimlikler soru metninden türetildiği için
+        sadece koleksiyonda olmayan sorular için embedding hesaplanır, artık aktif olmayanlar silinir.
+        force_rebuild: Koleksiyonu baştan oluşturur (ör. kayıtlar birleştirildikten sonra).
         """
-        num_questions_in_data = len(self.questions)
         num_items_in_collection = self.collection.count()
+        existing_ids = set(self.collection.get(include=[])['ids']) if num_items_in_collection > 0 else set()
 
-        if not self.questions:
+        if not self.data:
             print("DEBUG: Embedding için hiç aktif soru bulunamadı. Lütfen önce veriyi yükleyin.")
-            if num_items_in_collection > 0:
-                all_ids = self.collection.get(include=[])['ids']
-                if all_ids:
-                    self.collection.delete(ids=all_ids)
-                    print(f"DEBUG: QA koleksiyonundaki {len(all_ids)} öğe silindi (aktif soru kalmadığı için).")
+            if existing_ids:
+                self.collection.delete(ids=list(existing_ids))
+                print(f"DEBUG: QA koleksiyonundaki {len(existing_ids)} öğe silindi (aktif soru kalmadığı için).")
             return
 
-        if num_items_in_collection != num_questions_in_data:
-            print(f"DEBUG: QA koleksiyonundaki öğe sayısı ({num_items_in_collection}) ile aktif veri dosyasındaki soru sayısı ({num_questions_in_data}) eşleşmiyor.")
-            print("DEBUG: QA koleksiyonu temizlenip yeniden embedding oluşturulacak.")
-            
-            if num_items_in_collection > 0:
-                 all_ids = self.collection.get(include=[])['ids']
-                 if all_ids:
-                     self.collection.delete(ids=all_ids)
-                 print(f"DEBUG: QA koleksiyonundaki {len(all_ids)} öğe silindi.")
-
-            print("DEBUG: Aktif sorular için embedding'ler oluşturuluyor...")
-            embeddings: List[List[float]] = self.model.encode(self.questions, convert_to_tensor=False, show_progress_bar=True).tolist()
-            ids: List[str] = [str(i) for i in range(num_questions_in_data)]
-            
-            metadatas = [{'question': item['question'], 'answer': item['answer'], 'topic': item.get('topic', 'Genel')} for item in self.data]
+        if existing_ids and not force_rebuild:
+            self._migrate_legacy_topic_metadata()
 
-            try:
-                self.collection.add(
-                    ids=ids,
-                    documents=self.questions, 
-                    embeddings=embeddings,
-                    metadatas=metadatas 
-                )
-                print(f"DEBUG: {len(ids)} adet aktif soru embedding'i ChromaDB'ye başarıyla eklendi.")
-            except Exception as e:
-                print(f"DEBUG: ChromaDB'ye embedding eklenirken hata oluştu: {e}")
-        else:
+        expected = {self._qa_id(item['question']): item for item in self.data}
+        stale_ids = existing_ids if force_rebuild else existing_ids - expected.keys()
+        missing = list(expected.values()) if force_rebuild else [item for doc_id, item in expected.items() if doc_id not in existing_ids]
+
+        if not stale_ids and not missing:
             print("DEBUG: Mevcut aktif embedding'ler güncel. Yeniden oluşturmaya gerek yok.")
+            return
+
+        if stale_ids:
+            self.collection.delete(ids=list(stale_ids))
+            print(f"DEBUG: QA koleksiyonundan {len(stale_ids)} güncel olmayan öğe silindi.")
+
+        try:
+            print(f"DEBUG: {len(missing)} aktif soru için embedding'ler oluşturuluyor...")
+            self._add_to_index(missing)
+            print(f"DEBUG: {len(missing)} adet aktif soru embedding'i ChromaDB'ye başarıyla eklendi.")
+        except Exception as e:
+            print(f"DEBUG: ChromaDB'ye embedding eklenirken hata oluştu: {e}")
+            return
+
+        if self.snapshot_path and (self.snapshot is None or self._encoded_since_snapshot > 0
+                                   or (self.compact_mode and self.collection.pending_count() > 0)):
+            self.save_snapshot()
 
     def _load_ml_keywords_and_stopwords(self):
         """Yardımcı fonksiyon: Anahtar kelimeleri ve stop words'leri başlangıçta yükler."""
         try:
             with open(self.ml_keywords, "r", encoding='utf-8') as f: 
                 self.ml_keywords_set = set(keyword.lower() for keyword in json.load(f))
+            self._remember_signature(self.ml_keywords)
         except Exception as e:
             print(f"'{self.ml_keywords}' dosyası okunurken hata oluştu: {e}. Konu kontrolü devre dışı.")
             self.ml_keywords_set = set()
 
         try:
-            with open('stopwords.json', 'r', encoding='utf-8') as f: 
+            with open(self.stopwords_path, 'r', encoding='utf-8') as f: 
                 self.stop_words = set(json.load(f))
+            self._remember_signature(self.stopwords_path)
         except FileNotFoundError:
-            print("Uyarı: 'stopwords.json' bulunamadı. Basit bir stop words listesi kullanılacak.")
+            print(f"Uyarı: '{self.stopwords_path}' bulunamadı. Basit bir stop words listesi kullanılacak.")
             self.stop_words = {'ve', 'veya', 'ile', 'ama', 'çünkü', 'da', 'de', 'ki', 'mi', 'mı', 'mu', 'mü', 'bu', 'şu', 'o', 'bir', 'için', 'ne', 'nasıl', 'nedir'}
 
     def load_openai_key(self):
@@ -263,79 +951,336 @@ class QASystem:
         except openai.AuthenticationError:
             return False
 
-    def ask_openai(self, prompt):
+    def _openai_client(self) -> OpenAI:
+        """
+        Paylaşılan OpenAI istemcisini döndürür. SDK'nın kendi yeniden denemeleri kapalıdır; yeniden deneme ve
+        yedek istekler süre bütçesi içinde llm_caller tarafından yapılır.
+        """
+        if self._llm_client is None or self._llm_client_key != openai.api_key:
+            self._llm_client = OpenAI(api_key=openai.api_key, max_retries=0)
+            self._llm_client_key = openai.api_key
+        return self._llm_client
+
+    def _chat_completion(self, messages: list, deadline: float = None, hedge: bool = True,
+                         usage: Dict = None, caller: llm_guard.HedgedCaller = None, **params) -> str:
+        """
+        Sohbet tamamlama isteğini süre bütçesi, yedek istek ve devre kesiciyle yapar.
+        Bütçe içinde cevap alınamazsa llm_guard.LLMUnavailable fırlatır.
+        hedge=False ise yedek istek gönderilmez. usage verilirse harcanan token sayısı 'total_tokens'a eklenir.
+        caller verilirse (arka plan işleri) çağrı llm_caller yerine onun devre kesicisiyle yapılır.
+        """
+        deadline = self.llm_deadline_seconds if deadline is None else deadline
+        if deadline <= 0:
+            raise llm_guard.LLMUnavailable("İstek için süre bütçesi kalmadı")
+
+        def request(timeout: float) -> str:
+            response = self._openai_client().chat.completions.create(
+                model=self.chatgpt_model, messages=messages, timeout=timeout, **params)
+            if usage is not None and response.usage is not None:
+                usage['total_tokens'] = usage.get('total_tokens', 0) + response.usage.total_tokens
+            return response.choices[0].message.content.strip()
+
+        return (caller or self.llm_caller).call(request, deadline, max_hedges=None if hedge else 0)
+
+    def ask_openai(self, prompt, deadline: float = None, hedge: bool = True, usage: Dict = None,
+                   caller: llm_guard.HedgedCaller = None):
         """
         OpenAI ChatGPT API'sini kullanarak kullanıcıdan gelen soruya yanıt alır.
+        deadline (sn) verilmezse llm_deadline_seconds kullanılır; süre dolarsa hata metni döner.
         """
+        messages: list[ChatCompletionMessageParam] = [
+            {"role": "system",
+             "content": "You are a Turkish coding assistant specialized in machine learning and answering only machine learning related questions."},
+            {"role": "user", "content": prompt}
+        ]
         try:
-            client = OpenAI(api_key=openai.api_key)
-            messages: list[ChatCompletionMessageParam] = [
-                {"role": "system",
-                 "content": "You are a Turkish coding assistant specialized in machine learning and answering only machine learning related questions."},
-                {"role": "user", "content": prompt}
-            ]
-            response = client.chat.completions.create(
-                model=self.chatgpt_model,
-                messages=messages,
-                max_tokens=256,
-                temperature=0.7
-            )
-            return response.choices[0].message.content.strip()
+            return self._chat_completion(messages, deadline, hedge, usage, caller, max_tokens=256, temperature=0.7)
         except Exception as e:
             print(f"DEBUG: ChatGPT API hatası: {str(e)}")
             return f"ChatGPT API hatası: {str(e)}"
 
-    def find_best_match(self, user_question):
+    def _distance_to_cosine(self, distance: float) -> float:
+        """ChromaDB mesafesini (birim vektörler için) kosinüs benzerliğine çevirir."""
+        if self.index_space == 'l2':
+            return 1 - distance / 2
+        # 'cosine' ve 'ip' uzaylarında mesafe 1 - iç çarpımdır
+        return 1 - distance
+
+    def _distance_to_similarity(self, distance: float) -> float:
         """
-        Kullanıcının sorduğu soruya en benzer soruyu aktif veri kümesinde bulur.
-        Sadece aktif (data.json) havuzdaki soruları dikkate alır.
+        ChromaDB mesafesini, eşiklerle karşılaştırılan benzerlik skoruna çevirir.
+        Skor, eşiklerin ilk ayarlandığı L2 koleksiyonlarıyla aynı ölçektedir (1 - L2² = 2·cos - 1);
+        index_space değiştirmek similarity_threshold'un anlamını değiştirmez.
         """
-        print(f"DEBUG: find_best_match çağrıldı, user_question: '{user_question}'")
+        return 2 * self._distance_to_cosine(distance) - 1
+
+    def _get_item_by_question(self, question_text: str):
+        """Aktif veri kümesinde metni birebir eşleşen QA kaydını döndürür (pasife taşınmakta olanlar hariç)."""
+        if question_text in self.tombstones:
+            return None
+        for item in self.data:
+            if item['question'] == question_text:
+                return item
+        return None
 
+    def retrieve_candidates(self, user_question: str, top_k: int = None, topic: str = None, user_emb: List[float] = None,
+                            scored: List[Dict] = None) -> List[Dict]:
+        """
+        Kullanıcı sorusu için aktif havuzdan en benzer `top_k` adayı getirir.
+        topic verilirse arama sadece bu konudaki sorularla ('topic' metadata filtresi) sınırlanır.
+        lexical_weight > 0 ise BM25 adayları da havuza katılır ve skorlar embedding benzerliğiyle birleştirilir.
+        Yeniden sıralama modeli yüklüyse adaylar tek bir toplu çağrıyla yeniden puanlanır.
+        scored: Önceki bir aramada (ör. konu içi) skorlanmış adaylar; bunlar yeniden birleştirilmez ve yeniden
+            sıralanmaz, sadece sonuca katılır. Skorlar aday kümesinden bağımsız olduğu için karşılaştırılabilirdir.
+        Her aday: {'question', 'metadata', 'similarity', 'lexical', 'score'}; liste 'score'a göre azalan sıradadır.
+        Eşik uygulanmaz; kabul kararı find_best_match'e aittir.
+        """
         if self.collection.count() == 0:
             print("DEBUG: ChromaDB koleksiyonunda hiç öğe yok. Eşleşme yapılamaz.")
-            return None 
+            return []
 
-        user_emb: List[float] = self.model.encode(user_question, convert_to_numpy=False).tolist()
+        top_k = top_k or self.retrieval_top_k
+        if user_emb is None:
+            user_emb = self.model.encode(user_question, convert_to_numpy=False).tolist()
+        where = {'topic': topic} if topic is not None else None
+
+        candidates = self._query_collection(user_emb, top_k, where=where)
+        scored = scored or []
+        if not candidates and not scored:
+            print(f"DEBUG: ChromaDB'den sonuç bulunamadı{f' (konu: {topic})' if topic is not None else ''}.")
+            return []
+        seen = {c['question'] for c in scored}
+        candidates = [c for c in candidates if c['question'] not in seen]
 
+        if self.lexical_weight > 0 and self.lexical_index is not None:
+            self._fuse_lexical_scores(user_question, user_emb, candidates, top_k, topic, exclude=seen)
+
+        if self.reranker is not None and candidates:
+            self._rerank_candidates(user_question, candidates)
+
+        candidates.extend(scored)
+        candidates.sort(key=lambda c: c['score'], reverse=True)
+        return candidates
+
+    def _query_collection(self, user_emb: List[float], n_results: int, where: Dict = None) -> List[Dict]:
+        """QA koleksiyonunu sorgular ve sonuçları aday sözlüklerine çevirir (hata durumunda boş liste)."""
         try:
             results = self.collection.query(
                 query_embeddings=[user_emb], 
-                n_results=1,
+                n_results=min(n_results, self.collection.count()),
+                where=where,
                 include=['documents', 'distances', 'metadatas']
             )
             print(f"DEBUG: ChromaDB sonuçları: {results}")
         except Exception as e:
             print(f"DEBUG: ChromaDB sorgusu sırasında hata: {e}")
-            return None 
+            return []
 
-        if results and results['ids'] and results['ids'][0]:
-            distance = results['distances'][0][0] if results['distances'] and results['distances'][0] else float('inf')
-            similarity = 1 - distance
-            print(f"DEBUG: Eşleşme mesafesi: {distance}, Benzerlik skoru: {similarity:.4f}")
+        if not (results and results['ids'] and results['ids'][0]):
+            return []
 
-            if similarity >= self.similarity_threshold:
-                matched_question_text = results['documents'][0][0] if isinstance(results['documents'][0], list) else results['documents'][0]
-                print(f"DEBUG: Eşleşen soru metni (ChromaDB'den çıkarıldı): '{matched_question_text}'")
-                
-                for item in self.data:
-                    if item['question'] == matched_question_text:
-                        print(f"DEBUG: data.json içinde tam eşleşen soru bulundu: '{item['question']}'")
-                        return item 
-                
-                print(f"DEBUG: ChromaDB'de eşleşen soru metni bulundu ancak self.data içinde tam item bulunamadı. Bu bir senkronizasyon hatası olabilir.")
-                return None 
+        candidates = []
+        for i in range(len(results['ids'][0])):
+            if results['documents'][0][i] in self.tombstones:
+                continue
+            similarity = self._distance_to_similarity(results['distances'][0][i])
+            candidates.append({
+                'question': results['documents'][0][i],
+                'metadata': results['metadatas'][0][i] if results.get('metadatas') else {},
+                'similarity': similarity,
+                'lexical': 0.0,
+                'score': similarity
+            })
+        return candidates
+
+    def _fuse_lexical_scores(self, user_question: str, user_emb: List[float], candidates: List[Dict], top_k: int, topic: str = None,
+                             exclude: set = frozenset()):
+        """
+        BM25 ile bulunan ama embedding adaylarında olmayan soruları havuza ekler ve
+        her aday için skoru max(benzerlik, (1 - w) * benzerlik + w * normalize BM25) olarak günceller.
+        Sözcüksel sinyal skoru sadece yükseltebilir; eşik benzerlik ölçeğinde kaldığı için, sözcüksel örtüşmesi
+        zayıf bir yeniden ifade birleştirme yüzünden eşiğin altına düşüp LLM'e gönderilmez.
+        topic verilirse havuza sadece o konudaki BM25 adayları eklenir; exclude'daki (zaten skorlanmış) sorular eklenmez.
+        Sorguda sözcüksel sinyal yoksa skorlar değiştirilmez.
+        """
+        query_tokens = self.lexical_index.tokenize(user_question)
+        if not query_tokens:
+            return
+
+        known = {c['question'] for c in candidates} | set(exclude)
+        missing = [q for q, _ in self.lexical_index.top_k(query_tokens, top_k) if q not in known]
+        if missing:
+            where = {'question': {'$in': missing}}
+            if topic is not None:
+                where = {'$and': [where, {'topic': topic}]}
+            candidates.extend(self._query_collection(user_emb, len(missing), where=where))
+
+        if not candidates:
+            return
+        lexical_scores = self.lexical_index.normalized_scores(query_tokens, [c['question'] for c in candidates])
+        if not lexical_scores:
+            return
+
+        w = self.lexical_weight
+        for c in candidates:
+            c['lexical'] = lexical_scores.get(c['question'], 0.0)
+            c['score'] = max(c['similarity'], (1 - w) * c['similarity'] + w * c['lexical'])
+        print(f"DEBUG: Sözcüksel skorlar birleştirildi: {[(c['question'][:30], round(c['lexical'], 3)) for c in candidates]}")
+
+    def _lexical_fast_path(self, user_question: str):
+        """
+        Kısa, tamamen anahtar kelimelerden oluşan sorgular için terim kümesi birebir eşleşen
+        tek bir soru varsa embedding hesaplamadan o kaydı döndürür.
+        """
+        if self.lexical_fast_path_max_tokens <= 0 or self.lexical_index is None:
+            return None
+        tokens = self.lexical_index.tokenize(user_question)
+        if not tokens or len(tokens) > self.lexical_fast_path_max_tokens or not self.lexical_index.is_keyword_query(tokens):
+            return None
+        question = self.lexical_index.exact_match(tokens)
+        if question is None:
+            return None
+        item = self._get_item_by_question(question)
+        if item is not None:
+            print(f"DEBUG: Sözcüksel hızlı yol: '{user_question}' -> '{item['question']}' (embedding atlandı)")
+        return item
+
+    def _rerank_candidates(self, user_question: str, candidates: List[Dict]):
+        """Adayları CrossEncoder ile tek bir toplu çağrıda yeniden puanlar ('score' alanını günceller)."""
+        try:
+            pairs = [(user_question, c['question']) for c in candidates]
+            scores = self.reranker.predict(pairs, show_progress_bar=False)
+            for c, score in zip(candidates, scores):
+                c['score'] = float(score)
+            print(f"DEBUG: Yeniden sıralama skorları: {[round(c['score'], 4) for c in candidates]}")
+        except Exception as e:
+            print(f"DEBUG: Yeniden sıralama sırasında hata: {e}. Embedding benzerliği kullanılacak.")
+            for c in candidates:
+                c['score'] = c['similarity']
+
+    def _score_type(self) -> str:
+        return 'rerank' if self.reranker is not None else 'similarity'
+
+    def _load_thresholds(self, thresholds_path):
+        """
+        Geri bildirimden öğrenilmiş eşikleri yükler. Eşikler farklı bir skor türü için öğrenilmişse
+        kabul eşikleri yok sayılır; konu yönlendirme eşiği her durumda kullanılır.
+        """
+        fitted = threshold_calibration.load_thresholds(thresholds_path)
+        if not fitted:
+            return
+        self.TOPIC_SIMILARITY_THRESHOLD = fitted.get('topic_similarity', self.TOPIC_SIMILARITY_THRESHOLD)
+        if fitted.get('score_type', 'similarity') != self._score_type():
+            print(f"DEBUG: '{thresholds_path}' eşikleri '{fitted.get('score_type')}' skoru için öğrenilmiş, kabul eşikleri kullanılmayacak.")
+            return
+        default = fitted.get('similarity', {}).get('default')
+        if default is not None:
+            if self.reranker is not None:
+                self.rerank_threshold = default
             else:
-                print(f"DEBUG: Benzerlik eşiğinin altında kaldı ({similarity:.4f} < {self.similarity_threshold}).")
-                return None
-        
-        print("DEBUG: ChromaDB'den sonuç bulunamadı.")
+                self.similarity_threshold = default
+        self.topic_thresholds = dict(fitted.get('similarity', {}).get('topics', {}))
+        print(f"DEBUG: Öğrenilmiş eşikler yüklendi: genel {default}, {len(self.topic_thresholds)} konuya özel eşik.")
+
+    def _acceptance_threshold(self, topic: str = None) -> float:
+        """Aktif skor türüne (rerank veya embedding benzerliği) ve varsa konuya karşılık gelen kabul eşiği."""
+        if topic in self.topic_thresholds:
+            return self.topic_thresholds[topic]
+        return self.rerank_threshold if self.reranker is not None else self.similarity_threshold
+
+    def find_best_match(self, user_question, topic: str = None, retrieval: Dict = None):
+        """
+        Kullanıcının sorduğu soruya en benzer soruyu aktif veri kümesinde bulur.
+        Sadece aktif (data.json) havuzdaki soruları dikkate alır.
+        Kısa anahtar kelime sorguları önce sözcüksel hızlı yoldan denenir. Aksi halde top-k aday
+        getirilir (BM25 ile birleştirilir, isteğe bağlı olarak yeniden sıralanır) ve en iyi aday
+        kalibre edilmiş eşikle karşılaştırılır.
+        topic verilirse ve topic_partition_search açıksa önce sadece o konunun soruları aranır;
+        güvenilir bir eşleşme çıkmazsa aynı embedding ile tüm havuzda aranır ve konu içi adaylar (yeniden
+        skorlanmadan) sonuca katılır.
+        retrieval sözlüğü verilirse 'user_emb' ve 'candidates' ile doldurulur; eşleşme yoksa closest_match'e
+        aynen verilerek arama tekrarlanmaz.
+        """
+        print(f"DEBUG: find_best_match çağrıldı, user_question: '{user_question}'")
+
+        fast_match = self._lexical_fast_path(user_question)
+        if fast_match is not None:
+            return fast_match
+
+        if self.collection.count() == 0:
+            print("DEBUG: ChromaDB koleksiyonunda hiç öğe yok. Eşleşme yapılamaz.")
+            return None
+        user_emb: List[float] = self.model.encode(user_question, convert_to_numpy=False).tolist()
+
+        candidates, partition = [], []
+        if topic is not None and self.topic_partition_search:
+            partition = self.retrieve_candidates(user_question, topic=topic, user_emb=user_emb)
+            if partition and partition[0]['score'] >= self._acceptance_threshold(partition[0]['metadata'].get('topic')):
+                print(f"DEBUG: '{topic}' konusu içinde eşleşme bulundu; tüm havuzda arama atlandı.")
+                candidates = partition
+            else:
+                print(f"DEBUG: '{topic}' konusu içinde güvenilir eşleşme yok, tüm havuzda aranıyor.")
+        if not candidates:
+            candidates = self.retrieve_candidates(user_question, user_emb=user_emb, scored=partition)
+        if retrieval is not None:
+            retrieval.update(user_emb=user_emb, candidates=candidates)
+        if not candidates:
+            return None
+
+        best = candidates[0]
+        matched_topic = best['metadata'].get('topic')
+        threshold = self._acceptance_threshold(matched_topic)
+        print(f"DEBUG: En iyi aday: '{best['question']}', Benzerlik: {best['similarity']:.4f}, Skor: {best['score']:.4f}")
+
+        served = best['score'] >= threshold
+        explored = (not served and self.threshold_explore_rate > 0 and self.feedback_log is not None
+                    and best['score'] >= threshold - self.threshold_explore_margin
+                    and random.random() < self.threshold_explore_rate)
+        if self.feedback_log is not None:
+            # topic: eşleşen kaydın konusu (kalibrasyon), asked_topic: sorunun belirlenen konusu (/ask sayaçları)
+            self.feedback_log.log('match', matched=best['question'], topic=matched_topic, asked_topic=topic,
+                                  score=round(best['score'], 4), score_type=self._score_type(),
+                                  served=served or explored, explored=explored)
+
+        if not served and not explored:
+            print(f"DEBUG: Benzerlik eşiğinin altında kaldı ({best['score']:.4f} < {threshold}).")
+            return None
+        if explored:
+            print(f"DEBUG: Eşiğin hemen altındaki aday keşif amacıyla sunuluyor ({best['score']:.4f} < {threshold}).")
+
+        item = self._get_item_by_question(best['question'])
+        if item is not None:
+            print(f"DEBUG: data.json içinde tam eşleşen soru bulundu: '{item['question']}'")
+            return item
+
+        print(f"DEBUG: ChromaDB'de eşleşen soru metni bulundu ancak self.data içinde tam item bulunamadı. Bu bir senkronizasyon hatası olabilir.")
         return None
 
-    def add_new_qa_to_data(self, question: str, answer: str, topic: str = "Genel Makine Öğrenmesi"):
+    def closest_match(self, user_question: str, topic: str = None, user_emb: List[float] = None,
+                      candidates: List[Dict] = None):
+        """
+        Eşikten bağımsız olarak en iyi adayı döndürür (LLM cevap veremediğinde kademeli düşüş için).
+        Skoru degraded_min_score'un altındaysa None döner. find_best_match'in doldurduğu retrieval sözlüğü
+        (user_emb, candidates) verilirse arama ve embedding tekrarlanmaz.
+        """
+        if candidates is None:
+            if user_emb is None:
+                user_emb = self.model.encode(user_question, convert_to_numpy=False).tolist()
+            candidates = []
+            if topic is not None and self.topic_partition_search:
+                candidates = self.retrieve_candidates(user_question, topic=topic, user_emb=user_emb)
+            if not candidates:
+                candidates = self.retrieve_candidates(user_question, user_emb=user_emb)
+        if not candidates or candidates[0]['score'] < self.degraded_min_score:
+            return None
+        best = candidates[0]
+        print(f"DEBUG: Eşik altındaki en iyi aday sunulacak: '{best['question']}', Skor: {best['score']:.4f}")
+        return self._get_item_by_question(best['question'])
+
+    def add_new_qa_to_data(self, question: str, answer: str, topic: str = DEFAULT_TOPIC):
         """
         Yeni soruyu ve cevabını data.json dosyasına ve bellekteki verilere ekler,
-        ardından embedding'leri günceller.
+        ardından sadece bu sorunun embedding'ini indekse ekler.
         Yeni eklenen sorulara başlangıç puanlama alanları eklenir.
         """
         if not question or not answer: 
@@ -347,135 +1292,351 @@ class QASystem:
                 print(f"DEBUG: Aynı soru metni zaten mevcut: '{question[:30]}...'. Yeni girdi eklenmedi.")
                 return 
 
+        duplicate = self._find_near_duplicate(question)
+        if duplicate is not None:
+            print(f"DEBUG: Soru mevcut bir sorunun farklı ifadesi ('{duplicate[0][:30]}...', benzerlik: {duplicate[1]:.4f}). Yeni girdi eklenmedi.")
+            return
+
         new_entry = {
             "question": question, 
             "answer": answer,
             "answer2": "", 
             "sorulma_sayisi": 0,
-            "ratings": [],
+            "rating_stats": rating_store.empty_stats(),
             "current_average": 0.0,
             "topic": topic 
         }
         
-        self.data.append(new_entry)
-        self.questions.append(question) 
-        
-        try:
-            self._save_data() 
-            print(f"DEBUG: Yeni soru-cevap '{question[:30]}...' başarıyla '{self.data_path}' dosyasına eklendi.")
+        with self._data_lock:
+            self.data.append(new_entry)
+            self.questions.append(question) 
+            # Kökler sadece önbellekten okunur (lookup); bilinmeyen kelimeler arka planda çözümlenir ve
+            # soru o zaman kök halleriyle yeniden indekslenir (_on_lemmas_learned)
+            self.lexical_index.add(question, question)
             
-            print("DEBUG: Veri güncellendi, embedding'ler yeniden oluşturulacak...")
-            self.embed_questions() 
+            try:
+                self._save_data() 
+                print(f"DEBUG: Yeni soru-cevap '{question[:30]}...' başarıyla '{self.data_path}' dosyasına eklendi.")
+                self._add_to_index([new_entry])
+                if self.analytics is not None:
+                    self.analytics.record_new_qa(topic)
 
-        except Exception as e:
-            print(f"DEBUG: Yeni soru-cevap eklenirken beklenmedik bir hata oluştu: {e}")
-            if self.data and self.data[-1] == new_entry: self.data.pop()
-            if self.questions and self.questions[-1] == question: self.questions.pop()
+            except Exception as e:
+                print(f"DEBUG: Yeni soru-cevap eklenirken beklenmedik bir hata oluştu: {e}")
+                if self.data and self.data[-1] == new_entry: self.data.pop()
+                if self.questions and self.questions[-1] == question: self.questions.pop()
+                self.lexical_index.remove(question)
     
+    def _find_near_duplicate(self, question: str):
+        """
+        Aktif havuzda `duplicate_threshold` üzerinde benzerliğe sahip bir soru varsa (soru, benzerlik) döndürür.
+        Aynı sorunun farklı ifadelerinin veri setini şişirmesini ve puanları bölmesini engeller.
+        """
+        if self.duplicate_threshold is None or self.collection.count() == 0:
+            return None
+        try:
+            emb = self.model.encode(question, convert_to_numpy=False).tolist()
+            results = self.collection.query(query_embeddings=[emb], n_results=1, include=['documents', 'distances'])
+        except Exception as e:
+            print(f"DEBUG: Tekrar kontrolü sırasında ChromaDB hatası: {e}")
+            return None
+        if results and results['ids'] and results['ids'][0] and results['documents'][0][0] not in self.tombstones:
+            similarity = self._distance_to_similarity(results['distances'][0][0])
+            if similarity >= self.duplicate_threshold:
+                return results['documents'][0][0], similarity
+        return None
+
+    def consolidate_duplicates(self, threshold: float = qa_dedup.DUPLICATE_COSINE_THRESHOLD, use_index: bool = None) -> int:
+        """
+        Aktif havuzdaki aynı sorunun farklı ifadelerini (kosinüs benzerliği >= threshold) kümeleyip birleştirir.
+        Embedding'ler ChromaDB'den okunur (yeniden hesaplanmaz); benzerlikler blok blok NumPy ile,
+        çok büyük havuzlarda (use_index) vektör indeksi üzerinden bulunur. İndeks en sonda bir kez yeniden yazılır.
+        Birleştirilen (silinen) kayıt sayısını döndürür.
+        """
+        self.flush_maintenance()
+        if len(self.data) < 2:
+            return 0
+
+        ids = [self._qa_id(item['question']) for item in self.data]
+        stored = self.collection.get(ids=ids, include=['embeddings'])
+        if len(stored['ids']) == len(ids):
+            by_id = dict(zip(stored['ids'], stored['embeddings']))
+            embeddings = np.asarray([by_id[i] for i in ids], dtype=np.float32)
+        else:
+            embeddings = self._encode_questions(self.questions)
+
+        if use_index is None:
+            use_index = len(self.data) > 20000
+        if use_index and len(stored['ids']) == len(ids):
+            # Birim vektörlerde kare L2 mesafesi d = 2 - 2*cos
+            pairs = qa_dedup.find_duplicate_pairs_via_index(self.collection, embeddings, ids, threshold, self._distance_to_cosine)
+        else:
+            pairs = qa_dedup.find_duplicate_pairs(embeddings, threshold)
+
+        clusters = qa_dedup.cluster_pairs(len(self.data), pairs)
+        if not clusters:
+            print("DEBUG: Birleştirilecek tekrar eden soru bulunamadı.")
+            return 0
+
+        before = len(self.data)
+        self.data = qa_dedup.consolidate(self.data, clusters)
+        self.questions = [item['question'] for item in self.data]
+        self._build_lexical_index()
+        self._save_data()
+        self.embed_questions(force_rebuild=True)
+        print(f"DEBUG: {len(clusters)} küme birleştirildi: {before} -> {len(self.data)} kayıt.")
+        return before - len(self.data)
+
     def update_answer2(self, question_text: str, new_answer2: str):
         """
         Belirli bir soru için answer2 alanını günceller.
         """
-        for item in self.data:
-            if item['question'] == question_text:
+        with self._data_lock:
+            item = self._get_item_by_question(question_text)
+            if item is not None:
                 item['answer2'] = new_answer2
-                self._save_data()
+                self._mark_data_dirty()
                 print(f"DEBUG: Soru '{question_text[:30]}...' için answer2 güncellendi.")
                 return True
         print(f"DEBUG: Soru '{question_text[:30]}...' için answer2 güncellenemedi, soru bulunamadı.")
         return False
 
+    def fill_answer2_batch(self, answers: Dict[str, str]) -> int:
+        """
+        Birden fazla sorunun boş answer2 alanını tek kilit ve tek kayıt işiyle doldurur (arka plan ön üretimi için).
+        Bu sırada answer2'si dolmuş veya aktif havuzdan çıkmış sorular atlanır; doldurulan kayıt sayısını döndürür.
+        """
+        filled = 0
+        with self._data_lock:
+            for item in self.data:
+                answer2 = answers.get(item['question'])
+                if answer2 and not item.get('answer2') and item['question'] not in self.tombstones:
+                    item['answer2'] = answer2
+                    filled += 1
+            if filled:
+                self._mark_data_dirty()
+        print(f"DEBUG: {filled} soru için answer2 toplu olarak dolduruldu.")
+        return filled
+
     def update_answer_rating(self, question_text: str, answer_text: str, rating: int):
         """
         Belirli bir soru-cevap çiftinin puanını günceller, ortalamayı hesaplar
         ve duruma göre aktif/pasif havuzlar arasında taşır.
         Sadece birincil cevap (item['answer']) puanlanır.
+        Puan ve taşıma kararı bellekte hemen uygulanır (pasife taşınan soru tombstone ile anında sunulmaz hale gelir);
+        JSON kayıtları, listeden çıkarma ve indeks güncellemesi bakım iş parçacığına bırakılır.
         """
-        found_item = None
-        item_index = -1
+        with self._data_lock:
+            found_item = None
 
-        for i, item in enumerate(self.data):
-            if item['question'] == question_text:
-                if item['answer'] == answer_text:
-                    found_item = item
-                    item_index = i
-                    break
-                elif item['answer2'] == answer_text:
-                    print(f"DEBUG: answer2'ye puanlama denemesi algılandı, ancak answer2 puanlanmayacak. Soru: '{question_text[:50]}...'")
-                    return {"status": "ignored", "message": "İkinci cevaba puanlama yapılamaz."}
-        
-        if not found_item:
-            print(f"DEBUG: Hata: Puanlanacak soru-cevap çifti aktif havuzda bulunamadı (birincil cevap eşleşmedi): Soru: '{question_text[:50]}...', Cevap: '{answer_text[:50]}...'")
-            return {"status": "error", "message": "Puanlanacak soru-cevap bulunamadı veya birincil cevap değil."}
+            for item in self.data:
+                if item['question'] == question_text and question_text not in self.tombstones:
+                    if item['answer'] == answer_text:
+                        found_item = item
+                        break
+                    elif item['answer2'] == answer_text:
+                        print(f"DEBUG: answer2'ye puanlama denemesi algılandı, ancak answer2 puanlanmayacak. Soru: '{question_text[:50]}...'")
+                        return {"status": "ignored", "message": "İkinci cevaba puanlama yapılamaz."}
+            
+            if not found_item:
+                print(f"DEBUG: Hata: Puanlanacak soru-cevap çifti aktif havuzda bulunamadı (birincil cevap eşleşmedi): Soru: '{question_text[:50]}...', Cevap: '{answer_text[:50]}...'")
+                return {"status": "error", "message": "Puanlanacak soru-cevap bulunamadı veya birincil cevap değil."}
 
-        found_item['ratings'].append(rating)
-        found_item['sorulma_sayisi'] += 1
-        found_item['current_average'] = sum(found_item['ratings']) / len(found_item['ratings'])
+            if self.rating_log is not None:
+                self.rating_log.append(question_text, answer_text, rating)
+            if self.feedback_log is not None:
+                self.feedback_log.log('rating', question=question_text, rating=rating)
+            stats = found_item.setdefault('rating_stats', rating_store.empty_stats())
+            rating_store.add_vote(stats, rating, self.rating_decay)
+            found_item['sorulma_sayisi'] += 1
+            found_item['current_average'] = rating_store.mean(stats)
+            decision_score = rating_store.score(stats, self.rating_decay)
+            demoted = stats['count'] > self.demotion_min_votes and decision_score < self.demotion_threshold
+            if self.analytics is not None:
+                self.analytics.record_rating(question_text, found_item.get('topic'), rating, demoted=demoted,
+                                             promoted=demoted and bool(found_item['answer2']),
+                                             average=found_item['current_average'])
 
-        if found_item['sorulma_sayisi'] > 3 and found_item['current_average'] < 3.0:
-            print(f"DEBUG: Soru-cevap çifti düşük puan aldı ({found_item['current_average']:.2f}). Taşıma kontrolü yapılıyor.")
-            
-            failed_answer_entry = {
-                "question": found_item['question'],
-                "answer": found_item['answer'], 
-                "sorulma_sayisi": found_item['sorulma_sayisi'],
-                "ratings": found_item['ratings'],
-                "current_average": found_item['current_average'],
-                "topic": found_item.get('topic', 'Genel Makine Öğrenmesi') 
-            }
-            self.low_score_qa_data.append(failed_answer_entry)
-            
-            if found_item['answer2']:
-                print(f"DEBUG: answer2 mevcut. answer2 birincil cevaba terfi ettiriliyor.")
-                found_item['answer'] = found_item['answer2'] 
-                found_item['answer2'] = "" 
-
-                found_item['sorulma_sayisi'] = 0
-                found_item['ratings'] = []
-                found_item['current_average'] = 0.0
+            if demoted:
+                print(f"DEBUG: Soru-cevap çifti düşük puan aldı ({decision_score:.2f}). Taşıma kontrolü yapılıyor.")
                 
-                self._save_data() 
-                self._save_low_score_qa_data() 
-                self.embed_questions() 
+                failed_answer_entry = {
+                    "question": found_item['question'],
+                    "answer": found_item['answer'], 
+                    "sorulma_sayisi": found_item['sorulma_sayisi'],
+                    "rating_stats": dict(stats),
+                    "current_average": found_item['current_average'],
+                    "topic": found_item.get('topic') or DEFAULT_TOPIC
+                }
+                self.low_score_qa_data.append(failed_answer_entry)
                 
-                return {"status": "success", "message": "Cevap düşük puan aldı, answer2 terfi ettirildi."}
+                if found_item['answer2']:
+                    print(f"DEBUG: answer2 mevcut. answer2 birincil cevaba terfi ettiriliyor.")
+                    found_item['answer'] = found_item['answer2'] 
+                    found_item['answer2'] = "" 
+
+                    found_item['sorulma_sayisi'] = 0
+                    found_item['rating_stats'] = rating_store.empty_stats()
+                    found_item['current_average'] = 0.0
+
+                    self._enqueue_maintenance('promote', question_text)
+                    return {"status": "success", "message": "Cevap düşük puan aldı, answer2 terfi ettirildi."}
+                else:
+                    print(f"DEBUG: answer2 boş. Komple soru-cevap çifti pasif havuza taşınıyor.")
+                    self.tombstones.add(question_text)
+                    self._enqueue_maintenance('demote', question_text)
+                    return {"status": "success", "message": "Cevap düşük puan aldı ve pasif havuza taşındı."}
             else:
-                print(f"DEBUG: answer2 boş. Komple soru-cevap çifti pasif havuza taşınıyor.")
-                self.data.pop(item_index)
-                self.questions.remove(question_text) 
-                
-                self.low_score_qa_data.append(failed_answer_entry) 
+                self._mark_data_dirty()
+                print(f"DEBUG: Cevap puanlandı. Yeni ortalama: {found_item['current_average']:.2f}, Sorulma Sayısı: {found_item['sorulma_sayisi']}")
+                return {"status": "success", "message": "Cevap başarıyla puanlandı."}
 
-                self._save_data() 
-                self._save_low_score_qa_data() 
-                self.embed_questions() 
-                
-                return {"status": "success", "message": "Cevap düşük puan aldı ve pasif havuza taşındı."}
-        else:
-            self._save_data() 
-            print(f"DEBUG: Cevap puanlandı. Yeni ortalama: {found_item['current_average']:.2f}, Sorulma Sayısı: {found_item['sorulma_sayisi']}")
-            return {"status": "success", "message": "Cevap başarıyla puanlandı."}
+    def _mark_data_dirty(self):
+        """data.json'un yeniden yazılması gerektiğini işaretler; bekleyen bir kayıt işi varsa yenisi eklenmez."""
+        if not self._data_dirty:
+            self._data_dirty = True
+            self._enqueue_maintenance('save')
+
+    def _enqueue_maintenance(self, kind: str, question_text: str = None):
+        """
+        Bakım işini ('save', 'promote', 'demote', 'topic_cache') kuyruğa ekler. Arka plan bakımı kapalıysa
+        veya kuyruk doluysa iş çağrı içinde hemen uygulanır.
+        """
+        job = (kind, question_text)
+        if self.background_maintenance:
+            try:
+                self._maintenance_queue.put_nowait(job)
+                return
+            except queue.Full:
+                print("DEBUG: Bakım kuyruğu dolu, iş çağrı içinde uygulanıyor.")
+        self._apply_maintenance([job])
+
+    def _maintenance_loop(self):
+        """İlk işten sonra maintenance_interval kadar bekleyip biriken tüm işleri tek seferde uygular."""
+        while True:
+            jobs = [self._maintenance_queue.get()]
+            time.sleep(self.maintenance_interval)
+            jobs.extend(self._drain_maintenance_queue())
+            try:
+                self._apply_maintenance(jobs)
+            except Exception as e:
+                print(f"DEBUG: Bakım işleri uygulanırken hata oluştu: {e}")
+            finally:
+                for _ in jobs:
+                    self._maintenance_queue.task_done()
+
+    def _drain_maintenance_queue(self) -> List[Tuple[str, str]]:
+        jobs = []
+        while True:
+            try:
+                jobs.append(self._maintenance_queue.get_nowait())
+            except queue.Empty:
+                return jobs
 
-    def get_qa_topic(self, user_question: str) -> str:
+    def flush_maintenance(self):
+        """Bekleyen tüm bakım işlerini hemen uygular ve arka planda işlenmekte olanların bitmesini bekler."""
+        if not self.background_maintenance:
+            return
+        jobs = self._drain_maintenance_queue()
+        try:
+            if jobs:
+                self._apply_maintenance(jobs)
+        finally:
+            for _ in jobs:
+                self._maintenance_queue.task_done()
+        self._maintenance_queue.join()
+
+    def _apply_maintenance(self, jobs: List[Tuple[str, str]]):
+        """
+        Biriken işleri toplu uygular: pasife taşınan soruları listelerden ve indeksten çıkarır,
+        terfi eden cevapların metadata'sını günceller ve her dosyayı en fazla bir kez yazar.
+        """
+        if any(kind == 'topic_cache' for kind, _ in jobs):
+            self._save_topic_cache()
+            jobs = [job for job in jobs if job[0] != 'topic_cache']
+            if not jobs:
+                return
+        demoted = {q for kind, q in jobs if kind == 'demote'}
+        promoted = {q for kind, q in jobs if kind == 'promote'} - demoted
+        active = set()
+
+        with self._data_lock:
+            if demoted:
+                # Aynı metne sahip birden fazla kayıt varsa sadece puanlanan (ilk) kayıt çıkarılır
+                remaining = set(demoted)
+                kept = []
+                for item in self.data:
+                    if item['question'] in remaining:
+                        remaining.discard(item['question'])
+                    else:
+                        kept.append(item)
+                self.data = kept
+                self.questions = [item['question'] for item in self.data]
+                active = set(self.questions)
+                for question in demoted:
+                    if question not in active:
+                        self.lexical_index.remove(question)
+            promoted_items = [item for item in self.data if item['question'] in promoted] if promoted else []
+
+            self._data_dirty = False
+            self._save_data()
+            if demoted or promoted:
+                self._save_low_score_qa_data()
+
+            try:
+                gone = [q for q in demoted if q not in active]
+                if gone:
+                    self.collection.delete(ids=[self._qa_id(q) for q in gone])
+                if promoted_items:
+                    self.collection.update(ids=[self._qa_id(item['question']) for item in promoted_items],
+                                           metadatas=[self._qa_metadata(item) for item in promoted_items])
+            except Exception as e:
+                print(f"DEBUG: Bakım sırasında ChromaDB güncellenemedi: {e}. İndeks bir sonraki başlatmada eşitlenecek.")
+            self.tombstones -= demoted
+
+        if self.compact_mode and self.collection.pending_count() >= COMPACT_SNAPSHOT_PENDING:
+            # Canlı eklenen soruların tam vektörleri bellekten anlık görüntüye taşınır
+            self.save_snapshot()
+
+        print(f"DEBUG: {len(jobs)} bakım işi uygulandı ({len(demoted)} pasife taşıma, {len(promoted)} terfi).")
+
+    def get_qa_topic(self, user_question: str, deadline: float = None) -> str:
         """
         Kullanıcının sorusuna en uygun makine öğrenmesi konusunu belirler.
-        Eğer mevcut konularla eşleşmezse, ChatGPT'den yeni bir konu tespit eder
-        ve gerekirse bu konuyu ve ilgili quiz sorularını dinamik olarak oluşturur.
+        Daha önce konusu belirlenmiş sorular (data.json'daki 'topic' alanı veya konu önbelleği)
+        doğrudan önbellekten döner; konu yönlendirmesi ve LLM çağrısı yapılmaz.
+        deadline (sn) verilirse LLM ile konu tespiti en fazla bu kadar beklenir; süre yoksa hiç denenmez.
         """
         print(f"DEBUG: get_qa_topic çağrıldı, user_question: '{user_question}'")
 
+        cached_topic = self._get_cached_topic(user_question)
+        if cached_topic:
+            print(f"DEBUG: Konu önbellekten alındı: '{cached_topic}'")
+            return cached_topic
+
+        topic, cacheable = self._route_topic(user_question, deadline)
+        if cacheable:
+            self._remember_topic(user_question, topic)
+        return topic
+
+    def _route_topic(self, user_question: str, deadline: float = None) -> Tuple[str, bool]:
+        """
+        Soruyu konu embedding'leriyle karşılaştırır; eşik altında kalırsa ChatGPT'den (en fazla deadline sn)
+        konu tespit eder ve gerekirse bu konuyu dinamik olarak oluşturur. Yeni konunun quiz soruları istek
+        sırasında değil, arka planda üretilir (bkz. _on_new_topic).
+        (konu, önbelleğe_alınabilir) döndürür; LLM hatasıyla tahmin edilen konular önbelleğe alınmaz.
+        """
         if not self.canonical_topics or self.topic_collection.count() == 0:
             print("DEBUG: Konu koleksiyonu boş veya yüklenmemiş, yeniden yükleniyor/embedding yapılıyor.")
             self.quiz_questions_data = self._load_json(self.quiz_questions_path, default={}) 
-            self.canonical_topics = [topic.title() for topic in list(self.quiz_questions_data.keys())] 
             self._load_and_embed_topics() 
             if not self.canonical_topics:
-                print("DEBUG: Konu yüklemesi sonrası hala kanonik konu yok. 'Genel Makine Öğrenmesi' döndürülüyor.")
-                return "Genel Makine Öğrenmesi"
+                print(f"DEBUG: Konu yüklemesi sonrası hala kanonik konu yok. '{DEFAULT_TOPIC}' döndürülüyor.")
+                return DEFAULT_TOPIC, False
 
         user_emb: List[float] = self.model.encode(user_question, convert_to_numpy=False).tolist()
 
-        best_existing_topic = "Genel Makine Öğrenmesi"
+        best_existing_topic = DEFAULT_TOPIC
         best_similarity = 0.0
 
         try:
@@ -488,12 +1649,12 @@ class QASystem:
 
             if topic_results and topic_results['ids'] and topic_results['ids'][0]:
                 matched_topic_text_from_chroma = topic_results['documents'][0][0] if isinstance(topic_results['documents'][0], list) else topic_results['documents'][0]
-                similarity_from_chroma = 1 - topic_results['distances'][0][0]
+                similarity_from_chroma = self._distance_to_similarity(topic_results['distances'][0][0])
                 print(f"DEBUG: En benzer konu (ChromaDB): '{matched_topic_text_from_chroma}' (Benzerlik: {similarity_from_chroma:.4f})")
 
                 if similarity_from_chroma >= self.TOPIC_SIMILARITY_THRESHOLD:
                     print(f"DEBUG: Eşik üzerinde benzerlik bulundu. Konu: '{matched_topic_text_from_chroma}'")
-                    return matched_topic_text_from_chroma 
+                    return matched_topic_text_from_chroma, True
                 else:
                     best_existing_topic = matched_topic_text_from_chroma 
                     best_similarity = similarity_from_chroma
@@ -503,65 +1664,286 @@ class QASystem:
 
         except Exception as e:
             print(f"DEBUG: Konu arama sırasında ChromaDB hatası: {e}")
-            best_existing_topic = "Genel Makine Öğrenmesi" 
+            best_existing_topic = DEFAULT_TOPIC 
 
-        topic_prompt = f"Kullanıcının sorduğu soru '{user_question}' hangi makine öğrenmesi alt konusuyla ilgilidir? Sadece konunun adını yaz, başka hiçbir açıklama yapma. Eğer makine öğrenmesiyle ilgili değilse 'Genel Makine Öğrenmesi' yaz."
-        detected_topic_by_llm = self.ask_openai(topic_prompt)
+        if deadline is not None and deadline <= 0:
+            print("DEBUG: İsteğin süre bütçesi doldu, LLM ile konu tespiti atlanıyor.")
+            detected_topic_by_llm = None
+        elif self.topic_resolver is not None:
+            detected_topic_by_llm = self.topic_resolver.resolve(user_question, timeout=deadline)
+        else:
+            detected_topic_by_llm = self._ask_llm_for_topic(user_question, deadline)
         
-        if detected_topic_by_llm and not detected_topic_by_llm.startswith("ChatGPT API hatası:"):
-            detected_topic_by_llm = detected_topic_by_llm.strip().title() 
-            print(f"DEBUG: ChatGPT tarafından tespit edilen konu: '{detected_topic_by_llm}'")
+        if detected_topic_by_llm:
+            canonical_topic = self._match_llm_topic_to_canonical(detected_topic_by_llm)
+            if self.feedback_log is not None and best_similarity > 0:
+                # LLM'in kararı, embedding'in önerdiği konunun eşik altında da doğru olup olmadığını etiketler
+                self.feedback_log.log('topic', similarity=round(best_similarity, 4), embedding_topic=best_existing_topic,
+                                      llm_topic=canonical_topic or detected_topic_by_llm)
+            if canonical_topic:
+                return canonical_topic, True
+
+            with self._topic_creation_lock:
+                # Kilidi beklerken başka bir istek aynı konuyu oluşturmuş olabilir
+                canonical_topic = self._match_llm_topic_to_canonical(detected_topic_by_llm)
+                if canonical_topic:
+                    return canonical_topic, True
 
-            if detected_topic_by_llm in self.canonical_topics:
-                print(f"DEBUG: ChatGPT tarafından tespit edilen konu, mevcut kanonik konular arasında bulundu: '{detected_topic_by_llm}'")
-                return detected_topic_by_llm
+                print(f"DEBUG: Yeni konu tespit edildi: '{detected_topic_by_llm}'. Konu ekleniyor; quiz soruları arka planda üretilecek.")
+                
+                self.quiz_questions_data[detected_topic_by_llm] = [] 
+                self._save_quiz_questions_data() 
+                
+                self._upsert_topics([detected_topic_by_llm])
+                print(f"DEBUG: Yeni konu '{detected_topic_by_llm}' eklendi, embedding oluşturuldu.")
             
+            self._on_new_topic(detected_topic_by_llm)
+            return detected_topic_by_llm, True
+        else:
+            print(f"DEBUG: ChatGPT konu tespiti başarısız oldu veya hata döndürdü. En benzer mevcut konu ('{best_existing_topic}' - Benzerlik: {best_similarity:.4f}) veya '{DEFAULT_TOPIC}' döndürülüyor.")
+            return (best_existing_topic if best_similarity > 0 else DEFAULT_TOPIC), False
+
+    def _on_new_topic(self, topic: str):
+        """
+        Yeni konuyu dinleyicilere bildirir (QuizReplenisher konunun havuzunu doldurur). Dinleyici yoksa
+        konunun ilk quiz soruları arka planda üretilir; istek bu üretimi beklemez.
+        """
+        if not self._topic_listeners:
+            threading.Thread(target=self._seed_quiz_questions, args=(topic,), name="quiz-seed", daemon=True).start()
+            return
+        for callback in self._topic_listeners:
             try:
-                llm_topic_emb = self.model.encode([detected_topic_by_llm], convert_to_tensor=False).tolist()
-                print(f"DEBUG: LLM tarafından tespit edilen konu embedding'i oluşturuldu: {llm_topic_emb[0][:5]}...") 
-                llm_topic_results = self.topic_collection.query(
-                    query_embeddings=llm_topic_emb,
-                    n_results=1,
-                    include=['documents', 'distances']
-                )
-                if llm_topic_results and llm_topic_results['ids'] and llm_topic_results['ids'][0]:
-                    best_canonical_match_for_llm_topic = llm_topic_results['documents'][0][0] if isinstance(llm_topic_results['documents'][0], list) else llm_topic_results['documents'][0]
-                    similarity_llm_to_canonical = 1 - llm_topic_results['distances'][0][0]
-                    print(f"DEBUG: ChatGPT konusunun kanonik konularla benzerliği: '{best_canonical_match_for_llm_topic}' (Benzerlik: {similarity_llm_to_canonical:.4f})")
-
-                    if similarity_llm_to_canonical >= self.TOPIC_SIMILARITY_THRESHOLD: 
-                        print(f"DEBUG: ChatGPT tarafından tespit edilen konu, mevcut kanonik bir konuya yeterince benziyor. Konu: '{best_canonical_match_for_llm_topic}'")
-                        return best_canonical_match_for_llm_topic
+                callback(topic)
             except Exception as e:
-                print(f"DEBUG: ChatGPT konusunun kanonik konularla karşılaştırılması sırasında hata: {e}")
+                print(f"DEBUG: Yeni konu dinleyicisi hata verdi: {e}")
 
-            print(f"DEBUG: Yeni konu tespit edildi: '{detected_topic_by_llm}'. Quiz soruları oluşturuluyor ve ekleniyor.")
-            
-            self.quiz_questions_data[detected_topic_by_llm] = [] 
-            
-            generated_quiz_questions = self.generate_quiz_questions_for_topic(detected_topic_by_llm, num_questions=3)
-            if generated_quiz_questions:
-                for i, q in enumerate(generated_quiz_questions):
-                    if 'id' not in q: 
-                        q['id'] = f"{detected_topic_by_llm.lower().replace(' ', '_')}_gen_{i}"
-                self.quiz_questions_data[detected_topic_by_llm].extend(generated_quiz_questions)
-            
-            self._save_quiz_questions_data() 
-            
-            self.canonical_topics.append(detected_topic_by_llm)
-            new_topic_emb = self.model.encode([detected_topic_by_llm], convert_to_tensor=False).tolist()
-            new_topic_id = str(len(self.canonical_topics) - 1) 
-            self.topic_collection.add(ids=[new_topic_id], documents=[detected_topic_by_llm], embeddings=new_topic_emb)
-            print(f"DEBUG: Yeni konu '{detected_topic_by_llm}' ve quiz soruları eklendi, embedding oluşturuldu.")
-            
+    def _seed_quiz_questions(self, topic: str, num_questions: int = 3):
+        """Yeni konu için ilk quiz sorularını üretip quiz_questions.json'a ekler."""
+        generated_quiz_questions = self.generate_quiz_questions_for_topic(topic, num_questions=num_questions,
+                                                                          caller=self.background_llm_caller)
+        if not generated_quiz_questions:
+            return
+        for i, q in enumerate(generated_quiz_questions):
+            if 'id' not in q:
+                q['id'] = f"{topic.lower().replace(' ', '_')}_gen_{i}"
+        with self._topic_creation_lock:
+            # Yeni liste tek atamayla devreye alınır; süren istekler eski listeyi görmeye devam eder
+            self.quiz_questions_data[topic] = list(self.quiz_questions_data.get(topic, [])) + generated_quiz_questions
+            self._save_quiz_questions_data()
+        print(f"DEBUG: '{topic}' konusuna {len(generated_quiz_questions)} quiz sorusu eklendi.")
+
+    def _ask_llm_for_topic(self, user_question: str, deadline: float = None):
+        """ChatGPT'ye sorunun ML alt konusunu sorar; başarısızlıkta None döner."""
+        topic_prompt = f"Kullanıcının sorduğu soru '{user_question}' hangi makine öğrenmesi alt konusuyla ilgilidir? Sadece konunun adını yaz, başka hiçbir açıklama yapma. Eğer makine öğrenmesiyle ilgili değilse '{DEFAULT_TOPIC}' yaz."
+        detected_topic_by_llm = self.ask_openai(topic_prompt, deadline=deadline)
+        if detected_topic_by_llm and not detected_topic_by_llm.startswith("ChatGPT API hatası:"):
+            detected_topic_by_llm = detected_topic_by_llm.strip().title() 
+            print(f"DEBUG: ChatGPT tarafından tespit edilen konu: '{detected_topic_by_llm}'")
             return detected_topic_by_llm
-        else:
-            print(f"DEBUG: ChatGPT konu tespiti başarısız oldu veya hata döndürdü. En benzer mevcut konu ('{best_existing_topic}' - Benzerlik: {best_similarity:.4f}) veya 'Genel Makine Öğrenmesi' döndürülüyor.")
-            return best_existing_topic if best_similarity > 0 else "Genel Makine Öğrenmesi"
+        return None
+
+    def _ask_llm_for_topics(self, questions: List[str]) -> List[str]:
+        """
+        Birden fazla sorunun konusunu tek bir istemle sorar; sıra korunur.
+        Yanıt beklenen biçimde değilse sorular tek tek sorulur.
+        """
+        if len(questions) == 1:
+            return [self._ask_llm_for_topic(questions[0])]
+
+        numbered = "\n".join(f"{i + 1}. {q}" for i, q in enumerate(questions))
+        topics_prompt = (f"Aşağıdaki {len(questions)} sorunun her biri hangi makine öğrenmesi alt konularıyla ilgilidir? "
+                         f"Her soru için sadece konunun adını yaz. Makine öğrenmesiyle ilgili olmayanlar için '{DEFAULT_TOPIC}' yaz. "
+                         "Yanıtını soruların sırasıyla {\"topics\": [\"konu 1\", \"konu 2\"]} JSON formatında ver.\n" + numbered)
+        try:
+            messages: list[ChatCompletionMessageParam] = [
+                {"role": "system", "content": "You are a helpful assistant that classifies machine learning questions in specified JSON format."},
+                {"role": "user", "content": topics_prompt}
+            ]
+            content = self._chat_completion(messages, max_tokens=32 * len(questions), temperature=0,
+                                            response_format={"type": "json_object"})
+            topics = json.loads(content).get("topics")
+            if isinstance(topics, list) and len(topics) == len(questions):
+                print(f"DEBUG: {len(questions)} sorunun konusu tek istemle tespit edildi.")
+                return [str(topic).strip().title() if topic else None for topic in topics]
+            print(f"DEBUG: Toplu konu yanıtı beklenen biçimde değil, sorular tek tek sorulacak.")
+        except llm_guard.LLMUnavailable as e:
+            # LLM zaten cevap veremiyor; sorular tek tek sorulursa bekleme süresi katlanır
+            print(f"DEBUG: Toplu konu tespiti yapılamadı: {e}")
+            return [None] * len(questions)
+        except Exception as e:
+            print(f"DEBUG: Toplu konu tespiti sırasında hata: {e}. Sorular tek tek sorulacak.")
+        return [self._ask_llm_for_topic(q) for q in questions]
+
+    def _match_llm_topic_to_canonical(self, detected_topic_by_llm: str):
+        """
+        LLM'in verdiği konu adını kanonik konulara eşler (birebir veya embedding benzerliği ile).
+        Yeterince benzer bir kanonik konu yoksa None döner.
+        """
+        if detected_topic_by_llm in self.canonical_topics:
+            print(f"DEBUG: ChatGPT tarafından tespit edilen konu, mevcut kanonik konular arasında bulundu: '{detected_topic_by_llm}'")
+            return detected_topic_by_llm
+        
+        try:
+            llm_topic_emb = self.model.encode([detected_topic_by_llm], convert_to_tensor=False).tolist()
+            print(f"DEBUG: LLM tarafından tespit edilen konu embedding'i oluşturuldu: {llm_topic_emb[0][:5]}...") 
+            llm_topic_results = self.topic_collection.query(
+                query_embeddings=llm_topic_emb,
+                n_results=1,
+                include=['documents', 'distances']
+            )
+            if llm_topic_results and llm_topic_results['ids'] and llm_topic_results['ids'][0]:
+                best_canonical_match_for_llm_topic = llm_topic_results['documents'][0][0] if isinstance(llm_topic_results['documents'][0], list) else llm_topic_results['documents'][0]
+                similarity_llm_to_canonical = self._distance_to_similarity(llm_topic_results['distances'][0][0])
+                print(f"DEBUG: ChatGPT konusunun kanonik konularla benzerliği: '{best_canonical_match_for_llm_topic}' (Benzerlik: {similarity_llm_to_canonical:.4f})")
+
+                if similarity_llm_to_canonical >= self.TOPIC_SIMILARITY_THRESHOLD: 
+                    print(f"DEBUG: ChatGPT tarafından tespit edilen konu, mevcut kanonik bir konuya yeterince benziyor. Konu: '{best_canonical_match_for_llm_topic}'")
+                    return best_canonical_match_for_llm_topic
+        except Exception as e:
+            print(f"DEBUG: ChatGPT konusunun kanonik konularla karşılaştırılması sırasında hata: {e}")
+        return None
+
+    # --- Konu önbelleği ---
 
-    def generate_quiz_questions_for_topic(self, topic_name: str, num_questions: int = 3) -> List[Dict]:
+    @staticmethod
+    def _question_key(question_text: str) -> str:
+        """Konu önbelleği anahtarı: küçük harf, tek boşluk, sondaki noktalama atılmış soru metni."""
+        return " ".join(turkish_lower(question_text).split()).rstrip(" ?.!")
+
+    def _topic_set_signature(self) -> str:
+        """Kanonik konu kümesinin kısa özeti; konu kümesi değişince önbelleğin geçersiz olduğunu anlamak için."""
+        joined = "\n".join(sorted(self.canonical_topics))
+        return hashlib.sha1(joined.encode('utf-8')).hexdigest()[:12]
+
+    def _is_known_topic(self, topic: str) -> bool:
+        return topic == DEFAULT_TOPIC or topic in self.canonical_topics
+
+    def _load_topic_cache(self):
+        """
+        Konu önbelleğini data.json kayıtlarının 'topic' alanlarından ve topic_cache_path dosyasından kurar.
+        Dosya farklı bir konu kümesiyle oluşturulmuşsa dosyadaki atamalar yok sayılır.
+        """
+        topic_cache = {}
+        cache_file = self._load_json(self.topic_cache_path, default={})
+        signature = self._topic_set_signature()
+        if cache_file.get('topic_set') == signature:
+            topic_cache.update(cache_file.get('topics', {}))
+        elif cache_file:
+            print(f"Uyarı: '{self.topic_cache_path}' farklı bir konu kümesiyle oluşturulmuş. Konu önbelleği yok sayılıyor; 'python retopic_dataset.py' ile yeniden sınıflandırın.")
+
+        for item in self.data:
+            topic = item.get('topic')
+            if topic and self._is_known_topic(topic):
+                topic_cache[self._question_key(item['question'])] = topic
+        self.topic_cache = topic_cache
+        print(f"DEBUG: Konu önbelleği {len(self.topic_cache)} kayıt ile yüklendi.")
+
+    def _save_topic_cache(self):
+        """Konu önbelleğini, oluşturulduğu konu kümesinin özetiyle birlikte kaydeder (kilit altında alınan kopyadan)."""
+        with self._topic_cache_lock:
+            topics = dict(self.topic_cache)
+            self._topic_cache_dirty = False
+        self._save_json({"topic_set": self._topic_set_signature(), "topics": topics}, self.topic_cache_path)
+
+    def _get_cached_topic(self, user_question: str):
+        topic = self.topic_cache.get(self._question_key(user_question))
+        if topic and self._is_known_topic(topic):
+            return topic
+        return None
+
+    def _remember_topic(self, user_question: str, topic: str):
+        """
+        Belirlenen konuyu önbelleğe yazar; en eski kayıtlar topic_cache_max_entries sınırında atılır.
+        Dosya bakım iş parçacığında yazılır; bekleyen bir kayıt işi varsa yenisi eklenmez.
+        """
+        key = self._question_key(user_question)
+        with self._topic_cache_lock:
+            if self.topic_cache.get(key) == topic:
+                return
+            self.topic_cache.pop(key, None)
+            self.topic_cache[key] = topic
+            while len(self.topic_cache) > self.topic_cache_max_entries:
+                self.topic_cache.pop(next(iter(self.topic_cache)))
+            if self._topic_cache_dirty:
+                return
+            self._topic_cache_dirty = True
+        self._enqueue_maintenance('topic_cache')
+
+    def classify_topics_batch(self, questions: List[str], max_workers: int = 4, use_llm: bool = True) -> List[str]:
+        """
+        Soruları toplu olarak mevcut kanonik konulara atar (yeni konu oluşturmaz).
+        Embedding'ler tek seferde hesaplanır ve konu koleksiyonu tek bir toplu sorguyla aranır;
+        eşik altında kalan sorular çok-sorulu istemlerle, en fazla `max_workers` eşzamanlı LLM çağrısıyla sınıflandırılır.
+        """
+        topics = [DEFAULT_TOPIC] * len(questions)
+        if not questions or self.topic_collection.count() == 0:
+            return topics
+
+        embeddings = self.model.encode(questions, convert_to_tensor=False, show_progress_bar=True).tolist()
+        results = self.topic_collection.query(query_embeddings=embeddings, n_results=1, include=['documents', 'distances'])
+
+        pending = []
+        for i in range(len(questions)):
+            if results['ids'][i]:
+                similarity = self._distance_to_similarity(results['distances'][i][0])
+                if similarity >= self.TOPIC_SIMILARITY_THRESHOLD:
+                    topics[i] = results['documents'][i][0]
+                    continue
+                topics[i] = results['documents'][i][0] if similarity > 0 else topics[i]
+            pending.append(i)
+        print(f"DEBUG: {len(questions) - len(pending)} soru embedding ile sınıflandırıldı, {len(pending)} soru eşik altında.")
+
+        if use_llm and pending:
+            chunks = [pending[i:i + topic_resolver.MAX_BATCH_SIZE] for i in range(0, len(pending), topic_resolver.MAX_BATCH_SIZE)]
+
+            def classify_with_llm(chunk):
+                detected = self._ask_llm_for_topics([questions[index] for index in chunk])
+                return [(index, self._match_llm_topic_to_canonical(topic) if topic else None) for index, topic in zip(chunk, detected)]
+
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                for chunk_result in executor.map(classify_with_llm, chunks):
+                    for index, topic in chunk_result:
+                        if topic:
+                            topics[index] = topic
+        return topics
+
+    def retopic_dataset(self, max_workers: int = 4, use_llm: bool = True) -> Dict[str, int]:
+        """
+        Aktif veri kümesinin tamamını mevcut konu kümesine göre yeniden sınıflandırır,
+        'topic' alanlarını ve ChromaDB metadata'sını günceller ve konu önbelleğini yeniden yazar.
+        """
+        self.flush_maintenance()
+        questions = [item['question'] for item in self.data]
+        topics = self.classify_topics_batch(questions, max_workers=max_workers, use_llm=use_llm)
+
+        changed = 0
+        for item, topic in zip(self.data, topics):
+            if item.get('topic') != topic:
+                item['topic'] = topic
+                changed += 1
+        self._save_data()
+
+        if self.collection.count() == len(self.data):
+            self.collection.update(
+                ids=[self._qa_id(item['question']) for item in self.data],
+                metadatas=[self._qa_metadata(item) for item in self.data]
+            )
+
+        self.topic_cache = {self._question_key(q): t for q, t in zip(questions, topics)}
+        self._save_topic_cache()
+
+        counts = {}
+        for topic in topics:
+            counts[topic] = counts.get(topic, 0) + 1
+        print(f"DEBUG: {len(questions)} soru yeniden sınıflandırıldı, {changed} kaydın konusu değişti.")
+        return counts
+
+    def generate_quiz_questions_for_topic(self, topic_name: str, num_questions: int = 3, avoid: List[str] = None,
+                                          deadline: float = QUIZ_GENERATION_DEADLINE_SECONDS,
+                                          caller: llm_guard.HedgedCaller = None) -> List[Dict]:
         """
         Belirtilen konu hakkında ChatGPT'den çoktan seçmeli quiz soruları üretir.
+        avoid verilirse bu sorular istemde listelenir ve tekrarlanmaması istenir.
         """
         print(f"DEBUG: '{topic_name}' konusu için {num_questions} adet quiz sorusu üretiliyor.")
         quiz_prompt = f"""
@@ -593,23 +1975,18 @@ class QASystem:
         ]
         Her soru için benzersiz bir 'id' alanı eklemeyi unutma. 'id' alanı, konuyu ve soruyu temsil eden küçük harfli, boşluksuz bir string olmalı (örneğin: 'konu_adi_soru_1').
         """
+        if avoid:
+            quiz_prompt += "\nAşağıdaki soruları veya aynı anlama gelen soruları tekrar sorma:\n" + "\n".join(f"- {q}" for q in avoid)
         
         try:
-            client = OpenAI(api_key=openai.api_key)
             messages: list[ChatCompletionMessageParam] = [
                 {"role": "system",
                  "content": "You are a helpful assistant that generates quiz questions in specified JSON format."},
                 {"role": "user", "content": quiz_prompt}
             ]
-            response = client.chat.completions.create(
-                model=self.chatgpt_model,
-                messages=messages,
-                max_tokens=1024, 
-                temperature=0.7,
-                response_format={"type": "json_object"} 
-            )
-            
-            response_content = response.choices[0].message.content.strip()
+            # Uzun bir üretim olduğundan yedek istek gönderilmez; süre sınırı ve devre kesici yine uygulanır
+            response_content = self._chat_completion(messages, deadline, hedge=False, caller=caller, max_tokens=256 + 256 * num_questions,
+                                                     temperature=0.7, response_format={"type": "json_object"})
             print(f"DEBUG: ChatGPT'den gelen ham quiz yanıtı: {response_content[:200]}...")
             
             parsed_json = json.loads(response_content)
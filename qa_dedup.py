@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import shutil
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+import rating_store
+
+# Bu kosinüs benzerliğinin üzerindeki soru çiftleri aynı sorunun farklı ifadesi sayılır
+DUPLICATE_COSINE_THRESHOLD = 0.95
+# Benzerlik matrisi bu boyuttaki bloklar halinde hesaplanır (bellek: block_size x N float32)
+BLOCK_SIZE = 1024
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """Satırları birim uzunluğa getirir; iç çarpım = kosinüs benzerliği olur."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def find_duplicate_pairs(embeddings: np.ndarray, threshold: float = DUPLICATE_COSINE_THRESHOLD,
+                         block_size: int = BLOCK_SIZE) -> Iterator[Tuple[int, int, float]]:
+    """
+    Kosinüs benzerliği eşiğin üzerinde olan (i, j, benzerlik) çiftlerini (i < j) döndürür.
+    Tam N x N matris hiçbir zaman bellekte tutulmaz; satırlar blok blok işlenir.
+    """
+    vectors = normalize_rows(embeddings)
+    n = len(vectors)
+    for start in range(0, n, block_size):
+        block = vectors[start:start + block_size]
+        # Sadece üst üçgen: bloğun kendi başlangıcından sonraki sütunlar
+        sims = block @ vectors[start:].T
+        rows, cols = np.nonzero(sims >= threshold)
+        for r, c in zip(rows, cols):
+            i, j = start + int(r), start + int(c)
+            if i < j:
+                yield i, j, float(sims[r, c])
+
+
+def find_duplicate_pairs_via_index(collection, embeddings: np.ndarray, ids: List[str], threshold: float,
+                                   distance_to_similarity, neighbors: int = 10,
+                                   batch_size: int = 256) -> Iterator[Tuple[int, int, float]]:
+    """
+    Büyük N için tam matris yerine vektör indeksinden her sorunun en yakın `neighbors` komşusunu sorgular.
+    `ids[i]`, embeddings[i]'nin koleksiyondaki kimliğidir.
+    """
+    position = {doc_id: i for i, doc_id in enumerate(ids)}
+    n_results = min(neighbors + 1, collection.count())
+    for start in range(0, len(ids), batch_size):
+        batch = np.asarray(embeddings[start:start + batch_size], dtype=np.float32).tolist()
+        results = collection.query(query_embeddings=batch, n_results=n_results, include=['distances'])
+        for offset, (neighbor_ids, distances) in enumerate(zip(results['ids'], results['distances'])):
+            i = start + offset
+            for neighbor_id, distance in zip(neighbor_ids, distances):
+                j = position.get(neighbor_id)
+                similarity = distance_to_similarity(distance)
+                if j is not None and i < j and similarity >= threshold:
+                    yield i, j, similarity
+
+
+def cluster_pairs(n: int, pairs) -> List[List[int]]:
+    """Çiftleri union-find ile kümeler; sadece birden fazla elemanlı kümeleri (sıralı) döndürür."""
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j, _ in pairs:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(n):
+        clusters.setdefault(find(i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def _rating_rank(item: Dict):
+    """Temsilci seçimi: önce puanlanmış olanlar, sonra yüksek ortalama, sonra çok puan alan."""
+    stats = rating_store.get_stats(item)
+    return (1 if stats['count'] else 0, rating_store.mean(stats), stats['count'], item.get('sorulma_sayisi', 0))
+
+
+def merge_cluster(items: List[Dict]) -> Dict:
+    """
+    Aynı sorunun farklı ifadelerini tek kayıtta birleştirir.
+    En iyi puanlı cevap (ve sorusu) korunur, puan özetleri ve sorulma sayıları toplanır.
+    """
+    best = max(items, key=_rating_rank)
+    merged = dict(best)
+    merged.pop('ratings', None)
+    merged['rating_stats'] = rating_store.merge_stats([rating_store.get_stats(item) for item in items])
+    merged['sorulma_sayisi'] = sum(item.get('sorulma_sayisi', 0) for item in items)
+    merged['current_average'] = rating_store.mean(merged['rating_stats'])
+    if not merged.get('answer2'):
+        merged['answer2'] = next((item['answer2'] for item in items if item.get('answer2') and item['answer2'] != merged['answer']), "")
+    if not merged.get('topic'):
+        topic = next((item['topic'] for item in items if item.get('topic')), None)
+        if topic:
+            merged['topic'] = topic
+    return merged
+
+
+def consolidate(data: List[Dict], clusters: List[List[int]]) -> List[Dict]:
+    """Her kümeyi ilk elemanının yerinde birleştirilmiş kayıtla değiştirir, diğerlerini çıkarır."""
+    replacement = {}
+    removed = set()
+    for members in clusters:
+        replacement[members[0]] = merge_cluster([data[i] for i in members])
+        removed.update(members[1:])
+    return [replacement.get(i, item) for i, item in enumerate(data) if i not in removed]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="data.json'daki aynı sorunun farklı ifadelerini bulur ve birleştirir.")
+    parser.add_argument('--data', default='data.json', help="QA veri dosyası.")
+    parser.add_argument('--threshold', type=float, default=DUPLICATE_COSINE_THRESHOLD, help="Kosinüs benzerliği eşiği.")
+    parser.add_argument('--model', default="all-MiniLM-L6-v2", help="Embedding modeli.")
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help="Benzerlik matrisi blok boyutu.")
+    parser.add_argument('--dry-run', action='store_true', help="Sadece kümeleri raporla, dosyayı değiştirme.")
+    args = parser.parse_args()
+
+    with open(args.data, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    print(f"📚 '{args.data}' dosyasından {len(data)} kayıt okundu.")
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model, device="cpu")
+    embeddings = model.encode([item['question'] for item in data], batch_size=64, show_progress_bar=True)
+
+    clusters = cluster_pairs(len(data), find_duplicate_pairs(embeddings, args.threshold, args.block_size))
+    duplicate_count = sum(len(members) - 1 for members in clusters)
+    print(f"🔎 {len(clusters)} küme bulundu, {duplicate_count} kayıt birleştirilecek.")
+    for members in clusters[:20]:
+        print("  - " + " | ".join(data[i]['question'][:50] for i in members))
+
+    if args.dry_run or not clusters:
+        return
+
+    backup_path = args.data + '.bak'
+    shutil.copyfile(args.data, backup_path)
+    consolidated = consolidate(data, clusters)
+    tmp_path = args.data + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(consolidated, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, args.data)
+    print(f"✅ {len(data)} -> {len(consolidated)} kayıt. Yedek: '{backup_path}'. "
+          f"ChromaDB indeksi bir sonraki başlatmada tek seferde yeniden oluşturulacak.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+import llm_guard
+from lexical_index import turkish_lower
+
+QUIZ_BANK_LOG_PATH = 'quiz_questions_added.jsonl'
+OPTION_KEYS = ('A', 'B', 'C', 'D')
+# Havuzun hedef boyutu bu aralıkta tutulur
+MIN_POOL_SIZE = 10
+MAX_POOL_SIZE = 100
+BATCH_SIZE = 5
+MAX_WORKERS = 2
+INTERVAL_SECONDS = 60.0
+# Talep sayacının yarılanma süresi (sn); eski talepler hedefi giderek daha az etkiler
+DEMAND_HALF_LIFE_SECONDS = 3600.0
+# Mevcut bir soruya bu kosinüs benzerliğinden yakın üretilen sorular tekrar sayılır
+DUPLICATE_SIMILARITY = 0.9
+# İsteme "bunları tekrar etme" diye eklenen mevcut soru sayısı
+AVOID_SAMPLE_SIZE = 20
+
+
+def validate_question(question) -> Optional[Dict]:
+    """
+    LLM'in ürettiği soruyu quiz_questions.json biçimine göre doğrular: boş olmayan 'soru', birbirinden farklı
+    dört şık (A-D) ve bunlardan biri olan 'dogru_cevap'. Geçerliyse temizlenmiş kopyasını, değilse None döndürür.
+    """
+    if not isinstance(question, dict):
+        return None
+    text = question.get('soru')
+    options = question.get('siklar')
+    answer = str(question.get('dogru_cevap', '')).strip().upper()
+    if not isinstance(text, str) or not text.strip() or not isinstance(options, dict):
+        return None
+    cleaned_options = {}
+    for key in OPTION_KEYS:
+        value = options.get(key)
+        if not isinstance(value, str) or not value.strip():
+            return None
+        cleaned_options[key] = value.strip()
+    if len({turkish_lower(v) for v in cleaned_options.values()}) < len(OPTION_KEYS) or answer not in cleaned_options:
+        return None
+    return {"soru": text.strip(), "siklar": cleaned_options, "dogru_cevap": answer}
+
+
+def question_id(topic_slug: str, text: str) -> str:
+    """Soru metninden türetilen kalıcı kimlik (aynı soru iki kez eklenemez)."""
+    return f"{topic_slug}_gen_{hashlib.sha1(turkish_lower(text).encode('utf-8')).hexdigest()[:10]}"
+
+
+class QuizBankLog:
+    """
+    Sonradan üretilen quiz sorularının yalnızca sona eklenen JSONL günlüğü. quiz_questions.json yeniden
+    yazılmadan yeni sorular kalıcı olur; yükleme sırasında `merge_into` ile soru havuzuna katılır.
+    """
+
+    def __init__(self, path: str = QUIZ_BANK_LOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, topic: str, questions: List[Dict]):
+        lines = "".join(json.dumps({"ts": round(time.time(), 3), "topic": topic, "question": q}, ensure_ascii=False) + "\n"
+                        for q in questions)
+        try:
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+        except IOError as e:
+            print(f"Hata: '{self.path}' quiz günlüğüne yazılırken sorun oluştu: {e}")
+
+    def iter_entries(self) -> Iterator[Dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # Yazma sırasında kesilmiş son satır
+                        continue
+
+    def merge_into(self, quiz_questions: Dict[str, List[Dict]]) -> int:
+        """Günlükteki, havuzda henüz olmayan (kimliğe göre) soruları ekler; eklenen sayıyı döndürür."""
+        known = {q.get('id') for questions in quiz_questions.values() for q in questions}
+        added = 0
+        for entry in self.iter_entries():
+            question = entry.get('question') or {}
+            if question.get('id') in known:
+                continue
+            quiz_questions.setdefault(entry.get('topic'), []).append(question)
+            known.add(question.get('id'))
+            added += 1
+        return added
+
+
+class QuizReplenisher:
+    """
+    Konu başına quiz havuzu boyutunu talebe göre izler ve eksik kalan konulara arka planda yeni soru üretir.
+    Talep, sunulan quiz soruları (azalan sayaç) ve kullanıcıların konuyu bitirmesiyle ölçülür. Üretim sınırlı bir
+    iş parçacığı havuzunda yapılır; sorular doğrulanır, mevcut sorulara embedding benzerliğiyle tekrar kontrolü
+    yapılır ve günlüğe eklenip çalışan havuzlara (QuizManager ve QASystem) katılır.
+    """
+
+    def __init__(self, qa_system, quiz_manager, log: QuizBankLog, min_pool: int = MIN_POOL_SIZE,
+                 max_pool: int = MAX_POOL_SIZE, batch_size: int = BATCH_SIZE, max_workers: int = MAX_WORKERS,
+                 interval: float = INTERVAL_SECONDS, duplicate_similarity: float = DUPLICATE_SIMILARITY):
+        self.qa = qa_system
+        self.quiz_manager = quiz_manager
+        self.log = log
+        self.min_pool = min_pool
+        self.max_pool = max(min_pool, max_pool)
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.duplicate_similarity = duplicate_similarity
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="quiz-replenish")
+        # Üretimin kendi devre kesicisi vardır; hataları /ask isteklerinin devre kesicisini açmaz
+        self.llm_caller = llm_guard.HedgedCaller(max_workers=self.max_workers, max_hedges=0)
+        self._lock = threading.Lock()
+        # konu -> (azalan talep sayacı, son güncelleme zamanı)
+        self._demand: Dict[str, tuple] = {}
+        self._exhausted = set()
+        self._in_flight = set()
+        # konu -> (soru kimlikleri, birim embedding matrisi); tekrar kontrolü için
+        self._embeddings: Dict[str, tuple] = {}
+        self.generated = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self._thread = None
+        self._wake = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="quiz-replenisher", daemon=True)
+            self._thread.start()
+            print(f"DEBUG: Quiz havuzu yenileyici başlatıldı (havuz {self.min_pool}-{self.max_pool}, "
+                  f"{self.max_workers} eşzamanlı üretim, {self.interval} sn aralıkla).")
+
+    # --- Talep ---
+
+    def _decayed(self, topic: str, now: float) -> float:
+        value, updated = self._demand.get(topic, (0.0, now))
+        return value * math.pow(0.5, (now - updated) / DEMAND_HALF_LIFE_SECONDS)
+
+    def record_demand(self, topic: str, count: int = 1):
+        now = time.time()
+        with self._lock:
+            self._demand[topic] = (self._decayed(topic, now) + count, now)
+
+    def record_exhausted(self, topics: List[str]):
+        with self._lock:
+            self._exhausted.update(topics)
+
+    def on_demand(self, served_topics: List[str], exhausted_topics: List[str]):
+        """QuizManager.demand_listeners için: sunulan soruları talep, tükenen konuları acil ihtiyaç olarak kaydeder."""
+        for topic in served_topics:
+            self.record_demand(topic)
+        if exhausted_topics:
+            self.record_exhausted(exhausted_topics)
+
+    def on_new_topic(self, topic: str):
+        """QASystem.add_topic_listener için: yeni konunun boş havuzu açılır ve ilk üretim turu hemen başlatılır."""
+        pools = self.quiz_manager.quiz_questions
+        if topic not in pools:
+            pools[topic] = []
+        self.record_exhausted([topic])
+        self._wake.set()
+
+    def target_size(self, topic: str, pool_size: int) -> int:
+        """Talep arttıkça logaritmik büyüyen hedef; konuyu bitiren kullanıcı varsa en az bir parti fazlası."""
+        with self._lock:
+            demand = self._decayed(topic, time.time())
+            exhausted = topic in self._exhausted
+        target = math.ceil(self.min_pool * (1 + math.log1p(demand)))
+        if exhausted:
+            target = max(target, pool_size + self.batch_size)
+        return min(self.max_pool, target)
+
+    def deficits(self) -> Dict[str, int]:
+        """Hedefin altında kalan konular ve eksik soru sayıları."""
+        pools = self.quiz_manager.quiz_questions
+        with self._lock:
+            topics = set(self._demand) | self._exhausted
+        result = {}
+        for topic in topics:
+            if topic not in pools:
+                continue
+            missing = self.target_size(topic, len(pools[topic])) - len(pools[topic])
+            if missing > 0:
+                result[topic] = missing
+        return result
+
+    # --- Üretim ---
+
+    def _topic_embeddings(self, topic: str, questions: List[Dict]):
+        ids, matrix = self._embeddings.get(topic, ((), None))
+        known = set(ids)
+        current = [q for q in questions if q.get('id') not in known]
+        if current:
+            encoded = np.atleast_2d(np.asarray(self.qa.model.encode([q['soru'] for q in current], convert_to_tensor=False), dtype=np.float32))
+            encoded /= np.maximum(np.linalg.norm(encoded, axis=1, keepdims=True), 1e-12)
+            matrix = encoded if matrix is None else np.vstack([matrix, encoded])
+            ids = tuple(ids) + tuple(q.get('id') for q in current)
+            self._embeddings[topic] = (ids, matrix)
+        return matrix
+
+    def _deduplicate(self, topic: str, candidates: List[Dict]) -> List[Dict]:
+        """Mevcut sorulara ve birbirine embedding benzerliği duplicate_similarity'yi aşan adayları eler."""
+        existing = self._topic_embeddings(topic, self.quiz_manager.quiz_questions.get(topic, []))
+        encoded = np.atleast_2d(np.asarray(self.qa.model.encode([q['soru'] for q in candidates], convert_to_tensor=False), dtype=np.float32))
+        encoded /= np.maximum(np.linalg.norm(encoded, axis=1, keepdims=True), 1e-12)
+        kept, kept_vectors = [], []
+        for question, vector in zip(candidates, encoded):
+            pool = [existing] if existing is not None else []
+            if kept_vectors:
+                pool.append(np.vstack(kept_vectors))
+            if pool and float(np.max(np.vstack(pool) @ vector)) >= self.duplicate_similarity:
+                self.duplicates += 1
+                continue
+            kept.append(question)
+            kept_vectors.append(vector)
+        return kept
+
+    def replenish_topic(self, topic: str, count: int) -> int:
+        """Konu için en fazla count yeni soru üretip ekler; eklenen sayıyı döndürür."""
+        questions = self.quiz_manager.quiz_questions.get(topic, [])
+        avoid = [q['soru'] for q in questions[-AVOID_SAMPLE_SIZE:]]
+        generated = self.qa.generate_quiz_questions_for_topic(topic, num_questions=count, avoid=avoid,
+                                                              caller=self.llm_caller)
+        valid = []
+        for question in generated:
+            cleaned = validate_question(question)
+            if cleaned is None:
+                self.rejected += 1
+                continue
+            cleaned['id'] = question_id(self.qa._topic_slug(topic), cleaned['soru'])
+            valid.append(cleaned)
+        known_ids = {q.get('id') for q in questions}
+        valid = [q for q in dict((q['id'], q) for q in valid).values() if q['id'] not in known_ids]
+        if not valid:
+            return 0
+        new_questions = self._deduplicate(topic, valid)
+        if not new_questions:
+            return 0
+
+        self.log.append(topic, new_questions)
+        self._add_to_pools(topic, new_questions)
+        self.generated += len(new_questions)
+        with self._lock:
+            self._exhausted.discard(topic)
+        print(f"DEBUG: '{topic}' konusuna {len(new_questions)} yeni quiz sorusu eklendi (havuz: {len(self.quiz_manager.quiz_questions[topic])}).")
+        return len(new_questions)
+
+    def _add_to_pools(self, topic: str, questions: List[Dict]):
+        # Yeni listeler kurulup tek atamayla devreye alınır; süren istekler eski listeyi görmeye devam eder
+        pools = self.quiz_manager.quiz_questions
+        pools[topic] = list(pools.get(topic, [])) + questions
+        with self.qa._topic_creation_lock:
+            qa_pools = self.qa.quiz_questions_data
+            if topic in qa_pools and qa_pools is not pools:
+                qa_pools[topic] = list(qa_pools[topic]) + questions
+
+    def run_once(self) -> int:
+        """Eksik konular için üretim işlerini başlatır ve bitmelerini bekler; eklenen soru sayısını döndürür."""
+        # Paylaşılan devre kesici sadece okunur: /ask tarafında LLM sorunluyken ek yük bindirilmez
+        if self.llm_caller.breaker.state != 'closed' or self.qa.llm_caller.breaker.state != 'closed':
+            return 0
+        jobs = {}
+        for topic, missing in sorted(self.deficits().items(), key=lambda kv: kv[1], reverse=True):
+            with self._lock:
+                if topic in self._in_flight:
+                    continue
+                self._in_flight.add(topic)
+            jobs[topic] = self._executor.submit(self.replenish_topic, topic, min(self.batch_size, missing))
+        added = 0
+        for topic, future in jobs.items():
+            try:
+                added += future.result()
+            except Exception as e:
+                print(f"DEBUG: '{topic}' konusu için quiz sorusu üretilemedi: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.discard(topic)
+        return added
+
+    def _loop(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"DEBUG: Quiz havuzu yenileme turu başarısız: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.time()
+            demand = {topic: round(self._decayed(topic, now), 2) for topic in self._demand}
+        return {"generated": self.generated, "rejected": self.rejected, "duplicates": self.duplicates,
+                "demand": demand, "deficits": self.deficits(), "breaker": self.llm_caller.breaker.state}
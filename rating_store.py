@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List
+
+# Kayıtlarda tam puan listesi yerine tutulan sabit boyutlu özet alanları
+STATS_FIELD = 'rating_stats'
+
+
+def empty_stats() -> Dict:
+    """Hiç puan almamış bir cevap için özet: sayı, toplam, kareler toplamı ve üstel azalan ortalama."""
+    return {"count": 0, "sum": 0.0, "sum_sq": 0.0, "decayed": 0.0}
+
+
+def stats_from_ratings(ratings: List[float], decay: float = 0.0) -> Dict:
+    stats = empty_stats()
+    for rating in ratings:
+        add_vote(stats, rating, decay)
+    return stats
+
+
+def get_stats(item: Dict) -> Dict:
+    """Kaydın puan özetini döndürür; eski biçimdeki 'ratings' listesinden de hesaplayabilir."""
+    stats = item.get(STATS_FIELD)
+    if stats is not None:
+        return stats
+    return stats_from_ratings(item.get('ratings') or [])
+
+
+def migrate_record(item: Dict, decay: float = 0.0, rating_log: 'RatingLog' = None) -> bool:
+    """
+    Eski 'ratings' listesini 'rating_stats' özetine çevirir. Kayıt değiştiyse True döndürür.
+    rating_log verilirse liste ancak ham puanlar günlüğe yazıldıktan sonra silinir; yazılamazsa liste kayıtta
+    kalır ve bir sonraki yüklemede yeniden denenir (özet bir kez hesaplanır). Günlük kapalıysa sadece özet kalır.
+    """
+    if STATS_FIELD in item and 'ratings' not in item:
+        return False
+    ratings = item.get('ratings') or []
+    if STATS_FIELD not in item:
+        item[STATS_FIELD] = stats_from_ratings(ratings, decay)
+    if not ratings or rating_log is None or rating_log.append_many(item['question'], item.get('answer'), ratings, legacy=True):
+        item.pop('ratings', None)
+    item['current_average'] = mean(item[STATS_FIELD])
+    return True
+
+
+def add_vote(stats: Dict, rating: float, decay: float = 0.0):
+    """
+    Özeti tek bir puanla O(1) günceller.
+    decay > 0 ise 'decayed' = decay * puan + (1 - decay) * önceki değer (yeni puanlar daha ağırlıklı).
+    """
+    stats['count'] += 1
+    stats['sum'] += rating
+    stats['sum_sq'] += rating * rating
+    if decay <= 0:
+        stats['decayed'] = stats['sum'] / stats['count']
+    elif stats['count'] == 1:
+        stats['decayed'] = float(rating)
+    else:
+        stats['decayed'] = decay * rating + (1 - decay) * stats['decayed']
+
+
+def mean(stats: Dict) -> float:
+    return stats['sum'] / stats['count'] if stats['count'] else 0.0
+
+
+def variance(stats: Dict) -> float:
+    if stats['count'] < 2:
+        return 0.0
+    m = mean(stats)
+    return max(0.0, stats['sum_sq'] / stats['count'] - m * m)
+
+
+def score(stats: Dict, decay: float = 0.0) -> float:
+    """Terfi/pasife taşıma kararlarında kullanılan ortalama (decay açıksa azalan ortalama)."""
+    return stats['decayed'] if decay > 0 and stats['count'] else mean(stats)
+
+
+def merge_stats(stats_list: List[Dict]) -> Dict:
+    """Birden fazla özeti birleştirir; azalan ortalama puan sayısıyla ağırlıklandırılır."""
+    merged = empty_stats()
+    for stats in stats_list:
+        merged['count'] += stats['count']
+        merged['sum'] += stats['sum']
+        merged['sum_sq'] += stats['sum_sq']
+        merged['decayed'] += stats['decayed'] * stats['count']
+    merged['decayed'] = merged['decayed'] / merged['count'] if merged['count'] else 0.0
+    return merged
+
+
+class RatingLog:
+    """
+    Ham puanların yalnızca sona eklenen JSONL günlüğü. Kayıtlardaki özetler ihtiyaç halinde
+    (analiz, yeniden hesaplama) buradan yeniden üretilebilir.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, question: str, answer: str, rating: int) -> bool:
+        return self.append_many(question, answer, [rating])
+
+    def append_many(self, question: str, answer: str, ratings: List[int], legacy: bool = False) -> bool:
+        """
+        Aynı cevaba ait puanları tek yazmada ekler; yazıldıysa True döndürür.
+        legacy: Puanlar eski 'ratings' listesinden taşındı (gerçek zamanları bilinmiyor, 'ts' taşıma anıdır).
+        """
+        ts = round(time.time(), 3)
+        lines = []
+        for rating in ratings:
+            entry = {"ts": ts, "question": question, "answer": answer, "rating": rating}
+            if legacy:
+                entry["legacy"] = True
+            lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+        try:
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write("".join(lines))
+            return True
+        except IOError as e:
+            print(f"Hata: '{self.path}' puan günlüğüne yazılırken sorun oluştu: {e}")
+            return False
+
+    def iter_votes(self) -> Iterator[Dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # Yazma sırasında kesilmiş son satır
+                        continue
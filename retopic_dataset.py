@@ -0,0 +1,29 @@
+import argparse
+
+from main import QASystem
+
+
+def main():
+    """
+    Konu kümesi (quiz_questions.json) değiştiğinde tüm veri setini yeniden sınıflandırır.
+    Embedding'ler toplu hesaplanır; eşik altında kalan sorular sınırlı eşzamanlılıkla LLM'e sorulur.
+    """
+    parser = argparse.ArgumentParser(description="data.json'daki tüm soruların konularını yeniden belirler.")
+    parser.add_argument('--data', default='data.json', help="Yeniden sınıflandırılacak QA veri dosyası.")
+    parser.add_argument('--concurrency', type=int, default=4, help="Aynı anda yapılacak en fazla LLM çağrısı.")
+    parser.add_argument('--no-llm', action='store_true', help="LLM kullanma; eşik altındaki sorulara en yakın konuyu ata.")
+    args = parser.parse_args()
+
+    qa_system = QASystem(data_path=args.data, load_api_key=not args.no_llm)
+    counts = qa_system.retopic_dataset(max_workers=args.concurrency, use_llm=not args.no_llm)
+
+    print("\n" + "=" * 40)
+    print("🏷️  Konu Dağılımı")
+    print("=" * 40)
+    for topic, count in sorted(counts.items(), key=lambda kv: kv[1], reverse=True):
+        print(f"{topic:<35} {count}")
+    print("=" * 40 + "\n")
+
+
+if __name__ == "__main__":
+    main()
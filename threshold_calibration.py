@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+FEEDBACK_LOG_PATH = 'feedback_log.jsonl'
+THRESHOLDS_PATH = 'thresholds.json'
+# Bu puanın altındaki değerlendirmeler "yanlış/kötü cevap" sayılır (pasife taşıma eşiğiyle aynı ölçek)
+BAD_RATING_BELOW = 3
+MAX_BAD_RATE = 0.1
+MIN_SAMPLES = 20
+# Öğrenilen eşikler varsayılan eşiklerden en fazla bu kadar uzaklaşabilir (bkz. fit_thresholds)
+MAX_THRESHOLD_SHIFT = 0.1
+# Eşiğin altındaki adayların keşif amacıyla sunulma olasılığının üst sınırı
+MAX_EXPLORE_RATE = 0.1
+
+
+class FeedbackLog:
+    """
+    Eşleşme kararlarının ve sonradan gelen puanların yalnızca sona eklenen JSONL günlüğü.
+    'match': find_best_match'in en iyi adayı (skor, cevap önbellekten sunuldu mu)
+    'rating': sunulan birincil cevaba verilen puan
+    'topic': eşik altında LLM'e sorulan konu kararı (embedding'in önerdiği konu ile LLM'in konusu)
+    """
+
+    def __init__(self, path: str = FEEDBACK_LOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def log(self, event_type: str, **fields):
+        entry = {"type": event_type, "ts": round(time.time(), 3)}
+        entry.update(fields)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        try:
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except IOError as e:
+            print(f"Hata: '{self.path}' geri bildirim günlüğüne yazılırken sorun oluştu: {e}")
+
+    def iter_events(self) -> Iterator[Dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+
+def label_served_matches(events: List[Dict]) -> List[Dict]:
+    """
+    Önbellekten sunulan her eşleşmeyi, aynı soruya ondan sonra gelen ilk puanla eşler.
+    Dönen her kayıt: {'score', 'topic', 'score_type', 'rating', 'explored'}.
+    """
+    waiting: Dict[str, List[Dict]] = {}
+    labeled = []
+    for event in sorted(events, key=lambda e: e.get('ts', 0)):
+        if event.get('type') == 'match' and event.get('served'):
+            waiting.setdefault(event['matched'], []).append(event)
+        elif event.get('type') == 'rating':
+            queue = waiting.get(event['question'])
+            if queue:
+                match = queue.pop()
+                labeled.append({"score": match['score'], "topic": match.get('topic'),
+                                "score_type": match.get('score_type', 'similarity'), "rating": event['rating'],
+                                "explored": bool(match.get('explored'))})
+    return labeled
+
+
+def lowest_safe_threshold(samples: List[Tuple[float, bool]], max_error_rate: float, min_samples: int) -> Optional[float]:
+    """
+    (skor, doğru_mu) örneklerinden, skoru eşik ve üzerindeki örneklerde hata oranı max_error_rate'i
+    aşmayan en düşük eşiği bulur. Yeterli örnek yoksa None.
+    """
+    if len(samples) < min_samples:
+        return None
+    ordered = sorted(samples, key=lambda s: s[0], reverse=True)
+    errors = 0
+    best = None
+    for count, (score, ok) in enumerate(ordered, start=1):
+        errors += 0 if ok else 1
+        if errors / count <= max_error_rate and count >= min_samples // 2:
+            best = score
+    return best
+
+
+def clamp_shift(value: float, baseline: float, max_shift: float) -> float:
+    return round(min(max(value, baseline - max_shift), baseline + max_shift), 4)
+
+
+def fit_thresholds(events: List[Dict], default_similarity: float, default_topic: float, score_type: str = 'similarity',
+                   max_bad_rate: float = MAX_BAD_RATE, min_samples: int = MIN_SAMPLES,
+                   max_shift: float = MAX_THRESHOLD_SHIFT) -> Dict:
+    """
+    Günlükten konu bazlı kabul eşiklerini ve konu yönlendirme eşiğini çıkarır.
+    Kabul eşiği: sunulan cevapların kötü puan oranının max_bad_rate altında kaldığı en düşük skor.
+    Konu eşiği: LLM'in embedding'in önerdiği konuyu doğruladığı örneklerde aynı kural.
+    Puanlar sadece sunulan cevaplar için gelir; bu yüzden veri eşiğin altını ancak keşif amacıyla sunulan
+    ('explored') adaylar kadar kapsar ve keşif kapalıyken eşik sadece yükselebilir. Bu kaymayı sınırlamak için
+    tüm eşikler varsayılanların en fazla max_shift uzağında tutulur (varsayılanlar her seferinde temel alınır).
+    """
+    labeled = [s for s in label_served_matches(events) if s['score_type'] == score_type]
+    all_samples = [(s['score'], s['rating'] >= BAD_RATING_BELOW) for s in labeled]
+    global_threshold = lowest_safe_threshold(all_samples, max_bad_rate, min_samples)
+
+    per_topic = {}
+    for topic in {s['topic'] for s in labeled if s['topic']}:
+        samples = [(s['score'], s['rating'] >= BAD_RATING_BELOW) for s in labeled if s['topic'] == topic]
+        threshold = lowest_safe_threshold(samples, max_bad_rate, min_samples)
+        if threshold is not None:
+            per_topic[topic] = clamp_shift(threshold, default_similarity, max_shift)
+
+    topic_samples = [(e['similarity'], e['embedding_topic'] == e['llm_topic'])
+                     for e in events if e.get('type') == 'topic' and e.get('llm_topic')]
+    topic_threshold = lowest_safe_threshold(topic_samples, max_bad_rate, min_samples)
+
+    return {
+        "score_type": score_type,
+        "similarity": {"default": clamp_shift(global_threshold, default_similarity, max_shift) if global_threshold is not None else default_similarity,
+                       "topics": per_topic},
+        "topic_similarity": clamp_shift(topic_threshold, default_topic, max_shift) if topic_threshold is not None else default_topic,
+        "samples": {"labeled_matches": len(labeled), "explored_matches": sum(s['explored'] for s in labeled),
+                    "topic_decisions": len(topic_samples)},
+        "fitted_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def fallback_rate(events: List[Dict], thresholds: Dict, score_type: str = 'similarity') -> float:
+    """Günlükteki eşleşme kararlarının verilen eşiklerle ne kadarının LLM'e düşeceği."""
+    matches = [e for e in events if e.get('type') == 'match' and e.get('score_type', 'similarity') == score_type]
+    if not matches:
+        return 0.0
+    similarity = thresholds['similarity']
+    below = sum(1 for e in matches if e['score'] < similarity['topics'].get(e.get('topic'), similarity['default']))
+    return below / len(matches)
+
+
+def load_thresholds(path: str = THRESHOLDS_PATH) -> Optional[Dict]:
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Uyarı: '{path}' eşik dosyası okunamadı: {e}. Sabit eşikler kullanılacak.")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geri bildirim günlüğünden konu bazlı benzerlik eşiklerini çıkarır.")
+    parser.add_argument('--log', default=FEEDBACK_LOG_PATH, help="Geri bildirim günlüğü (JSONL).")
+    parser.add_argument('--out', default=THRESHOLDS_PATH, help="Yazılacak eşik dosyası.")
+    parser.add_argument('--default-similarity', type=float, default=0.8, help="Veri yetersizse kullanılacak kabul eşiği.")
+    parser.add_argument('--default-topic', type=float, default=0.4, help="Veri yetersizse kullanılacak konu eşiği.")
+    parser.add_argument('--score-type', default='similarity', choices=['similarity', 'rerank'])
+    parser.add_argument('--max-bad-rate', type=float, default=MAX_BAD_RATE, help="Kabul edilen en yüksek kötü puan oranı.")
+    parser.add_argument('--min-samples', type=int, default=MIN_SAMPLES, help="Bir eşik için gereken en az örnek.")
+    parser.add_argument('--max-shift', type=float, default=MAX_THRESHOLD_SHIFT, help="Eşiklerin varsayılandan en fazla sapması.")
+    parser.add_argument('--dry-run', action='store_true', help="Sadece raporla, dosyaya yazma.")
+    args = parser.parse_args()
+
+    events = list(FeedbackLog(args.log).iter_events())
+    print(f"📚 '{args.log}' dosyasından {len(events)} olay okundu.")
+    fitted = fit_thresholds(events, args.default_similarity, args.default_topic, args.score_type,
+                            args.max_bad_rate, args.min_samples, args.max_shift)
+    current = load_thresholds(args.out) or {"similarity": {"default": args.default_similarity, "topics": {}}}
+
+    print(f"Etiketli eşleşme: {fitted['samples']['labeled_matches']} (keşif: {fitted['samples']['explored_matches']}), "
+          f"konu kararı: {fitted['samples']['topic_decisions']}")
+    if not fitted['samples']['explored_matches']:
+        print("⚠️  Keşif örneği yok: eşiğin altı hiç puanlanmadı, öğrenilen eşikler sadece yükselebilir.")
+    print(f"Genel kabul eşiği: {current['similarity']['default']} -> {fitted['similarity']['default']}")
+    for topic, threshold in sorted(fitted['similarity']['topics'].items()):
+        print(f"  {topic:<40} {threshold}")
+    print(f"Konu yönlendirme eşiği: {fitted['topic_similarity']}")
+    print(f"LLM'e düşüş oranı: %{fallback_rate(events, current, args.score_type) * 100:.1f} -> "
+          f"%{fallback_rate(events, fitted, args.score_type) * 100:.1f}")
+
+    if not args.dry_run:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(fitted, f, ensure_ascii=False, indent=2)
+        print(f"💾 Eşikler '{args.out}' dosyasına yazıldı; QASystem bir sonraki başlatmada yükler.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+# Bir toplu istem için soruların biriktirildiği süre (sn)
+COALESCE_WINDOW_SECONDS = 0.05
+MAX_BATCH_SIZE = 16
+
+
+class TopicResolver:
+    """
+    Eşik altında kalan sorular için LLM konu tespitini birleştirir.
+    Kısa bir pencere içinde gelen istekler tek bir çok-sorulu isteme toplanır; aynı soru için
+    zaten bekleyen bir istek varsa yeni LLM çağrısı yapılmaz, aynı sonuç paylaşılır.
+    `classify_batch(questions)` her soru için konu adı (veya None) döndüren çağrılabilirdir.
+    """
+
+    def __init__(self, classify_batch: Callable[[List[str]], List[Optional[str]]],
+                 key_fn: Callable[[str], str] = None,
+                 window_seconds: float = COALESCE_WINDOW_SECONDS,
+                 max_batch_size: int = MAX_BATCH_SIZE,
+                 max_concurrent_batches: int = 4):
+        self.classify_batch = classify_batch
+        self.key_fn = key_fn or (lambda q: q)
+        self.window_seconds = window_seconds
+        self.max_batch_size = max(1, max_batch_size)
+        self._lock = threading.Lock()
+        self._has_pending = threading.Condition(self._lock)
+        self._pending = []
+        self._inflight = {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrent_batches), thread_name_prefix="topic-batch")
+        self._dispatcher = None
+        self.llm_calls = 0
+        self.coalesced = 0
+
+    def resolve(self, question: str, timeout: float = None) -> Optional[str]:
+        """Sorunun konusunu döndürür; LLM hatasında veya zaman aşımında None."""
+        key = self.key_fn(question)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self._pending.append((key, question, future))
+                self._ensure_dispatcher()
+                self._has_pending.notify()
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            print(f"DEBUG: Toplu konu tespiti başarısız: {e}")
+            return None
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="topic-resolver", daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch_loop(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._has_pending.wait()
+            # İlk istekten sonra pencere boyunca gelenler aynı isteme eklenir
+            time.sleep(self.window_seconds)
+            with self._lock:
+                batches = [self._pending[i:i + self.max_batch_size] for i in range(0, len(self._pending), self.max_batch_size)]
+                self._pending = []
+            for batch in batches:
+                self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        questions = [question for _, question, _ in batch]
+        with self._lock:
+            self.llm_calls += 1
+        try:
+            topics = self.classify_batch(questions)
+            if len(topics) != len(questions):
+                raise ValueError(f"{len(questions)} soru için {len(topics)} konu döndü.")
+        except Exception as e:
+            topics = None
+            error = e
+        with self._lock:
+            for key, _, _ in batch:
+                self._inflight.pop(key, None)
+        for i, (_, _, future) in enumerate(batch):
+            if topics is None:
+                future.set_exception(error)
+            else:
+                future.set_result(topics[i])
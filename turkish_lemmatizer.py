@@ -0,0 +1,239 @@
+import atexit
+import importlib.util
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from lexical_index import TOKEN_PATTERN, turkish_lower
+
+LEMMA_CACHE_PATH = 'lemma_cache.json'
+MAX_CACHE_ENTRIES = 200000
+# Bu sayıdan az kelime için süreç havuzu kurmak (her süreçte Zemberek yüklenir) tek süreçten yavaştır
+PROCESS_POOL_MIN_WORDS = 2000
+BATCH_CHUNK_SIZE = 5000
+# Arka planda öğrenilen kökler diske en fazla bu sıklıkla yazılır (sn)
+SAVE_INTERVAL_SECONDS = 30.0
+
+# Süreç havuzundaki her işçinin kendi morfoloji motoru
+_worker_morphology = None
+
+
+def zemberek_available() -> bool:
+    return importlib.util.find_spec('zemberek') is not None
+
+
+def create_morphology():
+    from zemberek import TurkishMorphology
+    return TurkishMorphology.create_with_defaults()
+
+
+def analyze_word(morphology, word: str) -> str:
+    """Kelimenin ilk çözümlemedeki kökünü döndürür; çözümlenemezse kelimenin kendisini."""
+    analysis = morphology.analyze(word)
+    if analysis.analysis_results:
+        stem = turkish_lower(analysis.analysis_results[0].get_stem())
+        if len(stem) > 1:
+            return stem
+    return word
+
+
+def _init_worker():
+    global _worker_morphology
+    _worker_morphology = create_morphology()
+
+
+def _analyze_chunk(words: List[str]) -> List[Tuple[str, str]]:
+    return [(word, analyze_word(_worker_morphology, word)) for word in words]
+
+
+class Lemmatizer:
+    """
+    Zemberek ile kelime köklerini bulan, sonuçları kalıcı bir önbellekte (kelime -> kök) tutan servis.
+    `lookup` istek başına kullanılır: sadece önbelleğe bakar, bulamazsa kelimeyi olduğu gibi döndürür ve
+    kelimeyi arka planda çözümlenmek üzere kuyruğa alır; Zemberek'in başlatma ve çözümleme maliyeti
+    istek yoluna hiç girmez. `warm` / `lemmatize_many` eksik kelimeleri hemen çözümler; büyük
+    listeler süreç havuzuna dağıtılır. Zemberek yüklü değilse tüm kelimeler olduğu gibi döner.
+    Arka planda kökü bulunan kelimeler add_listener ile kaydedilen fonksiyonlara bildirilir; `lookup` ile
+    yüzey haliyle indekslenmiş metinler böylece yenilenebilir.
+    """
+
+    def __init__(self, cache_path: str = LEMMA_CACHE_PATH, max_entries: int = MAX_CACHE_ENTRIES,
+                 processes: int = None, background: bool = True):
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.processes = processes if processes is not None else max(1, (os.cpu_count() or 1) - 1)
+        self.background = background
+        self.available = zemberek_available()
+        self._lock = threading.Lock()
+        self._analyze_lock = threading.Lock()
+        self._morphology = None
+        self._pool = None
+        self._pending = set()
+        self._has_pending = threading.Event()
+        self._worker = None
+        self._listeners: List[Callable[[Dict[str, str]], None]] = []
+        self._dirty = False
+        self._last_save = time.time()
+        self._cache: Dict[str, str] = self._load_cache()
+        if not self.available:
+            print("DEBUG: Zemberek yüklü değil; kökleme kapalı, kelimeler olduğu gibi kullanılacak.")
+        if cache_path:
+            atexit.register(self.close)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def _load_cache(self) -> Dict[str, str]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            print(f"DEBUG: Kök önbelleği '{self.cache_path}' dosyasından {len(cache)} kelime ile yüklendi.")
+            return cache
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Uyarı: '{self.cache_path}' kök önbelleği okunamadı: {e}. Boş önbellekle başlanıyor.")
+            return {}
+
+    def save(self):
+        """Önbelleği geçici dosyaya yazıp taşır; değişiklik yoksa bir şey yapmaz."""
+        if not self.cache_path or not self._dirty:
+            return
+        with self._lock:
+            snapshot = dict(self._cache)
+            self._dirty = False
+            self._last_save = time.time()
+        tmp_path = self.cache_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except IOError as e:
+            print(f"Hata: '{self.cache_path}' kök önbelleğine yazılırken sorun oluştu: {e}")
+
+    def close(self):
+        self.save()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def add_listener(self, callback: Callable[[Dict[str, str]], None]):
+        """Arka planda çözümlenen ve kökü kendisinden farklı çıkan kelimeler ({kelime: kök}) callback'e bildirilir."""
+        self._listeners.append(callback)
+
+    def lookup(self, word: str) -> str:
+        """Önbellekteki kökü döndürür. Önbellekte yoksa kelimenin kendisini döndürür ve arka planda çözümletir."""
+        lemma = self._cache.get(word)
+        if lemma is not None:
+            return lemma
+        if self.available and self.background and len(self._cache) < self.max_entries:
+            with self._lock:
+                self._pending.add(word)
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._background_loop, name="lemmatizer", daemon=True)
+                    self._worker.start()
+            self._has_pending.set()
+        return word
+
+    def lemma(self, word: str) -> str:
+        """Kelimenin kökünü döndürür; önbellekte yoksa hemen çözümler."""
+        lemma = self._cache.get(word)
+        return lemma if lemma is not None else self.lemmatize_many([word])[word]
+
+    def lemmatize_many(self, words: Iterable[str], processes: int = None) -> Dict[str, str]:
+        """Kelimelerin köklerini döndürür; önbellekte olmayanlar çözümlenip önbelleğe eklenir."""
+        result = {}
+        missing = []
+        for word in dict.fromkeys(words):
+            lemma = self._cache.get(word)
+            if lemma is not None:
+                result[word] = lemma
+            else:
+                missing.append(word)
+        if not missing:
+            return result
+        if not self.available:
+            result.update((word, word) for word in missing)
+            return result
+
+        processes = self.processes if processes is None else processes
+        if processes > 1 and len(missing) >= PROCESS_POOL_MIN_WORDS:
+            analyzed = self._analyze_in_pool(missing, processes)
+        else:
+            with self._analyze_lock:
+                if self._morphology is None:
+                    started = time.time()
+                    self._morphology = create_morphology()
+                    print(f"DEBUG: Zemberek morfoloji motoru {time.time() - started:.1f} sn'de başlatıldı.")
+                analyzed = [(word, analyze_word(self._morphology, word)) for word in missing]
+        self._store(analyzed)
+        result.update(analyzed)
+        return result
+
+    def _analyze_in_pool(self, words: List[str], processes: int) -> List[Tuple[str, str]]:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker)
+        chunk_size = max(1, min(BATCH_CHUNK_SIZE, -(-len(words) // processes)))
+        chunks = [words[i:i + chunk_size] for i in range(0, len(words), chunk_size)]
+        analyzed = []
+        for pairs in self._pool.map(_analyze_chunk, chunks):
+            analyzed.extend(pairs)
+        return analyzed
+
+    def _store(self, pairs: List[Tuple[str, str]]):
+        with self._lock:
+            for word, lemma in pairs:
+                if len(self._cache) >= self.max_entries:
+                    break
+                self._cache[word] = lemma
+            self._dirty = True
+
+    def warm(self, texts: Iterable[str], processes: int = None) -> int:
+        """Metinlerdeki tüm kelimelerin kökünü önbelleğe alır; yeni çözümlenen kelime sayısını döndürür."""
+        words = set()
+        for text in texts:
+            words.update(TOKEN_PATTERN.findall(turkish_lower(text)))
+        missing = [word for word in words if word not in self._cache]
+        if missing and self.available:
+            self.lemmatize_many(missing, processes)
+            self.save()
+            print(f"DEBUG: {len(missing)} yeni kelimenin kökü önbelleğe alındı.")
+        return len(missing)
+
+    def iter_lemmas(self, words: Iterable[str], processes: int = None,
+                    chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[Tuple[str, str]]:
+        """Akış halinde gelen kelimeleri parça parça çözümler; her parçadaki benzersiz (kelime, kök) çiftlerini döndürür."""
+        chunk = []
+        for word in words:
+            chunk.append(word)
+            if len(chunk) >= chunk_size:
+                yield from self.lemmatize_many(chunk, processes).items()
+                chunk = []
+        if chunk:
+            yield from self.lemmatize_many(chunk, processes).items()
+
+    def _background_loop(self):
+        while True:
+            self._has_pending.wait()
+            with self._lock:
+                words = list(self._pending)
+                self._pending.clear()
+                self._has_pending.clear()
+            if not words:
+                continue
+            try:
+                learned = self.lemmatize_many(words, processes=1)
+            except Exception as e:
+                print(f"DEBUG: Arka planda kökleme başarısız: {e}")
+                learned = {}
+            changed = {word: lemma for word, lemma in learned.items() if word != lemma}
+            for listener in list(self._listeners) if changed else []:
+                try:
+                    listener(changed)
+                except Exception as e:
+                    print(f"DEBUG: Kök dinleyicisi hata verdi: {e}")
+            if time.time() - self._last_save >= SAVE_INTERVAL_SECONDS:
+                self.save()
@@ -1,19 +1,17 @@
 import json
 
+from data_tools import count_entries as stream_count_entries
+
 # Kontrol edilecek JSON dosyasının adı
 DATASET_PATH = 'data.json'
 
 def count_entries():
     """
     JSON dosyasındaki soru-cevap çiftlerinin sayısını sayar ve ekrana yazdırır.
+    Dosya akış halinde okunur; büyük veri setleri belleğe alınmaz.
     """
     try:
-        # Dosyayı UTF-8 formatında oku
-        with open(DATASET_PATH, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # 'data' bir liste olduğu için, uzunluğu (len) bize eleman sayısını verir.
-        entry_count = len(data)
+        entry_count, _ = stream_count_entries(DATASET_PATH)
         
         print("\n" + "="*40)
         print(f"📊 Veri Seti Raporu 📊")
@@ -23,10 +21,10 @@ def count_entries():
 
     except FileNotFoundError:
         print(f"\n❌ HATA: '{DATASET_PATH}' adında bir dosya bulunamadı. Lütfen dosya adını kontrol edin.\n")
-    except json.JSONDecodeError:
+    except (ValueError, json.JSONDecodeError):
         print(f"\n❌ HATA: '{DATASET_PATH}' dosyası boş veya bozuk. Lütfen içeriğini kontrol edin.\n")
     except Exception as e:
         print(f"\n❌ Beklenmedik bir hata oluştu: {e}\n")
 
 if __name__ == "__main__":
-    count_entries()
\ No newline at end of file
+    count_entries()